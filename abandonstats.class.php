@@ -0,0 +1,269 @@
+<?php
+
+/**
+ * Class AbandonStats
+ * Unanswered calls (ABANDON, EXITWITHTIMEOUT) counted in one pass:
+ * abandons and timeouts, wait before the caller left, queue position
+ * at entry and at exit, and the wait histogram of the abandons. The
+ * counters are kept for the whole window and for every key of the
+ * dimensions a page asks for (queue, day, hour...).
+ */
+
+class AbandonStats {
+
+	/**
+	 * Database connection
+	 *
+	 * @var mysqli|null
+	 * @access private
+	 */
+	private $_db;
+
+	/**
+	 * Queuelog table name
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_table;
+
+	/**
+	 * Counters of the window
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_total;
+
+	/**
+	 * Counters by dimension and key
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_by = array();
+
+	/**
+	 * Seconds per bucket of the wait histogram
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Step = 10;
+
+	/**
+	 * Buckets of the wait histogram, the last one is open ended
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Buckets = 7;
+
+	/**
+	 * AbandonStats::__construct()
+	 *
+	 * @access public
+	 * @param mysqli|null $db Connection, only needed by fetch()
+	 * @param string $table Queuelog table name
+	 * @return void
+	 */
+	public function __construct($db = null, $table = 'queuelog') {
+		$this->_db = $db;
+		$this->_table = $table;
+		$this->_total = $this->blank();
+	}
+
+	/**
+	 * AbandonStats::blank()
+	 *
+	 * @access private
+	 * @return array
+	 */
+	private function blank() {
+		return array(
+			'calls' => 0,
+			'abandon' => 0,
+			'timeout' => 0,
+			'wait' => 0,
+			'enter_pos' => 0,
+			'exit_pos' => 0,
+			'hist' => array_fill(0, $this->Buckets, 0),
+		);
+	}
+
+	/**
+	 * AbandonStats::count()
+	 *
+	 * Add to the counters of the window and of every key given
+	 *
+	 * @access private
+	 * @param array $keys dimension => key
+	 * @param string $event
+	 * @param int $cnt
+	 * @param int $wait
+	 * @param int $enter_pos
+	 * @param int $exit_pos
+	 * @param int|null $bucket Histogram bucket of a single abandon
+	 * @return void
+	 */
+	private function count($keys, $event, $cnt, $wait, $enter_pos, $exit_pos, $bucket) {
+		$counters = array(&$this->_total);
+		foreach ($keys as $dim => $key) {
+			if (!isset($this->_by[$dim][$key])) {
+				$this->_by[$dim][$key] = $this->blank();
+			}
+			$counters[] = &$this->_by[$dim][$key];
+		}
+		$field = ($event == 'ABANDON') ? 'abandon' : 'timeout';
+		foreach ($counters as &$c) {
+			$c['calls'] += $cnt;
+			$c[$field] += $cnt;
+			$c['wait'] += $wait;
+			$c['enter_pos'] += $enter_pos;
+			$c['exit_pos'] += $exit_pos;
+			if ($bucket !== null) {
+				$c['hist'][$bucket]++;
+			}
+		}
+		unset($c);
+	}
+
+	/**
+	 * AbandonStats::add()
+	 *
+	 * Count one call as read from queuelog
+	 *
+	 * @access public
+	 * @param array $keys dimension => key, e.g. array('queue' => 'support')
+	 * @param string $event ABANDON or EXITWITHTIMEOUT
+	 * @param int $wait Seconds waited, data3
+	 * @param int $enter_pos Position at entry, data2
+	 * @param int $exit_pos Position at exit, data1
+	 * @return void
+	 */
+	public function add($keys, $event, $wait, $enter_pos, $exit_pos) {
+		$bucket = null;
+		if ($event == 'ABANDON') {
+			// 0-10, 11-20 ... 51-60, 61 and more
+			$bucket = min($this->Buckets - 1, max(0, (int) ceil($wait / $this->Step) - 1));
+		}
+		$this->count($keys, $event, 1, (int) $wait, (int) $enter_pos, (int) $exit_pos, $bucket);
+	}
+
+	/**
+	 * AbandonStats::addSums()
+	 *
+	 * Count calls already summed up, as in the hourly rollup.
+	 * The histogram cannot be rebuilt from sums and is left out.
+	 *
+	 * @access public
+	 * @param array $keys dimension => key
+	 * @param string $event
+	 * @param int $cnt Calls
+	 * @param int $wait Sum of data3
+	 * @param int $enter_pos Sum of data2
+	 * @param int $exit_pos Sum of data1
+	 * @return void
+	 */
+	public function addSums($keys, $event, $cnt, $wait, $enter_pos, $exit_pos) {
+		$this->count($keys, $event, (int) $cnt, (int) $wait, (int) $enter_pos, (int) $exit_pos, null);
+	}
+
+	/**
+	 * AbandonStats::fetch()
+	 *
+	 * Read the unanswered calls of a window from queuelog, unbuffered,
+	 * counted by queue
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue Quoted queue list as in sesvars.php
+	 * @return array See result()
+	 */
+	public function fetch($start, $end, $queue) {
+		$res = $this->_db->query($this->sql($start, $end, $queue), MYSQLI_USE_RESULT);
+		if (!$res) {
+			trigger_error('AbandonStats: ' . $this->_db->error, E_USER_WARNING);
+			return $this->result();
+		}
+		while ($row = $res->fetch_row()) {
+			$this->add(array('queue' => $row[0]), $row[1], $row[4], $row[3], $row[2]);
+		}
+		$res->free();
+		return $this->result();
+	}
+
+	/**
+	 * AbandonStats::sql()
+	 *
+	 * Query of fetch(), also explained by schema.php
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue
+	 * @return string
+	 */
+	public function sql($start, $end, $queue) {
+		return "SELECT queuename, event, data1, data2, data3 FROM $this->_table
+			WHERE time >= '$start' AND time <= '$end' AND event IN ('ABANDON', 'EXITWITHTIMEOUT')
+			AND queuename IN ($queue)";
+	}
+
+	/**
+	 * AbandonStats::calls()
+	 *
+	 * Unanswered calls by key of a dimension
+	 *
+	 * @access public
+	 * @param string $dim
+	 * @return array key => calls
+	 */
+	public function calls($dim) {
+		$calls = array();
+		if (isset($this->_by[$dim])) {
+			foreach ($this->_by[$dim] as $key => $c) {
+				$calls[$key] = $c['calls'];
+			}
+		}
+		return $calls;
+	}
+
+	/**
+	 * AbandonStats::averages()
+	 *
+	 * @access private
+	 * @param array $c Counters
+	 * @return array The counters with avg_wait, avg_enter and avg_exit
+	 */
+	private function averages($c) {
+		$n = $c['calls'];
+		$c['avg_wait'] = $n ? round($c['wait'] / $n, 2) : 0;
+		$c['avg_enter'] = $n ? round($c['enter_pos'] / $n) : 0;
+		$c['avg_exit'] = $n ? floor($c['exit_pos'] / $n) : 0;
+		return $c;
+	}
+
+	/**
+	 * AbandonStats::result()
+	 *
+	 * Counters of the window with their averages, and under 'by' the
+	 * counters of every dimension and key, keys sorted
+	 *
+	 * @access public
+	 * @return array
+	 */
+	public function result() {
+		$result = $this->averages($this->_total);
+		$result['by'] = array();
+		foreach ($this->_by as $dim => $keys) {
+			ksort($keys);
+			foreach ($keys as $key => $c) {
+				$result['by'][$dim][$key] = $this->averages($c);
+			}
+		}
+		return $result;
+	}
+
+}
@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
 ?>
 <!DOCTYPE html>
@@ -14,6 +15,7 @@ include "config.php";
     <script type="text/javascript" src="js/1.10.2/jquery.min.js"></script>
     <script src="js/handlebars.js"></script>
     <script src="js/locale.js"></script>
+    <script src="js/realtime.js"></script>
     <?php
 echo "<script>
 localStorage.setItem('queues',\"" . $_SESSION['QSTATS']['queue'] . "\");
@@ -30,23 +32,12 @@ localStorage.setItem('queues',\"" . $_SESSION['QSTATS']['queue'] . "\");
         return s4() + s4();
     }
 
-    $(function getQueueStatus() {
-        $(function() {
-            $.ajax({
-                type: 'POST',
-                url: 'ajam.php',
-                data: 'Action=QueueStatus&ActionId=' + guid() + '&Queue=',
-                success: function(data) {
-                    var queue = JSON.parse(data);
-                    var theTemplateScript = $("#queues-template").html();
-                    var theTemplate = Handlebars.compile(theTemplateScript);
-                    var context = { Queues: queue };
-                    var theCompiledHtml = theTemplate(context);
-                    $('.queues-placeholder').html(theCompiledHtml);
-                }
-            });
+    $(function() {
+        var theTemplate = Handlebars.compile($("#queues-template").html());
+        Realtime.watch('QueueStatus', 999, function(queue) {
+            var context = { Queues: queue };
+            $('.queues-placeholder').html(theTemplate(context));
         });
-        setTimeout(getQueueStatus, 999);
     });
 
     Handlebars.registerHelper("ifE", function(conditional, options) {
@@ -45,6 +45,14 @@ class Ajam {
 	 */
 	private $_authtype;
 
+	/**
+	 * Local socket of the persistent AMI gateway (amigw.php)
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_gateway = null;
+
 	/**
 	 * Get result commands
 	 *
@@ -102,8 +110,8 @@ class Ajam {
 			die('Requires PHP 5 or higher');
 		}
 		// Verify if function curl_exists
-		// its is needed by AJAM HTTP access
-		if (!function_exists('curl_init')) {
+		// its is needed by AJAM HTTP access, the gateway does without
+		if (!function_exists('curl_init') && empty($config_arr['gateway'])) {
 			die('Php Curl module unavailable');
 		}
 		// Verify if the config variables is defined
@@ -114,6 +122,9 @@ class Ajam {
 			$this->_usermanager = $config_arr['admin'];
 			$this->_secretmanager = $config_arr['secret'];
 			$this->_authtype = $config_arr['authtype'];
+			if (!empty($config_arr['gateway'])) {
+				$this->_gateway = $config_arr['gateway'];
+			}
 
 			if (!$config_arr['cookiefile']) {
 				$this->_cookiefile = 'ajam_cookie';
@@ -255,24 +266,41 @@ class Ajam {
 	}
 
 	/**
-	 * Ajam::checkCon()
+	 * Ajam::gatewayCommand()
 	 *
-	 * Verify if connection session
-	 * is logged or no, this method
-	 * use the AJAM ping command
+	 * Send the command through the persistent AMI session
+	 * of amigw.php, the reply has the same format as rawman
 	 *
 	 * @access private
-	 * @return boolean
+	 * @param string $action_str AMI Command
+	 * @param array $params_arr Command params
+	 * @return string|boolean False if the gateway is not available
 	 */
-	private function checkCon() {
-		$query = $this->buildQuery("Ping", null);
-		$data = $this->getResponse("command", $query);
-		$raw_result = $this->parseRaw($data);
-		if (isset($raw_result['Response']) && $raw_result['Response'] == 'Success') {
-			return true;
-		} else {
+	private function gatewayCommand($action_str, $params_arr = array()) {
+		$sock = @stream_socket_client($this->_gateway, $errno, $errstr, 1);
+		if (!$sock) {
+			if ($this->_debug) {
+				echo "Gateway unavailable: $errstr \n";
+			}
+			return false;
+		}
+		stream_set_timeout($sock, 10);
+		$msg = "Action: $action_str\r\n";
+		if ($params_arr) {
+			foreach ($params_arr as $key => $value) {
+				if (strtolower($key) == 'action') {
+					continue;
+				}
+				$msg .= $key . ": " . str_replace(array("\r", "\n"), '', $value) . "\r\n";
+			}
+		}
+		fwrite($sock, $msg . "\r\n");
+		$data = stream_get_contents($sock);
+		fclose($sock);
+		if ($data === false || $data === '' || strpos($data, "AMI gateway") !== false) {
 			return false;
 		}
+		return $data;
 	}
 
 	/**
@@ -312,16 +340,27 @@ class Ajam {
 	 */
 
 	public function doCommand($action_str, $params_arr = array()) {
-		if (!$this->checkCon()) {
-			if ($this->_debug) {
-				echo "Need login \n";
-			}
-			$this->doLogin($this->_authtype);
-		}
-
 		if (($action_str)) {
-			$query = $this->buildQuery($action_str, $params_arr);
-			$data = $this->getResponse("command", $query);
+			$data = false;
+			if ($this->_gateway) {
+				$data = $this->gatewayCommand($action_str, $params_arr);
+			}
+			if ($data === false && !function_exists('curl_init')) {
+				die('AMI gateway unavailable and Php Curl module unavailable');
+			}
+			if ($data === false) {
+				// Login only when the session cookie has expired
+				$query = $this->buildQuery($action_str, $params_arr);
+				$data = $this->getResponse("command", $query);
+				if ($data === false || stripos($data, "Permission denied") !== false
+					|| stripos($data, "Authentication Required") !== false) {
+					if ($this->_debug) {
+						echo "Need login \n";
+					}
+					$this->doLogin($this->_authtype);
+					$data = $this->getResponse("command", $query);
+				}
+			}
 			//$raw_result = $this->parseRaw($data);
 
 			if ($this->_debug) {
@@ -1,18 +1,18 @@
 <?php
 require_once 'ajam.class.php';
+require_once 'snapshot.class.php';
+define('QSTATS_NODB', true);
 include 'config.php';
 
 $params = array();
 
-if (isset($_POST['Action'])) {
-	$command = $_POST['Action'];
-	foreach ($_POST as $k => $v) {
-		$params[$k] = $v;
-	}
+function ajam_query($config, $command, $params) {
 	$ajam = new Ajam($config);
 	$ajam->doCommand($command, $params);
 	$result = $ajam->getResult();
-	$res2 = $result;
+	if ($result === false || $result === null) {
+		return false;
+	}
 
 	$result = explode("\r\n", $result);
 	end($result);
@@ -34,7 +34,34 @@ if (isset($_POST['Action'])) {
 			$parse[$i][$k] = $v;
 		}
 	}
-	print_r(json_encode($parse));
+	return json_encode($parse);
+}
+
+if (isset($_POST['Action'])) {
+	$command = $_POST['Action'];
+	foreach ($_POST as $k => $v) {
+		$params[$k] = $v;
+	}
+	session_write_close();
+
+	// Read-only actions polled by every realtime tab are
+	// served from one snapshot shared by all viewers
+	if (isset($config['snapshot'][$command])) {
+		$key = array();
+		foreach ($params as $k => $v) {
+			if (strtolower($k) != 'actionid') {
+				$key[$k] = $v;
+			}
+		}
+		ksort($key);
+		$snapshot = new Snapshot();
+		$json = $snapshot->get(serialize($key), $config['snapshot'][$command], function () use ($config, $command, $params) {
+			return ajam_query($config, $command, $params);
+		});
+	} else {
+		$json = ajam_query($config, $command, $params);
+	}
+	print_r($json);
 }
 
 if (isset($_POST['CliCom'])) {
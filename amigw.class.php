@@ -0,0 +1,536 @@
+<?php
+
+/**
+ * Class AmiGateway
+ * Long-lived process holding one authenticated AMI TCP session.
+ * Local clients (Ajam) connect to a unix socket, send one action,
+ * receive the response and its events and the socket is closed.
+ * Actions are multiplexed over the AMI session by ActionID.
+ * A client sending "Action: GatewaySubscribe" stays connected and
+ * gets every unsolicited AMI event (see events.php).
+ */
+
+class AmiGateway {
+
+	/**
+	 * Asterisk manager host and port
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_host;
+	private $_port;
+
+	/**
+	 * Asterisk manager user and secret
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_usermanager;
+	private $_secretmanager;
+
+	/**
+	 * Local socket the gateway listens on
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_listen;
+
+	/**
+	 * AMI connection and its read buffer
+	 *
+	 * @var resource
+	 * @access private
+	 */
+	private $_ami = null;
+	private $_amibuf = '';
+
+	/**
+	 * Listening socket
+	 *
+	 * @var resource
+	 * @access private
+	 */
+	private $_server;
+
+	/**
+	 * Connected clients: id => array(sock, buf, out, close)
+	 * out is written as the socket accepts it, a client with close
+	 * set is dropped once out is empty
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_clients = array();
+
+	/**
+	 * Actions in flight: gateway ActionID => array(client, orig, list)
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_pending = array();
+
+	/**
+	 * Clients subscribed to AMI events: id => true
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_subscribers = array();
+
+	/**
+	 * ActionID and client sequences
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_seq = 0;
+	private $_cseq = 0;
+
+	/**
+	 * Time of the last AMI traffic, for keepalive pings
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_lastio = 0;
+
+	/**
+	 * Earliest time of the next AMI reconnect attempt
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_retry = 0;
+
+	/**
+	 * Largest output a client may have waiting, bytes. A subscriber
+	 * not reading its events is dropped past it.
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $OutLimit = 16777216;
+
+	/**
+	 * Enable or disable debug output
+	 *
+	 * @var boolean
+	 * @access private
+	 */
+	private $_debug = false;
+
+	/**
+	 * AmiGateway::__construct()
+	 *
+	 * @access public
+	 * @param array $config_arr
+	 * @return void
+	 */
+	public function __construct($config_arr) {
+		$this->_host = $config_arr['amihost'];
+		$this->_port = $config_arr['amiport'];
+		$this->_usermanager = $config_arr['admin'];
+		$this->_secretmanager = $config_arr['secret'];
+		$this->_listen = $config_arr['gateway'];
+		if (isset($config_arr['debug']) && $config_arr['debug'] != false) {
+			$this->_debug = true;
+		}
+	}
+
+	/**
+	 * AmiGateway::log()
+	 *
+	 * @access private
+	 * @param string $msg
+	 * @return void
+	 */
+	private function log($msg) {
+		if ($this->_debug) {
+			echo date('Y-m-d H:i:s') . " $msg\n";
+		}
+	}
+
+	/**
+	 * AmiGateway::parse()
+	 *
+	 * Headers of an AMI message, keys in lower case
+	 *
+	 * @access private
+	 * @param string $msg
+	 * @return array
+	 */
+	private function parse($msg) {
+		$headers = array();
+		foreach (explode("\r\n", $msg) as $line) {
+			$pair = explode(': ', $line, 2);
+			if (count($pair) == 2 && !isset($headers[strtolower($pair[0])])) {
+				$headers[strtolower($pair[0])] = $pair[1];
+			}
+		}
+		return $headers;
+	}
+
+	/**
+	 * AmiGateway::connect()
+	 *
+	 * Open and authenticate the AMI session
+	 *
+	 * @access private
+	 * @return boolean
+	 */
+	private function connect() {
+		$sock = @stream_socket_client("tcp://$this->_host:$this->_port", $errno, $errstr, 5);
+		if (!$sock) {
+			$this->log("AMI connect failed: $errstr");
+			return false;
+		}
+		stream_set_timeout($sock, 5);
+		// Banner: Asterisk Call Manager/x.y.z
+		fgets($sock);
+		fwrite($sock, "Action: Login\r\nActionID: gw-login\r\nUsername: $this->_usermanager\r\nSecret: $this->_secretmanager\r\nEvents: call,agent\r\n\r\n");
+		$response = '';
+		while (strpos($response, "\r\n\r\n") === false && !feof($sock)) {
+			$line = fgets($sock);
+			if ($line === false) {
+				break;
+			}
+			$response .= $line;
+		}
+		$headers = $this->parse($response);
+		if (!isset($headers['response']) || $headers['response'] != 'Success') {
+			$this->log("AMI login failed: $response");
+			fclose($sock);
+			return false;
+		}
+		stream_set_blocking($sock, false);
+		$this->_ami = $sock;
+		$this->_amibuf = '';
+		$this->_lastio = time();
+		$this->log("AMI connected");
+		return true;
+	}
+
+	/**
+	 * AmiGateway::disconnect()
+	 *
+	 * Drop the AMI session and fail every action in flight
+	 *
+	 * @access private
+	 * @return void
+	 */
+	private function disconnect() {
+		if ($this->_ami) {
+			@fclose($this->_ami);
+		}
+		$this->_ami = null;
+		foreach ($this->_pending as $gwid => $p) {
+			if (isset($this->_clients[$p['client']])) {
+				$this->send($p['client'], "Response: Error\r\nMessage: AMI gateway lost connection\r\n\r\n", true);
+			}
+		}
+		$this->_pending = array();
+		// Subscribers reconnect and reload their state
+		foreach (array_keys($this->_subscribers) as $id) {
+			$this->dropClient($id);
+		}
+		$this->log("AMI disconnected");
+	}
+
+	/**
+	 * AmiGateway::listen()
+	 *
+	 * @access private
+	 * @return boolean
+	 */
+	private function listen() {
+		if (strpos($this->_listen, 'unix://') === 0) {
+			$path = substr($this->_listen, 7);
+			if (file_exists($path)) {
+				unlink($path);
+			}
+		}
+		$this->_server = @stream_socket_server($this->_listen, $errno, $errstr);
+		if (!$this->_server) {
+			die("Can not listen on $this->_listen: $errstr\n");
+		}
+		if (isset($path)) {
+			// Web server user must be able to connect
+			chmod($path, 0666);
+		}
+		return true;
+	}
+
+	/**
+	 * AmiGateway::dropClient()
+	 *
+	 * @access private
+	 * @param int $id
+	 * @return void
+	 */
+	private function dropClient($id) {
+		if (isset($this->_clients[$id])) {
+			@fclose($this->_clients[$id]['sock']);
+			unset($this->_clients[$id]);
+		}
+		unset($this->_subscribers[$id]);
+		foreach ($this->_pending as $gwid => $p) {
+			if ($p['client'] == $id) {
+				unset($this->_pending[$gwid]);
+			}
+		}
+	}
+
+	/**
+	 * AmiGateway::send()
+	 *
+	 * Queue data for a client and write as much of it as possible
+	 *
+	 * @access private
+	 * @param int $id
+	 * @param string $data
+	 * @param boolean $close Drop the client once everything is sent
+	 * @return void
+	 */
+	private function send($id, $data, $close = false) {
+		if (!isset($this->_clients[$id])) {
+			return;
+		}
+		$this->_clients[$id]['out'] .= $data;
+		if ($close) {
+			$this->_clients[$id]['close'] = true;
+		}
+		if (strlen($this->_clients[$id]['out']) > $this->OutLimit) {
+			$this->log("Client $id too slow, dropped");
+			$this->dropClient($id);
+			return;
+		}
+		$this->flush($id);
+	}
+
+	/**
+	 * AmiGateway::flush()
+	 *
+	 * Write the pending output of a client without blocking
+	 *
+	 * @access private
+	 * @param int $id
+	 * @return void
+	 */
+	private function flush($id) {
+		$c = $this->_clients[$id];
+		while ($c['out'] !== '') {
+			$n = @fwrite($c['sock'], $c['out']);
+			if ($n === false) {
+				$this->dropClient($id);
+				return;
+			}
+			if ($n == 0) {
+				break;
+			}
+			$c['out'] = (string) substr($c['out'], $n);
+		}
+		$this->_clients[$id]['out'] = $c['out'];
+		if ($c['out'] === '' && $c['close']) {
+			$this->dropClient($id);
+		}
+	}
+
+	/**
+	 * AmiGateway::request()
+	 *
+	 * Forward a client action to AMI under a gateway ActionID
+	 *
+	 * @access private
+	 * @param int $id Client id
+	 * @param string $msg Action block without the final blank line
+	 * @return void
+	 */
+	private function request($id, $msg) {
+		if (!$this->_ami) {
+			$this->send($id, "Response: Error\r\nMessage: AMI gateway not connected\r\n\r\n", true);
+			return;
+		}
+		if (stripos($msg, "Action: GatewaySubscribe") === 0) {
+			$this->_subscribers[$id] = true;
+			$this->send($id, "Response: Success\r\nMessage: Subscribed\r\n\r\n");
+			return;
+		}
+		$orig = null;
+		$lines = array();
+		foreach (explode("\r\n", $msg) as $line) {
+			if (stripos($line, 'ActionID:') === 0) {
+				$orig = trim(substr($line, 9));
+			} else if ($line !== '') {
+				$lines[] = $line;
+			}
+		}
+		$gwid = 'gw-' . (++$this->_seq);
+		$lines[] = "ActionID: $gwid";
+		$this->_pending[$gwid] = array('client' => $id, 'orig' => $orig, 'list' => false);
+		fwrite($this->_ami, implode("\r\n", $lines) . "\r\n\r\n");
+		$this->_lastio = time();
+	}
+
+	/**
+	 * AmiGateway::dispatch()
+	 *
+	 * Route an AMI message to the client waiting for its ActionID
+	 *
+	 * @access private
+	 * @param string $msg AMI message without the final blank line
+	 * @return void
+	 */
+	private function dispatch($msg) {
+		$headers = $this->parse($msg);
+		if (!isset($headers['actionid']) || !isset($this->_pending[$headers['actionid']])) {
+			// Unsolicited event or gateway ping
+			if (isset($headers['event']) && !isset($headers['actionid'])) {
+				$this->publish($msg);
+			}
+			return;
+		}
+		$gwid = $headers['actionid'];
+		$p = $this->_pending[$gwid];
+
+		// Give the client back its own ActionID, or none if it sent none
+		$out = array();
+		foreach (explode("\r\n", $msg) as $line) {
+			if (stripos($line, 'ActionID:') === 0) {
+				if ($p['orig'] !== null) {
+					$out[] = "ActionID: " . $p['orig'];
+				}
+			} else {
+				$out[] = $line;
+			}
+		}
+		$complete = true;
+		if (isset($headers['response'])) {
+			// Only an event list has more blocks: "Command output
+			// follows" and Response: Follows end with their own block
+			if (isset($headers['eventlist']) && strtolower($headers['eventlist']) == 'start') {
+				$this->_pending[$gwid]['list'] = true;
+				$complete = false;
+			}
+		} else if ($p['list']) {
+			$complete = (isset($headers['eventlist']) && strtolower($headers['eventlist']) == 'complete');
+		}
+		if ($complete) {
+			unset($this->_pending[$gwid]);
+		}
+		$this->send($p['client'], implode("\r\n", $out) . "\r\n\r\n", $complete);
+	}
+
+	/**
+	 * AmiGateway::publish()
+	 *
+	 * Send an AMI event to every subscriber
+	 *
+	 * @access private
+	 * @param string $msg AMI message without the final blank line
+	 * @return void
+	 */
+	private function publish($msg) {
+		foreach (array_keys($this->_subscribers) as $id) {
+			$this->send($id, $msg . "\r\n\r\n");
+		}
+	}
+
+	/**
+	 * AmiGateway::run()
+	 *
+	 * Main loop, never returns
+	 *
+	 * @access public
+	 * @return void
+	 */
+	public function run() {
+		$this->listen();
+		while (true) {
+			// Clients get an error reply while Asterisk is away
+			if (!$this->_ami && time() >= $this->_retry && !$this->connect()) {
+				$this->_retry = time() + 2;
+			}
+
+			$read = array($this->_server);
+			if ($this->_ami) {
+				$read[] = $this->_ami;
+			}
+			$write = array();
+			foreach ($this->_clients as $c) {
+				$read[] = $c['sock'];
+				if ($c['out'] !== '') {
+					$write[] = $c['sock'];
+				}
+			}
+			$except = null;
+			if (@stream_select($read, $write, $except, 1) === false) {
+				continue;
+			}
+
+			foreach ($write as $sock) {
+				foreach ($this->_clients as $id => $c) {
+					if ($c['sock'] === $sock) {
+						$this->flush($id);
+						break;
+					}
+				}
+			}
+
+			foreach ($read as $sock) {
+				if ($sock === $this->_server) {
+					$client = @stream_socket_accept($this->_server, 0);
+					if ($client) {
+						stream_set_blocking($client, false);
+						$this->_clients[++$this->_cseq] = array('sock' => $client, 'buf' => '', 'out' => '', 'close' => false);
+					}
+				} else if ($sock === $this->_ami) {
+					$data = fread($this->_ami, 65536);
+					if ($data === '' || $data === false) {
+						if (feof($this->_ami)) {
+							$this->disconnect();
+						}
+						continue;
+					}
+					$this->_lastio = time();
+					$this->_amibuf .= $data;
+					while (($pos = strpos($this->_amibuf, "\r\n\r\n")) !== false) {
+						$msg = substr($this->_amibuf, 0, $pos);
+						$this->_amibuf = substr($this->_amibuf, $pos + 4);
+						$this->dispatch($msg);
+					}
+				} else {
+					foreach ($this->_clients as $id => $c) {
+						if ($c['sock'] !== $sock) {
+							continue;
+						}
+						$data = fread($sock, 8192);
+						if ($data === '' || $data === false) {
+							if (feof($sock)) {
+								$this->dropClient($id);
+							}
+							break;
+						}
+						$this->_clients[$id]['buf'] .= $data;
+						$buf = $this->_clients[$id]['buf'];
+						if (($pos = strpos($buf, "\r\n\r\n")) !== false) {
+							$this->_clients[$id]['buf'] = '';
+							$this->request($id, substr($buf, 0, $pos));
+						}
+						break;
+					}
+				}
+			}
+
+			// Keepalive, a dead peer is noticed on the next read
+			if ($this->_ami && time() - $this->_lastio > 60) {
+				fwrite($this->_ami, "Action: Ping\r\nActionID: gw-ping\r\n\r\n");
+				$this->_lastio = time();
+			}
+		}
+	}
+
+}
@@ -0,0 +1,41 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Persistent AMI gateway for ajam.php. Start it as the web server user
+// from systemd or supervisor:
+// php /var/www/html/queue-stats/amigw.php
+
+if (php_sapi_name() != 'cli') {
+	header('HTTP/1.1 403 Forbidden');
+	exit;
+}
+
+chdir(dirname(__FILE__));
+// The gateway does not use the database
+define('QSTATS_NODB', true);
+require_once "config.php";
+require_once "amigw.class.php";
+
+session_write_close();
+
+set_time_limit(0);
+$gateway = new AmiGateway($config);
+$gateway->run();
+?>
@@ -19,6 +19,9 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "rollup.class.php";
+require_once "timehist.class.php";
+require_once "servicelevel.class.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
@@ -38,53 +41,82 @@ include "sesvars.php";
     <script type="text/javascript" src="https://www.google.com/jsapi"></script>
 </head>
 <?php
-// This query shows every call for agents, we collect into a named array the values of holdtime and calltime
-$query = "SELECT time, queuename, agent, event, data1, data2, data3 FROM $DBTable
-WHERE time >= '$start' AND time <= '$end' AND event IN ('COMPLETECALLER', 'COMPLETEAGENT')
-AND queuename IN ($queue) AND agent in ($agent)";
-
-$res = mysqli_query($connection, $query);
-while ($row = mysqli_fetch_row($res)) {
-	$total_calls2["$row[2]"]++;
-	$record["$row[2]"][] = $row[0] . "|" . $row[1] . "|" . $row[3] . "|" . $row[4];
-	$total_hold2["$row[2]"] += $row[4];
-	$total_time2["$row[2]"] += $row[5];
-	$grandtotal_hold += $row[4];
-	$grandtotal_time += $row[5];
-	$grandtotal_calls++;
-	$hold["$row[1]"][] = $row[4];
-	if ($row[4] <= 5) {
-		$hold15["$row[1]"] += count($row[4]);
-	} elseif (($row[4] >= 6) && ($row[4] <= 10)) {
-		$hold30["$row[1]"] += count($row[4]);
-	} elseif (($row[4] >= 11) && ($row[4] <= 15)) {
-		$hold45["$row[1]"] += count($row[4]);
-	} elseif (($row[4] >= 16) && ($row[4] <= 20)) {
-		$hold60["$row[1]"] += count($row[4]);
-	} elseif (($row[4] >= 21) && ($row[4] <= 25)) {
-		$hold75["$row[1]"] += count($row[4]);
-	} elseif (($row[4] >= 26) && ($row[4] <= 30)) {
-		$hold90["$row[1]"] += count($row[4]);
-	} elseif ($row[4] >= 31) {
-		$hold91["$row[1]"] += count($row[4]);
+// Calls, hold and call time per agent from the hourly rollup, the
+// partial hours at the edges of the window from queuelog
+$rollup = new Rollup($connection, $DBTable);
+$total_calls2 = array();
+$total_hold2 = array();
+$total_time2 = array();
+$num = 0;
+$num2 = 0;
+foreach ($rollup->fetch($start, $end, array('COMPLETECALLER', 'COMPLETEAGENT'), $queue, $agent, array('agent', 'event')) as $row) {
+	$a = $row['agent'];
+	if (!isset($total_calls2[$a])) {
+		$total_calls2[$a] = 0;
+		$total_hold2[$a] = 0;
+		$total_time2[$a] = 0;
 	}
-	$durall["$row[1]"][] = $row[5];
-	if ($row[5] <= 5) {
-		$dur5["$row[1]"] += count($row[5]);
-	} elseif (($row[5] >= 6) && ($row[5] <= 10)) {
-		$dur10["$row[1]"] += count($row[5]);
-	} elseif (($row[5] >= 11) && ($row[5] <= 15)) {
-		$dur15["$row[1]"] += count($row[5]);
-	} elseif (($row[5] >= 16) && ($row[5] <= 20)) {
-		$dur20["$row[1]"] += count($row[5]);
-	} elseif (($row[5] >= 21) && ($row[5] <= 25)) {
-		$dur25["$row[1]"] += count($row[5]);
+	$total_calls2[$a] += $row['cnt'];
+	$total_hold2[$a] += $row['sum_data1'];
+	$total_time2[$a] += $row['sum_data2'];
+	if ($row['event'] == "COMPLETEAGENT") {
+		$num += $row['cnt'];
+	} else {
+		$num2 += $row['cnt'];
+	}
+}
+$grandtotal_hold = array_sum($total_hold2);
+$grandtotal_time = array_sum($total_time2);
+$grandtotal_calls = array_sum($total_calls2);
+$total_calls_print = $grandtotal_calls;
+$total_duration_print = ceil($grandtotal_time / 60);
+$average_duration = $total_calls_print ? ceil($grandtotal_time / $total_calls_print) : 0;
+$average_hold = $total_calls_print ? ceil($grandtotal_hold / $total_calls_print) : 0;
+
+// Percentiles merged from the hourly histograms
+$timehist = new TimeHist($connection, $DBTable);
+$pct_queue = $timehist->sketches($start, $end, $queue, $agent, 'queuename');
+$pct_agent = $timehist->sketches($start, $end, $queue, $agent, 'agent');
+// Service level of the queues, abandons included whatever the agents
+$sla = new ServiceLevel($sla_thresholds);
+$sla_levels = $sla->queues($timehist->sketches($start, $end, $queue));
+
+// Calls of a sketch by 5 seconds up to $n * 5, exact as the sketch
+// has a bucket per second under 64
+function sketch_by5($sketch, $n) {
+	$hist = array();
+	$below = 0;
+	for ($i = 0; $i < $n; $i++) {
+		$upto = $sketch->atMost(5 * $i + 5);
+		$hist[$i] = $upto - $below;
+		$below = $upto;
 	}
+	return $hist;
+}
+
+// Hold time by 5 seconds: 0-5, 6-10 ... 26-30, 31 and more,
+// call time by 5 seconds up to 25
+$hold = array();
+$hold_hist = array();
+$durall = array();
+$dur_hist = array();
+foreach ($pct_queue as $q => $sketch) {
+	$hold[$q] = $sketch['wait']->count();
+	$hold_hist[$q] = sketch_by5($sketch['wait'], 6);
+	$hold_hist[$q][6] = $hold[$q] - $sketch['wait']->atMost(30);
+	$durall[$q] = $sketch['talk']->count();
+	$dur_hist[$q] = sketch_by5($sketch['talk'], 5);
+}
+
+function percentile_row($key, $sketch) {
+	$row = "<TR><TD>" . $key . "</TD><TD>" . $sketch['wait']->count() . "</TD>";
+	foreach (array('wait', 'talk') as $metric) {
+		foreach (array(50, 90, 99) as $p) {
+			$row .= "<TD>" . $sketch[$metric]->percentile($p) . "</TD>";
+		}
+	}
+	return $row . "</TR>\n";
 }
-$total_calls_print = array_sum($total_calls2);
-$total_duration_print = ceil(array_sum($total_time2) / 60);
-$average_duration = ceil(array_sum($total_time2) / $total_calls_print);
-$average_hold = ceil(array_sum($total_hold2) / $total_calls_print);
 
 $start_parts = explode(" ,:", $start);
 $end_parts = explode(" ,:", $end);
@@ -355,22 +387,22 @@ tooltip($lang["$language"]['gotop'], 200);
 				<tbody>
 <?php
 foreach ($hold as $key => $row) {
-	$total_ans15 += $hold15["$key"];
-	$total_ans30 += $hold30["$key"];
-	$total_ans45 += $hold45["$key"];
-	$total_ans60 += $hold60["$key"];
-	$total_ans75 += $hold75["$key"];
-	$total_ans90 += $hold90["$key"];
-	$total_ans91 += $hold91["$key"];
-	$total = count($hold["$key"]);
+	$total_ans15 += $hold_hist["$key"][0];
+	$total_ans30 += $hold_hist["$key"][1];
+	$total_ans45 += $hold_hist["$key"][2];
+	$total_ans60 += $hold_hist["$key"][3];
+	$total_ans75 += $hold_hist["$key"][4];
+	$total_ans90 += $hold_hist["$key"][5];
+	$total_ans91 += $hold_hist["$key"][6];
+	$total = $hold["$key"];
 	echo "<tr><td>" . $key . "</td>
-	<td>" . $hold15["$key"] . "</td>
-	<td>" . $hold30["$key"] . "</td>
-	<td>" . $hold45["$key"] . "</td>
-	<td>" . $hold60["$key"] . "</td>
-	<td>" . $hold75["$key"] . "</td>
-	<td>" . $hold90["$key"] . "</td>
-	<td>" . $hold91["$key"] . "</td>
+	<td>" . $hold_hist["$key"][0] . "</td>
+	<td>" . $hold_hist["$key"][1] . "</td>
+	<td>" . $hold_hist["$key"][2] . "</td>
+	<td>" . $hold_hist["$key"][3] . "</td>
+	<td>" . $hold_hist["$key"][4] . "</td>
+	<td>" . $hold_hist["$key"][5] . "</td>
+	<td>" . $hold_hist["$key"][6] . "</td>
 	<td>" . $total . "</td></tr>\n";
 }
 ?>
@@ -439,20 +471,20 @@ tooltip($lang["$language"]['gotop'], 200);
 				<tbody>
                 <?php
 foreach ($durall as $key => $row) {
-	$total_dur5 += $dur5["$key"];
-	$total_dur10 += $dur10["$key"];
-	$total_dur15 += $dur15["$key"];
-	$total_dur20 += $dur20["$key"];
-	$total_dur25 += $dur25["$key"];
-	$total2 = count($durall["$key"]);
-	$total25 = $dur5["$key"] + $dur10["$key"] + $dur15["$key"] + $dur20["$key"] + $dur25["$key"];
+	$total_dur5 += $dur_hist["$key"][0];
+	$total_dur10 += $dur_hist["$key"][1];
+	$total_dur15 += $dur_hist["$key"][2];
+	$total_dur20 += $dur_hist["$key"][3];
+	$total_dur25 += $dur_hist["$key"][4];
+	$total2 = $durall["$key"];
+	$total25 = array_sum($dur_hist["$key"]);
 	$total26 = $total2 - $total25;
 	echo "<tr><td>" . $key . "</td>
-	<td>" . $dur5["$key"] . "</td>
-	<td>" . $dur10["$key"] . "</td>
-	<td>" . $dur15["$key"] . "</td>
-	<td>" . $dur20["$key"] . "</td>
-	<td>" . $dur25["$key"] . "</td>
+	<td>" . $dur_hist["$key"][0] . "</td>
+	<td>" . $dur_hist["$key"][1] . "</td>
+	<td>" . $dur_hist["$key"][2] . "</td>
+	<td>" . $dur_hist["$key"][3] . "</td>
+	<td>" . $dur_hist["$key"][4] . "</td>
 	<td>" . $total26 . "</td>
 	</tr>\n";
 }
@@ -514,17 +546,9 @@ tooltip($lang["$language"]['gotop'], 200);
         var data = google.visualization.arrayToDataTable([
 <?php
 echo "['Cause', 'Events'],\n";
-foreach ($res as $row) {
-	if ($row['event'] == "COMPLETEAGENT") {
-		$action_agent = $lang["$language"]['agent_hungup'];
-		$num += count($row['event']);
-	} elseif ($row['event'] == "COMPLETECALLER") {
-		$action_caller = $lang["$language"]['caller_hungup'];
-		$num2 += count($row['event']);
-	}
-}
+$action_agent = $lang["$language"]['agent_hungup'];
+$action_caller = $lang["$language"]['caller_hungup'];
 echo "['" . $action_agent . "', " . $num . "],['" . $action_caller . "', " . $num2 . "]\n";
-mysqli_free_result($res);
 ?>
         ]);
         var options = {
@@ -540,6 +564,56 @@ mysqli_free_result($res);
 </tr>
 </thead>
 </table>
+<br/>
+<a name='pct'></a>
+<table width='99%' cellpadding=3 cellspacing=3 border=0>
+<caption>
+<a href='#0'><img src='images/go-up.png' border=0 class='icon' width=16 height=16
+<?php
+tooltip($lang["$language"]['gotop'], 200);
+?>
+></a>&nbsp;&nbsp;
+<?php echo $lang["$language"]['percentiles'] ?></caption>
+<thead>
+<tr>
+<?php
+foreach (array('queue' => $pct_queue, 'agent' => $pct_agent) as $title => $sketches) {
+	echo "<td valign=top width='50%' bgcolor='#ffffff'>
+	<table width='99%' cellpadding=1 cellspacing=1 border=0 class='sortable'>
+	<thead><tr><th>" . $lang["$language"][$title] . "</th><th>" . $lang["$language"]['calls'] . "</th>";
+	foreach (array('holdtime', 'calltime') as $metric) {
+		foreach (array(50, 90, 99) as $p) {
+			echo "<th>" . $lang["$language"][$metric] . " p$p</th>";
+		}
+	}
+	echo "</tr></thead>\n<tbody>\n";
+	foreach ($sketches as $key => $sketch) {
+		echo percentile_row($key, $sketch);
+	}
+	echo "</tbody></table></td>\n";
+}
+?>
+</tr>
+</thead>
+</table>
+<br/>
+<a name='sla'></a>
+<table width='99%' cellpadding=3 cellspacing=3 border=0>
+<caption>
+<a href='#0'><img src='images/go-up.png' border=0 class='icon' width=16 height=16
+<?php
+tooltip($lang["$language"]['gotop'], 200);
+?>
+></a>&nbsp;&nbsp;
+<?php echo $lang["$language"]['service_level'] ?></caption>
+<thead>
+<tr>
+<td valign=top bgcolor='#ffffff'>
+<?php print_service_level($sla_levels); ?>
+</td>
+</tr>
+</thead>
+</table>
 
 </div>
 </div>
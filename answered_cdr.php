@@ -19,54 +19,28 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "reports.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
 <?php
-//query mixed from queuelog and cdr (queuelog table must be in cdr databases)
-$sql = "select queuelog.time, queuelog.callid, queuelog.queuename, queuelog.agent,  queuelog.event, queuelog.data1 as wait, queuelog.data2 as dur, cdr.did, cdr.src, cdr.recordingfile, cdr.disposition from queuelog, cdr where queuelog.time >= '$start' AND queuelog.time <= '$end' AND queuelog.callid = cdr.uniqueid and queuelog.event in ('COMPLETECALLER', 'COMPLETEAGENT') and queuelog.agent in ($agent) and queuelog.queuename in ($queue) and cdr.disposition = 'ANSWERED' order by queuelog.time";
+//queue calls merged with their cdr, see callfacts.class.php
+$report = export_report('answered_cdr');
 
-// $sql = "select queuelog.time, queuelog.callid, queuelog.agent, queuelog.data2 as dur, cdr.did, cdr.billsec, cdr.disposition, cdr.src, cdr.dst, cdr.recordingfile from queuelog, cdr where queuelog.callid = cdr.uniqueid and queuelog.event in ('COMPLETEAGENT', 'COMPLETECALLER') and queuelog.agent in ($agent) and cdr.disposition = 'ANSWERED' order by queuelog.time";
+// The overview per agent is counted by the database, the rows
+// are loaded page by page from datatable.php
+$res = $connection->query($report['summary']);
 
-$res = $connection->query($sql);
-
-$out = array();
-$rec = array();
+$over = array();
 while ($row = $res->fetch_assoc()) {
-	$row['rec'] = getRec($row['recordingfile'], $row['time']);
-	$out[] = $row;
-
+	$over[$row['agent']] = $row;
 }
+$res->free();
 
-$header_pdf = array("Дата", "CallerId", "DID", "Очередь", "Агент", "Ожид.", "Разг.");
-$width_pdf = array(40, 32, 25, 25, 64, 25, 25);
-$title_pdf = "Принятые вызовы";
-$data_pdf = array();
-foreach ($out as $k => $r) {
-	$time = strtotime($r['time']);
-	$time = date('Y-m-d H:i:s', $time);
-	$dur = seconds2minutes($r['dur']);
-	$wait = seconds2minutes($r['wait']);
-	$linea_pdf = array($time, $r['src'], $r['did'], $r['queuename'], $r['agent'], $wait, $dur);
-	$data_pdf[] = $linea_pdf;
-}
-
-$out = json_encode($out);
+$over = json_encode($over);
 
 $connection->close();
 
-function getRec($recfile, $time) {
-	$time = strtotime($time);
-	$rec['path'] = RECPATH . date('Y/m/d/', $time) . $recfile;        
-	if (file_exists($rec['path']) && preg_match('/(.*)\..+$/i', $recfile)) {
-		$tmpRes = base64_encode($rec['path']);
-	} else {
-		$tmpRes = $_REQUEST['recfile'];
-	}
-
-	return $tmpRes;
-}
-
 ?>
 <!DOCTYPE html>
 <head>
@@ -82,37 +56,7 @@ function getRec($recfile, $time) {
     <script src="js/jquery.dataTables.cdr.js"></script>
     <script src="js/locale.js"></script>
     <script>
-      let outs = <?php echo $out; ?>;
- function outOverData(arr) {
-     let eve = {};
-     let res = {};
-
-     arr.map(v => [v.agent, v.event]).map(v => eve[v] = (eve[v] || 0) + 1);
-     arr.map(v => [v.agent, v.disposition]).map(v => eve[v] = (eve[v] || 0) + 1);
-
-     Object.keys(eve).map(v => v.split(",")).map((v, i) => {
-         return [v[0], v[1], Object.values(eve)[i]];
-     }).map(v => {
-         if (v[0] in res) {
-             let agent = res[v[0]];
-             let event = {
-                 [v[1]]: v[2] };
-             res[v[0]] = { ...agent, ...event };
-         } else {
-             let agent = { "agent": v[0] };
-             let event = {
-                 [v[1]]: v[2] || 0 };
-             res[v[0]] = { ...agent, ...event };
-         }
-     });
-
-     return res;
- }
-
-   var over_out = outOverData(outs);
-   over_out = JSON.stringify(over_out);
-   over_out = over_out.replace(/NO\sANSWER/g, "NO_ANSWER");
-   over_out = JSON.parse(over_out);
+      var over_out = <?php echo $over; ?>;
 
 $(function() {
     var theTemplateScript = $("#overs-template").html();
@@ -125,22 +69,33 @@ $(function() {
 $(function() {
     var theTemplateScript = $("#out-template").html();
     var theTemplate = Handlebars.compile(theTemplateScript);
-    var context = { out: outs };
-    var theCompiledHtml = theTemplate(context);
-    $('.out-placeholder').html(theCompiledHtml);
+    $('.out-placeholder').html(theTemplate({}));
 });
 
     $(document).ready(function() {
-            if (navigator.language == 'ru')
-
-        $('#incTable').DataTable(
-        {
-          "language" :  dataTablesLocale['ru'],
-          "iDisplayLength" : 100
-        }
-      );
-      else
-      $('#incTable').DataTable({"iDisplayLength" : 100});
+      var helper = function (name) {
+        return function (d) { return Handlebars.helpers[name](d); };
+      };
+      var options = {
+        "iDisplayLength" : 100,
+        "serverSide" : true,
+        "ajax" : { "url" : "datatable.php", "type" : "POST", "data" : { "report" : "answered_cdr" } },
+        "order" : [[0, "asc"]],
+        "columns" : [
+          { "data" : "callid", "render" : helper("prettyDate") },
+          { "data" : "src" },
+          { "data" : "did" },
+          { "data" : "queuename" },
+          { "data" : "agent" },
+          { "data" : "wait", "render" : helper("prettyDate") },
+          { "data" : "dur", "render" : helper("prettyDate") },
+          { "data" : "event", "render" : helper("getStatus") },
+          { "data" : "rec", "render" : helper("html5Player"), "orderable" : false }
+        ]
+      };
+      if (navigator.language == 'ru')
+        options.language = dataTablesLocale['ru'];
+      $('#incTable').DataTable(options);
     });
 
 
@@ -236,20 +191,6 @@ Handlebars.registerHelper("getStatus", function (s) {
                 </tr>
             </thead>
             <tbody>
-                {{#each out}}
-                <tr>
-                    <td>{{prettyDate callid}}</td>
-                    <td>{{src}}</td>
-                    <td>{{did}}</td>
-                    <td>{{queuename}}</td>
-                    <td>{{agent}}</td>
-                    <td>{{prettyDate wait}}</td>
-                    <td>{{prettyDate dur}}</td>
-                    <td>{{{getStatus event}}}</td>
-                    <td>{{{html5Player rec}}}</td>
-
-                </tr>
-                {{/each}}
             </tbody>
         </table>
 </script>
@@ -266,7 +207,7 @@ Handlebars.registerHelper("getStatus", function (s) {
       <h2>Детализация</h2>
       <br/>
 <?php
-print_exports($header_pdf, $data_pdf, $width_pdf, $title_pdf, $cover_pdf);
+print_report_export('answered_cdr');
 ?>
         <br/>
         <hr/>
@@ -19,6 +19,9 @@
 */
 require_once("config.php");
 include("sesvars.php");
+require_once("reportsql.php");
+require_once("timehist.class.php");
+require_once("servicelevel.class.php");
 ?>
 <!DOCTYPE html>
 <head>
@@ -35,9 +38,53 @@ include("sesvars.php");
 </head>
 <?php
 
-$sql = "SELECT queuename, agent, event, data1, data2 FROM $DBTable WHERE time >= '$start' AND time <= '$end' AND event IN ('COMPLETECALLER', 'COMPLETEAGENT') AND queuename IN ($queue) AND agent IN ($agent)";
-$res = mysqli_query($connection, $sql);
+$sql = answered_dist_sql($DBTable, $start, $end, $queue, $agent);
+// One unbuffered pass, memory does not grow with the number of calls:
+// counters per queue and bucket, the bucket is computed from the value
+$res = mysqli_query($connection, $sql, MYSQLI_USE_RESULT);
+$hold = array();
+$hold_hist = array();
+$dur = array();
+$dur_hist = array();
+$perans = array_fill(0, 7, 0);
+$perdur = array_fill(0, 5, 0);
+$num = 0;
+$num2 = 0;
+while ($row = mysqli_fetch_row($res)) {
+	$q = $row[0];
+	if (!isset($hold[$q])) {
+		$hold[$q] = 0;
+		$hold_hist[$q] = array_fill(0, 7, 0);
+		$dur[$q] = 0;
+		$dur_hist[$q] = array_fill(0, 5, 0);
+	}
+	// Hold time by 15 seconds: 0-15, 16-30 ... 76-90, 91 and more
+	$i = min(6, max(0, (int) ceil($row[3] / 15) - 1));
+	$hold[$q]++;
+	$hold_hist[$q][$i]++;
+	$perans[$i]++;
+	// Call time by 5 seconds up to 25, longer calls only in the total
+	$i = max(0, (int) ceil($row[4] / 5) - 1);
+	$dur[$q]++;
+	if ($i < 5) {
+		$dur_hist[$q][$i]++;
+		$perdur[$i]++;
+	}
+	if ($row[2] == "COMPLETEAGENT") {
+		$num++;
+	} else {
+		$num2++;
+	}
+}
+mysqli_free_result($res);
+// Service level against the thresholds of each queue, from the
+// hourly histograms with the abandons counted
+$timehist = new TimeHist($connection, $DBTable);
+$sla = new ServiceLevel($sla_thresholds);
+$sla_levels = $sla->queues($timehist->sketches($start, $end, $queue));
 mysqli_close($connection);
+$action = $lang["$language"]['agent_hungup'];
+$action2 = $lang["$language"]['caller_hungup'];
 $start_parts = explode(" ,:", $start);
 $end_parts   = explode(" ,:", $end);   
 ?>
@@ -96,68 +143,19 @@ $end_parts   = explode(" ,:", $end);
 				</thead>
 				<tbody>
 <?php
-while($row=mysqli_fetch_row($res)) {
-$hold["$row[0]"][]=$row[3];
-if ($row[3]<=15) {
- $hold15["$row[0]"] += count($row[3]);
- } elseif (($row[3] >= 16)&&($row[3] <= 30)) {
- $hold30["$row[0]"] += count($row[3]);
- } elseif (($row[3] >= 31)&&($row[3] <= 45)) {
- $hold45["$row[0]"] += count($row[3]);
- } elseif (($row[3] >= 46)&&($row[3] <= 60)) {
- $hold60["$row[0]"] += count($row[3]);
- } elseif (($row[3] >= 61)&&($row[3] <= 75)) {
- $hold75["$row[0]"] += count($row[3]);
- } elseif (($row[3] >= 76)&&($row[3] <= 90)) {
- $hold90["$row[0]"] += count($row[3]);
- } elseif ($row[3] >= 91) {
- $hold91["$row[0]"] += count($row[3]);
- }
-$dur["$row[0]"][]=$row[4];
-if ($row[4]<=5) {
- $dur5["$row[0]"] += count($row[4]);
- } elseif (($row[4] >= 6)&&($row[4] <= 10)) {
- $dur10["$row[0]"] += count($row[4]);
- } elseif (($row[4] >= 11)&&($row[4] <= 15)) {
- $dur15["$row[0]"] += count($row[4]);
- } elseif (($row[4] >= 16)&&($row[4] <= 20)) {
- $dur20["$row[0]"] += count($row[4]);
- } elseif (($row[4] >= 21)&&($row[4] <= 25)) {
- $dur25["$row[0]"] += count($row[4]);
- } 
-} 
 foreach ($hold as $key=>$row) {
-     $total = count($hold["$key"]);	 
+     $total = $hold["$key"];	 
   	echo "<tr><td>".$key."</td>
-	<td>".$hold15["$key"]."</td>
-	<td>".$hold30["$key"]."</td>
-	<td>".$hold45["$key"]."</td>
-	<td>".$hold60["$key"]."</td>
-	<td>".$hold75["$key"]."</td>
-	<td>".$hold90["$key"]."</td>
-	<td>".$hold91["$key"]."</td>
+	<td>".$hold_hist["$key"][0]."</td>
+	<td>".$hold_hist["$key"][1]."</td>
+	<td>".$hold_hist["$key"][2]."</td>
+	<td>".$hold_hist["$key"][3]."</td>
+	<td>".$hold_hist["$key"][4]."</td>
+	<td>".$hold_hist["$key"][5]."</td>
+	<td>".$hold_hist["$key"][6]."</td>
 	<td>".$total."</td></tr>\n";
 }
 
-$perans15 = 0;$perans30 = 0;$perans45 = 0;$perans60 = 0;$perans75 = 0;$perans90 = 0;$perans91 = 0;
-foreach($res as $row){
- if ( ($row['data1'] >= 0) && ($row['data1'] <= 15) ){
-  $perans15 += count($row['data1']);
-   } elseif (($row['data1'] >= 16) && ($row['data1'] <= 30)) {
-  $perans30 += count($row['data1']); 
-   } elseif (($row['data1'] >= 31) && ($row['data1'] <= 45)) {
-  $perans45 += count($row['data1']); 
-   } elseif (($row['data1'] >= 46) && ($row['data1'] <= 60)) {
-  $perans60 += count($row['data1']);
-   } elseif (($row['data1'] >= 61) && ($row['data1'] <= 75)) {
-  $perans75 += count($row['data1']);
-   } elseif (($row['data1'] >= 76) && ($row['data1'] <= 90)) {
-  $perans90 += count($row['data1']); 
-   } elseif ($row['data1'] >= 91) {
-  $perans91 += count($row['data1']); 
-  }
-}
-
 ?>
 			   </tbody>
 			  </table>
@@ -174,7 +172,7 @@ google.charts.load('current', {packages: ['corechart', 'line']});
       data.addRows([
      <?php
 
-echo "[0, 0],[15, ".$perans15."],[30, ".$perans30."],[45, ".$perans45."],[60, ".$perans60."],[75, ".$perans75."],[90, ".$perans90."],[91, ".$perans91."],\n";
+echo "[0, 0],[15, ".$perans[0]."],[30, ".$perans[1]."],[45, ".$perans[2]."],[60, ".$perans[3]."],[75, ".$perans[4]."],[90, ".$perans[5]."],[91, ".$perans[6]."],\n";
      ?>
       ]);
   var options = {
@@ -194,6 +192,24 @@ echo "[0, 0],[15, ".$perans15."],[30, ".$perans30."],[45, ".$perans45."],[60, ".
                </td>
               </tr>
              </thead>			
+            </table>
+		  <br/>
+		  <a name='sla'></a>
+		  <table width='99%' cellpadding=3 cellspacing=3 border=0 >
+            <caption>
+            <a href='#0'><img src='images/go-up.png' border=0 class='icon' width=16 height=16 
+            <?php 
+            tooltip($lang["$language"]['gotop'],200);
+            ?>
+            ></a>&nbsp;&nbsp;
+            <?php echo $lang["$language"]['service_level']?></caption>
+            <thead>
+            <tr>
+                <td valign=top bgcolor='#ffffff'>
+                <?php print_service_level($sla_levels); ?>
+                </td>
+            </tr>
+            </thead>
             </table>
 		  <br/>
 		  <a name='durper'></a>
@@ -223,31 +239,17 @@ echo "[0, 0],[15, ".$perans15."],[30, ".$perans30."],[45, ".$perans45."],[60, ".
 				</thead>
 				<tbody>
                 <?php
-$perdur5 = 0;$perdur10 = 0;$perdur15 = 0;$perdur20 = 0;$perdur25 = 0;
-foreach($res as $row){
- if ( ($row['data2'] >= 0) && ($row['data2'] <= 5) ){
-  $perdur5 += count($row['data2']);
-   } elseif (($row['data2'] >= 6) && ($row['data2'] <= 10)) {
-  $perdur10 += count($row['data2']); 
-   } elseif (($row['data2'] >= 11) && ($row['data2'] <= 15)) {
-  $perdur15 += count($row['data2']); 
-   } elseif (($row['data2'] >= 16) && ($row['data2'] <= 20)) {
-  $perdur20 += count($row['data2']);
-   } elseif (($row['data2'] >= 11) && ($row['data2'] <= 25)) { 
-  $perdur25 += count($row['data2']);
-  } 
-} 
 foreach ($dur as $key=>$row) {
-     $total2 = count($dur["$key"]);	
-     $total25 = $dur5["$key"] + $dur10["$key"] + $dur15["$key"] + $dur20["$key"] + $dur25["$key"];
+     $total2 = $dur["$key"];	
+     $total25 = array_sum($dur_hist["$key"]);
 	 $total26 = $total2 - $total25;
 //   $percent = number_format($total25 * 100 / $totall,2);
 	echo "<tr><td>".$key."</td>
-	<td>".$dur5["$key"]."</td>
-	<td>".$dur10["$key"]."</td>
-	<td>".$dur15["$key"]."</td>
-	<td>".$dur20["$key"]."</td>
-	<td>".$dur25["$key"]."</td>
+	<td>".$dur_hist["$key"][0]."</td>
+	<td>".$dur_hist["$key"][1]."</td>
+	<td>".$dur_hist["$key"][2]."</td>
+	<td>".$dur_hist["$key"][3]."</td>
+	<td>".$dur_hist["$key"][4]."</td>
 	<td>".$total26."</td>
 	</tr>\n";
 }
@@ -266,7 +268,7 @@ google.charts.load('current', {packages: ['corechart', 'line']});
 
       data.addRows([
      <?php
-   echo "[0, 0],[5, ".$perdur5."],[10, ".$perdur10."],[15, ".$perdur15."],[20, ".$perdur20."],[25, ".$perdur25."],\n";
+   echo "[0, 0],[5, ".$perdur[0]."],[10, ".$perdur[1]."],[15, ".$perdur[2]."],[20, ".$perdur[3]."],[25, ".$perdur[4]."],\n";
      ?>
       ]);
       var options = {
@@ -309,17 +311,7 @@ google.charts.load('current', {packages: ['corechart', 'line']});
         var data = google.visualization.arrayToDataTable([
 <?php
 echo "['Cause', 'Events'],\n";
-foreach($res as $row){
-    if	($row['event'] == "COMPLETEAGENT") {
-         $action = $lang["$language"]['agent_hungup'] ;
-		 $num += count($row['event']);
-    } elseif ($row['event'] == "COMPLETECALLER") {
-         $action2=$lang["$language"]['caller_hungup'];
-		 $num2 += count($row['event']);
-     }	 
-    }
 echo "['".$action."', ".$num."],['".$action2."', ".$num2."]\n";	
-	mysqli_free_result($res);
 ?>
         ]);
         var options = {
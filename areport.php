@@ -19,78 +19,36 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "sessions.class.php";
+require_once "reportcache.class.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
 <?php
-$esql = "SELECT * FROM queuelog WHERE queuename IN ($queue) AND agent IN ($agent)  AND time >= '$start' AND time <= '$end'"; //AND data1 != 'Auto-Pause'
-
-$evs = $connection->query($esql);
-
-$agents = array();
-$events = array();
-$tmp = array();
-// $qc = substr_count($queue, ',') + 1;
-$qc = 2;
-$ags = explode(",", $agent);
-
-while ($e = $evs->fetch_assoc()) {
-	$events[] = $e;
-}
-
-$evs->free();
+$cache = new ReportCache();
+$days = $cache->get('areport', $start, $end, $queue, $agent, function () use ($connection, $DBTable, $start, $end, $queue, $agent) {
+	$sessions = new AgentSessions($connection, $DBTable);
+	return $sessions->fetch($start, $end, $queue, $agent);
+});
 $connection->close();
 
-
-
-for ($i=0; $i < count($ags) ; $i++) {
-    $linea_pdf = array();
-    $a = trim($ags[$i],"'");
-    $j=0;$m=0;$h = 0;$y = 0;
- 	foreach ($events as $k => $v) {
- 		if ($a === $v['agent']) {
-          $date_part = explode(" ", $v['time']);
-          $d = $date_part[0];
-          $agents["$d"]["$a"]['DATE'] = $d;
-          $agents["$d"]["$a"]['AGENT'] = $a;
-	  
-	  if ( ($v['event'] === "COMPLETEAGENT") || ($v['event'] === "COMPLETECALLER") ) {
-          $tmp["$d"]["$a"]['INCALL'] += $v['data2'];
-          $agents["$d"]["$a"]['COMPLETE'] += 1;
-  		}
-
-      if ( ($v['event'] === "ADDMEMBER") && ($v['callid'] === "MANAGER")) {
-          $tmp["$d"]["$a"]['ADD'][$j] = strtotime($date_part[1]);
-          ++$j;
-      }
-      if ( ($v['event'] === "REMOVEMEMBER") && ($v['callid'] === "MANAGER")) {
-          $tmp["$d"]["$a"]['REM'][$m] = strtotime($date_part[1]);
-          ++$m;
-      }
-
-
-      if ($v['event'] === "PAUSE") {
-          $tmp["$d"]["$a"]['PA'] = strtotime($v['time']);
-          ++$h;
-      }
-
-      if ( ($v['event'] === "UNPAUSE") && (strtotime($v['time']) > $tmp["$d"]["$a"]['PA'] )) {
-          $tmp["$d"]["$a"]['PAUSE'] += strtotime($v['time']) - $tmp["$d"]["$a"]['PA'];
-          ++$y;
-      }
-
-      if (($v['event'] === "BLINDTRANSFER") || ( $v['event'] === "ATTENDEDTRANSFER")) {
-          $agents["$d"]["$a"]['TRANSFER_HCT'] += ($v['data3']/60) + ($v['data4']/60);
-          //$agents["$d"]["$a"]['TRANSFER'] += 1;
-      }
-         $agents["$d"]["$a"]['TRANSFER_HCT'] = number_format($agents["$d"]["$a"]['TRANSFER_HCT'],0,".","");
-         $agents["$d"]["$a"]['AVRG'] = number_format(($tmp["$d"]["$a"]['INCALL']) / $agents["$d"]["$a"]['COMPLETE'],2,".","");
-      if ( ($v['event'] === "RINGNOANSWER") && ($v['data1'] > "1500")) {
-          $agents["$d"]["$a"]['RNA'] += 1;
-      }
-	  }
-  }
+$agents = array();
+foreach ($days as $d => $val) {
+	foreach ($val as $a => $v) {
+		$agents["$d"]["$a"] = array(
+			'DATE' => $d,
+			'AGENT' => $a,
+			'INCALL' => number_format($v['INCALL'] / 60, 0, ".", ""),
+			'PAUSE' => number_format($v['PAUSE'] / 60, 0, ".", ""),
+			'FREE' => number_format($v['FREE'] / 60, 0, ".", ""),
+			'TRANSFER_HCT' => number_format($v['TRANSFER_HCT'], 0, ".", ""),
+			'COMPLETE' => $v['COMPLETE'],
+			'AVRG' => $v['COMPLETE'] ? number_format($v['INCALL'] / $v['COMPLETE'], 2, ".", "") : '',
+			'RNA' => $v['RNA'],
+		);
+	}
 }
+unset($days);
 
 
 $cover_pdf .= $lang["$language"]['queue'] . ": " . $queue . "\n";
@@ -103,35 +61,6 @@ $width_pdf = array(32, 64, 23, 23, 23, 23, 23, 23, 23);
 $title_pdf = "Отчет по агентам за период $start - $end";
 $data_pdf = array();
 
-foreach ($tmp as $key => $val) {
-  foreach ($val as $k => $v) {
-  	// for ($i=0; $i < count($tmp["$key"]["$k"]['UN']); $i++) {
-  	// if( $i & 1) {
-  	// 	if($tmp["$key"]["$k"]['UN'][$i] > $tmp["$key"]["$k"]['PA'][$i]) {
-   //     $tmp["$key"]["$k"]['PAUSE'] += $tmp["$key"]["$k"]['UN'][$i] - $tmp["$key"]["$k"]['PA'][$i];
-   //         }
-   //      }
-  	//  }
-  	if( (count($tmp["$key"]["$k"]['REM']) > 1 ) && (count($tmp["$key"]["$k"]['ADD']) > 1 )) {
-     $tmp["$key"]["$k"]['WORKTIME'] = array_pop($tmp["$key"]["$k"]['REM']) - array_shift($tmp["$key"]["$k"]['ADD']);
- } else {
- 	$tmp["$key"]["$k"]['WORKTIME'] = 9 * 60 * 60;
- }
-
-   if( $tmp["$key"]["$k"]['PAUSE'] < 86400 ){
-     $tmp["$key"]["$k"]['PAUSE'] = $tmp["$key"]["$k"]['PAUSE'] / $qc;
-     $tmp["$key"]["$k"]['FREE'] = $tmp["$key"]["$k"]['WORKTIME'] - ($tmp["$key"]["$k"]['INCALL'] + $tmp["$key"]["$k"]['PAUSE']);
-     $agents["$key"]["$k"]['PAUSE'] = number_format($tmp["$key"]["$k"]['PAUSE']/60,0,".","");
-   } else {
-   	 $tmp["$key"]["$k"]['FREE'] = $tmp["$key"]["$k"]['WORKTIME'] - $tmp["$key"]["$k"]['INCALL'];
-   	 $agents["$key"]["$k"]['PAUSE'] = 0;
-   }
-     $agents["$key"]["$k"]['INCALL'] = number_format($tmp["$key"]["$k"]['INCALL']/60,0,".","");
-     $agents["$key"]["$k"]['FREE'] = number_format($tmp["$key"]["$k"]['FREE']/60,0,".","");
-  }
-}
-
-
 foreach ($agents as $key => $val) {
      $agents["$key"]['CA'] = count($val);
   foreach ($val as $k => $v) {
@@ -143,7 +72,6 @@ foreach ($agents as $key => $val) {
 
 ksort($agents);
 $agents = json_encode($agents);
-$tmp = json_encode($tmp);
 ?>
 <!DOCTYPE html>
 <head>
@@ -157,11 +85,9 @@ $tmp = json_encode($tmp);
     <script src="js/handlebars.js"></script>
     <script src="js/locale.js"></script>
     <script>
-      var tmp = <?php echo $tmp; ?>;
        var agents = <?php echo $agents; ?>;
        agents = JSON.stringify(agents);
        agents = JSON.parse(agents);
-       console.log(tmp);
        console.log(agents);
        $(function() {
            var theTemplateScript = $("#agents-template").html();
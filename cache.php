@@ -0,0 +1,39 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Hit and miss counts of the report cache as JSON,
+// POST clear=1 drops the cached reports and the counts
+
+define('QSTATS_NODB', true);
+require_once "config.php";
+require_once "reportcache.class.php";
+session_write_close();
+
+$cache = new ReportCache();
+if (isset($_POST['clear'])) {
+	$cache->clear();
+}
+$stats = $cache->stats();
+$total = $stats['hits'] + $stats['misses'];
+$stats['ratio'] = $total ? round($stats['hits'] / $total, 3) : 0;
+
+header('Content-Type: application/json; charset=utf-8');
+echo json_encode($stats);
+?>
@@ -0,0 +1,140 @@
+<?php
+require_once 'feeder.class.php';
+
+/**
+ * Class CallerIndex
+ * Caller id lookup without a LIKE '%...%' over queuelog. The digits
+ * of the ENTERQUEUE caller id are stored with every suffix as a key,
+ * a substring of the number is then a prefix of one of the suffixes
+ * (an index range) and the last digits of the number are a suffix.
+ */
+
+class CallerIndex extends Feeder {
+
+	/**
+	 * Index table
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Table = 'callerid_idx';
+
+	/**
+	 * Digits of a number kept, counted from its end
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Digits = 20;
+
+	/**
+	 * CallerIndex::__construct()
+	 *
+	 * @access public
+	 * @param mysqli $db
+	 * @param string $table Queuelog table name
+	 * @return void
+	 */
+	public function __construct($db, $table) {
+		parent::__construct($db, $table);
+		$this->_name = 'callerid_idx';
+	}
+
+	/**
+	 * CallerIndex::install()
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		parent::install();
+		$ok = $this->_db->query("CREATE TABLE IF NOT EXISTS $this->Table (
+			suffix varchar(20) NOT NULL,
+			callid varchar(64) NOT NULL,
+			time datetime NOT NULL,
+			PRIMARY KEY (suffix, callid)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+		if (!$ok) {
+			trigger_error('CallerIndex: ' . $this->_db->error, E_USER_WARNING);
+		}
+		return $ok;
+	}
+
+	/**
+	 * CallerIndex::digits()
+	 *
+	 * Normalized form of a caller id: its digits only
+	 *
+	 * @access public
+	 * @param string $callerid
+	 * @return string
+	 */
+	public function digits($callerid) {
+		$digits = preg_replace('/\D+/', '', $callerid);
+		return substr($digits, -$this->Digits);
+	}
+
+	/**
+	 * CallerIndex::process()
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean
+	 */
+	protected function process($from_id, $to_id) {
+		$res = $this->_db->query("SELECT callid, time, data2 FROM $this->_table
+			WHERE id > $from_id AND id <= $to_id AND event = 'ENTERQUEUE'");
+		if (!$res) {
+			return false;
+		}
+		$values = array();
+		while ($row = $res->fetch_row()) {
+			$digits = $this->digits($row[2]);
+			$callid = $this->_db->real_escape_string($row[0]);
+			for ($i = 0, $n = strlen($digits); $i < $n; $i++) {
+				$values[] = "('" . substr($digits, $i) . "', '$callid', '$row[1]')";
+			}
+		}
+		$res->free();
+
+		foreach (array_chunk($values, 1000) as $chunk) {
+			if (!$this->_db->query("INSERT IGNORE INTO $this->Table (suffix, callid, time) VALUES " . implode(',', $chunk))) {
+				return false;
+			}
+		}
+		return $this->maxTime($from_id, $to_id);
+	}
+
+	/**
+	 * CallerIndex::lookup()
+	 *
+	 * Query selecting the callids of the calls whose caller id
+	 * contains the digits searched, or ends with them. Rows cron.php
+	 * has not indexed yet are searched in queuelog.
+	 *
+	 * @access public
+	 * @param string $search
+	 * @param boolean $suffix Match the end of the number only
+	 * @param string $start Time range, null for all time
+	 * @param string $end
+	 * @return string
+	 */
+	public function lookup($search, $suffix = false, $start = null, $end = null) {
+		$digits = $this->digits($search);
+		$range = ($start === null) ? "" : " AND time >= '$start' AND time <= '$end'";
+		$state = $this->getState();
+
+		if ($digits === '') {
+			// Not a number, nothing the index can answer
+			$like = $this->_db->real_escape_string($search);
+			$like = $suffix ? "%$like" : "%$like%";
+			return "SELECT DISTINCT callid FROM $this->_table WHERE event = 'ENTERQUEUE' AND data2 LIKE '$like'$range";
+		}
+		$key = $suffix ? "suffix = '$digits'" : "suffix LIKE '$digits%'";
+		$like = $suffix ? "%$digits" : "%$digits%";
+		return "SELECT callid FROM $this->Table WHERE $key$range
+			UNION SELECT callid FROM $this->_table WHERE id > " . $state['last_id'] . " AND event = 'ENTERQUEUE' AND data2 LIKE '$like'$range";
+	}
+
+}
@@ -0,0 +1,179 @@
+<?php
+require_once 'feeder.class.php';
+
+/**
+ * Class CallFacts
+ * One row per queue call, keyed by uniqueid: the queuelog events of
+ * the call (ENTERQUEUE, DID, CONNECT, COMPLETE*, ABANDON, TRANSFER)
+ * merged with its cdr legs. CDR style reports read this table instead
+ * of joining queuelog to cdr, which fans out on calls with several legs.
+ */
+
+class CallFacts extends Feeder {
+
+	protected $_name = 'call_facts';
+
+	/**
+	 * Fact table name
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Table = 'call_facts';
+
+	/**
+	 * Events ending a queue call
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_final = "'COMPLETECALLER','COMPLETEAGENT','ABANDON','EXITWITHTIMEOUT','EXITEMPTY','BLINDTRANSFER','ATTENDEDTRANSFER'";
+
+	/**
+	 * CallFacts::install()
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		parent::install();
+		$ok = $this->_db->query("CREATE TABLE IF NOT EXISTS $this->Table (
+			callid varchar(64) NOT NULL,
+			time datetime DEFAULT NULL,
+			enter_time datetime DEFAULT NULL,
+			queuename varchar(128) DEFAULT NULL,
+			agent varchar(128) DEFAULT NULL,
+			event varchar(32) DEFAULT NULL,
+			callerid varchar(64) DEFAULT NULL,
+			did varchar(64) DEFAULT NULL,
+			wait int unsigned DEFAULT NULL,
+			talk int unsigned DEFAULT NULL,
+			src varchar(80) DEFAULT NULL,
+			disposition varchar(45) DEFAULT NULL,
+			billsec int unsigned DEFAULT NULL,
+			recordingfile varchar(255) DEFAULT NULL,
+			PRIMARY KEY (callid),
+			KEY event_time (event, time, queuename, agent),
+			KEY agent_time (agent, time)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+		if (!$ok) {
+			trigger_error('CallFacts: ' . $this->_db->error, E_USER_WARNING);
+		}
+		return $ok;
+	}
+
+	/**
+	 * CallFacts::last()
+	 *
+	 * SQL aggregate giving $col of the newest row of the group matching $cond
+	 *
+	 * @access private
+	 * @param string $cond
+	 * @param string $col
+	 * @return string
+	 */
+	private function last($cond, $col) {
+		return "SUBSTRING_INDEX(GROUP_CONCAT(IF($cond, $col, NULL) ORDER BY id DESC SEPARATOR '\\n'), '\\n', 1)";
+	}
+
+	/**
+	 * CallFacts::process()
+	 *
+	 * Merge the events of an id range into the facts of their calls,
+	 * a call split between ranges keeps what the earlier ranges set
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean
+	 */
+	protected function process($from_id, $to_id) {
+		$final = $this->_final;
+		$num = "IF(%s REGEXP '^[0-9]+$', %s, NULL)";
+		$wait = "CASE WHEN event IN ('COMPLETECALLER','COMPLETEAGENT','CONNECT') THEN " . sprintf($num, 'data1', 'data1')
+			. " ELSE " . sprintf($num, 'data3', 'data3') . " END";
+		$talk = "CASE WHEN event IN ('COMPLETECALLER','COMPLETEAGENT') THEN " . sprintf($num, 'data2', 'data2')
+			. " ELSE " . sprintf($num, 'data4', 'data4') . " END";
+
+		$ok = $this->_db->query("INSERT INTO $this->Table (callid, time, enter_time, queuename, agent, event, callerid, did, wait, talk)
+			SELECT callid,
+				MAX(IF(event IN ($final), time, NULL)),
+				MIN(IF(event = 'ENTERQUEUE', time, NULL)),
+				" . $this->last("event IN ($final, 'CONNECT', 'ENTERQUEUE')", 'queuename') . ",
+				" . $this->last("event IN ($final, 'CONNECT')", 'agent') . ",
+				" . $this->last("event IN ($final)", 'event') . ",
+				" . $this->last("event = 'ENTERQUEUE'", 'data2') . ",
+				" . $this->last("event = 'DID'", 'data1') . ",
+				" . $this->last("event IN ($final, 'CONNECT')", $wait) . ",
+				" . $this->last("event IN ($final)", $talk) . "
+			FROM $this->_table
+			WHERE id > $from_id AND id <= $to_id AND event IN ($final, 'CONNECT', 'ENTERQUEUE', 'DID')
+			GROUP BY callid
+			ON DUPLICATE KEY UPDATE time = COALESCE(VALUES(time), time), enter_time = COALESCE(enter_time, VALUES(enter_time)),
+				queuename = COALESCE(VALUES(queuename), queuename), agent = COALESCE(VALUES(agent), agent),
+				event = COALESCE(VALUES(event), event), callerid = COALESCE(VALUES(callerid), callerid),
+				did = COALESCE(did, VALUES(did)), wait = COALESCE(VALUES(wait), wait), talk = COALESCE(VALUES(talk), talk)");
+		if (!$ok) {
+			return false;
+		}
+		if (!$this->cdr("SELECT callid FROM $this->_table WHERE id > $from_id AND id <= $to_id")) {
+			return false;
+		}
+		return $this->maxTime($from_id, $to_id);
+	}
+
+	/**
+	 * CallFacts::cdr()
+	 *
+	 * Copy the cdr data of calls to their facts. The legs of a call
+	 * are folded: first caller, answered if any leg was, its recording.
+	 *
+	 * @access private
+	 * @param string $callids Query or list of the callids to update
+	 * @return boolean
+	 */
+	private function cdr($callids) {
+		return $this->_db->query("UPDATE $this->Table f JOIN (
+				SELECT uniqueid,
+					SUBSTRING_INDEX(GROUP_CONCAT(src ORDER BY calldate SEPARATOR '\\n'), '\\n', 1) AS src,
+					MAX(did) AS did,
+					IF(MAX(disposition = 'ANSWERED'), 'ANSWERED', MAX(disposition)) AS disposition,
+					MAX(billsec) AS billsec,
+					MAX(recordingfile) AS recordingfile
+				FROM cdr WHERE uniqueid IN ($callids) GROUP BY uniqueid
+			) c ON c.uniqueid = f.callid
+			SET f.src = c.src, f.did = IF(c.did != '', c.did, f.did), f.disposition = c.disposition,
+				f.billsec = c.billsec, f.recordingfile = c.recordingfile");
+	}
+
+	/**
+	 * CallFacts::update()
+	 *
+	 * Process the new queuelog rows, then retry the calls of the last
+	 * hour whose cdr was not written yet when their events were read
+	 *
+	 * @access public
+	 * @return int|boolean
+	 */
+	public function update() {
+		$done = parent::update();
+		if ($done === false) {
+			return false;
+		}
+		$res = $this->_db->query("SELECT callid FROM $this->Table
+			WHERE disposition IS NULL AND time >= NOW() - INTERVAL 1 HOUR");
+		if (!$res) {
+			return $done;
+		}
+		$callids = array();
+		while ($row = $res->fetch_row()) {
+			$callids[] = "'" . $this->_db->real_escape_string($row[0]) . "'";
+		}
+		$res->free();
+		if ($callids && !$this->cdr(implode(',', $callids))) {
+			trigger_error('CallFacts: ' . $this->_db->error, E_USER_WARNING);
+		}
+		return $done;
+	}
+
+}
@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
 ?>
 <!DOCTYPE html>
@@ -14,6 +15,7 @@ include "config.php";
     <script type="text/javascript" src="js/1.10.2/jquery.min.js"></script>
     <script src="js/handlebars.js"></script>
     <script src="js/locale.js"></script>
+    <script src="js/realtime.js"></script>
     <script>
 
     function guid() {
@@ -68,26 +70,14 @@ include "config.php";
 
     });
 
-    $(function getCalls() {
-        $(function() {
-            $.ajax({
-                type: 'POST',
-                url: 'ajam.php',
-                data: 'Action=CoreShowChannels',
-                success: function(data) {
-                    var chan = JSON.parse(data);
-                    //$('#channels').html(data);
-                    var theTemplateScript = $("#channels-template").html();
-                    var theTemplate = Handlebars.compile(theTemplateScript);
-                    var context = {
-                        Calls: chan
-                    };
-                    var theCompiledHtml = theTemplate(context);
-                    $('.channels-placeholder').html(theCompiledHtml);
-                }
-            });
+    $(function() {
+        var theTemplate = Handlebars.compile($("#channels-template").html());
+        Realtime.watch('CoreShowChannels', 1000, function(chan) {
+            var context = {
+                Calls: chan
+            };
+            $('.channels-placeholder').html(theTemplate(context));
         });
-        setTimeout(getCalls, 1000);
     });
 
 
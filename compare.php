@@ -19,165 +19,81 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "servicelevel.class.php";
+require_once "reportsql.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
 <?php
-//query answered
-$q_ans = "SELECT queuename as col FROM $DBTable
-WHERE time >= '$start' AND time <= '$end' AND event IN ('COMPLETECALLER', 'COMPLETEAGENT')
-AND queuename IN ($queue)";
-//query unanswered
-$q_uns = "SELECT queuename as col FROM $DBTable
-WHERE time >= '$start' AND time <= '$end' AND event IN ('ABANDON', 'EXITWITHTIMEOUT') AND queuename IN ($queue)";
-//query did all
-//$q_did = "SELECT callid, data1 as col FROM $DBTable
-//WHERE time >= '$start' AND time <= '$end' AND event = 'DID'";
-//query abandon
-//$q_temp = "CREATE TEMPORARY TABLE abandon SELECT callid FROM $DBTable WHERE time >= '$start' AND time <= '$end' AND event = 'ABANDON';";
-//$q_aban = "SELECT data1 as col FROM $DBTable as queuelog, abandon WHERE time >= '$start' AND time <= '$end' AND event = 'DID' AND queuelog.callid = abandon.callid;";
-//$q_drop = "DROP TABLE abandon;";
-
-function array_mesh() {
-	$numargs = func_num_args();
-	$arg_list = func_get_args();
-	$out = array();
-	for ($i = 0; $i < $numargs; $i++) {
-		$in = $arg_list[$i];
-		foreach ($in as $key => $value) {
-			if (array_key_exists($key, $out)) {
-				$sum = $in[$key] + $out[$key];
-				$out[$key] = $sum;
-			} else {
-				$out[$key] = $in[$key];
-			}
-		}
-	}
-	return $out;
+// Window compared with the one of the session: the one just before
+// it, the same dates a week, month or year earlier, or given dates
+$vs = isset($_GET['vs']) ? $_GET['vs'] : 'prev';
+$shifts = array('week' => '-1 week', 'month' => '-1 month', 'year' => '-1 year');
+$ts_start = strtotime($start);
+$ts_end = strtotime($end);
+if (isset($shifts[$vs])) {
+	$vs_start = date('Y-m-d H:i:s', strtotime($shifts[$vs], $ts_start));
+	$vs_end = date('Y-m-d H:i:s', strtotime($shifts[$vs], $ts_end));
+} elseif ($vs == 'custom' && isset($_GET['vs_start']) && isset($_GET['vs_end'])
+	&& strtotime($_GET['vs_start']) && strtotime($_GET['vs_end'])) {
+	$vs_start = date('Y-m-d H:i:s', strtotime($_GET['vs_start']));
+	$vs_end = date('Y-m-d H:i:s', strtotime($_GET['vs_end']));
+} else {
+	$vs = 'prev';
+	$vs_start = date('Y-m-d H:i:s', $ts_start - ($ts_end - $ts_start + 1));
+	$vs_end = date('Y-m-d H:i:s', $ts_start - 1);
 }
 
-function array_min() {
-	$numargs = func_num_args();
-	$arg_list = func_get_args();
-	$out = array();
-	for ($i = 0; $i < $numargs; $i++) {
-		$in = $arg_list[$i];
-		foreach ($in as $key => $value) {
-			if (array_key_exists($key, $out)) {
-				$sum = $in[$key] - $out[$key];
-				$out[$key] = $sum;
-			} else {
-				$out[$key] = $in[$key];
-			}
-		}
-	}
-	return $out;
-}
+// Counters per window and queue, against the target of each queue
+$sla = new ServiceLevel($sla_thresholds);
+$sql = compare_sql($DBTable, $queue, $sla->sqlTarget($connection), $start, $end, $vs_start, $vs_end);
 
-function arr_cnt($res) {
-	$out = array();
-	$i = 0;
-	foreach ($res as $key => $row) {
-		$i = $i + 1;
-		$count[$i] = $row['col'];
-	}
-	$out = array_count_values($count);
-	return $out;
+$ques = array();
+foreach (explode(',', $queue) as $q) {
+	$ques[] = trim($q, "'");
 }
-
-//queue
-$ques = explode(',', $queue);
 sort($ques, SORT_STRING);
-foreach ($ques as $r => $v) {
-	$ques2[] = trim($v, "'");
-}
-$qpattern = array_flip($ques2);
-$qpattern2 = array_min($qpattern, $qpattern);
 
-$resans = $connection->query($q_ans);
-$queueans = arr_cnt($resans);
-ksort($queueans, SORT_STRING);
-$queueans = array_mesh($queueans, $qpattern2);
-ksort($queueans, SORT_STRING);
-
-$resuns = $connection->query($q_uns);
-$queueuns = arr_cnt($resuns);
-ksort($queueuns, SORT_STRING);
-$queueuns = array_mesh($queueuns, $qpattern2);
-ksort($queueuns, SORT_STRING);
+function compare_blank() {
+	return array('all' => 0, 'ans' => 0, 'uns' => 0, 'sla' => 0, 'aht' => 0);
+}
 
-$queueall = array_mesh($queueans, $queueuns);
-ksort($queueall, SORT_STRING);
+$stats = array();
+foreach ($ques as $que) {
+	$stats['cur'][$que] = compare_blank();
+	$stats['vs'][$que] = compare_blank();
+}
+$res = $connection->query($sql);
+if ($res) {
+	while ($row = $res->fetch_assoc()) {
+		$all = $row['ans'] + $row['uns'];
+		// Service level counts the abandons against the threshold
+		$stats[$row['win']][$row['queuename']] = array(
+			'all' => (int) $all,
+			'ans' => (int) $row['ans'],
+			'uns' => (int) $row['uns'],
+			'sla' => $all ? round($row['sla'] * 100 / $all, 2) : 0,
+			'aht' => $row['ans'] ? round($row['talk'] / $row['ans']) : 0,
+		);
+	}
+	$res->free();
+}
 
 $head_q = array('Очереди', 'Всего', 'Отвеч.', 'Пропущ.');
 
-$compare_col = array();
-$compare_tab = array();
-$compare_col = array_map(null, $ques, $queueall, $queueans, $queueuns);
-$compare_tab = array_map(null, $ques, $queueall, $queueans, $queueuns);
-$percent = array();
-foreach ($compare_tab as $key => $val) {
-	$que = $val[0];
-	//$percent[$val[0]] = round(100 / ($val[1] / $val[3]),2);
-	$percent[$que] = round($val[3] * 100 / ($val[1]), 2);
-	$compare_per[] = array($val[0], $val[1], $val[2], $val[3], $percent[$val[0]] . "%");
+$compare_col = array($head_q);
+$compare_per = array();
+foreach ($ques as $que) {
+	$cur = $stats['cur'][$que];
+	$old = $stats['vs'][$que];
+	$compare_col[] = array($que, $cur['all'], $cur['ans'], $cur['uns']);
+	$compare_per[] = array($que, $cur['all'], $cur['ans'], $cur['uns'],
+		($cur['all'] ? round($cur['uns'] * 100 / $cur['all'], 2) : 0) . "%",
+		$cur['sla'] . "%", $cur['aht'],
+		$old['all'], $cur['all'] - $old['all'], $cur['ans'] - $old['ans'], $cur['uns'] - $old['uns'],
+		round($cur['sla'] - $old['sla'], 2), $cur['aht'] - $old['aht']);
 }
 
-array_unshift($compare_col, $head_q);
-//$resdrop = $connection->query($q_drop);
-$resans->free();
-$resuns->free();
-
-//print_r($compare_per);
-// print_r($queueans);
-// echo "<br/>";
-// print_r($queueuns);
-// echo "<br/>";
-// print_r($queueall);
-// echo "<br/>";
-// print_r($ques);
-// echo "<br/>";
-
-//did
-// $resdid = $connection->query($q_did);
-// $didall = arr_cnt($resdid);
-// ksort($didall, SORT_STRING);
-
-// if ($connection->query($q_temp)) {
-// 	$resaban = $connection->query($q_aban);
-// 	$diduns = arr_cnt($resaban);
-// 	ksort($diduns, SORT_STRING);
-// } else {
-// 	$diduns = array();
-// }
-
-// $didname = array_keys($didall);
-// foreach ($didname as $k => $v) {
-// 	$didnamestr[] = "'" . $v . "'";
-// }
-// sort($didnamestr, SORT_STRING);
-
-// $didiff = array_diff_key($didall, $diduns);
-// $didiff = array_min($didiff, $didiff);
-// $diduns2 = $didiff + $diduns;
-// ksort($diduns2, SORT_STRING);
-
-// $didans = array_min($diduns2, $didall);
-
-// $head_d = array('Номера', 'Всего', 'Отвеч.', 'Пропущ.');
-
-// $compare_d = array();
-// $compare_d2 = array();
-// $compare_d = array_map(null, $didnamestr, $didall, $didans, $diduns2);
-// $compare_d2 = array_map(null, $didnamestr, $didall, $didans, $diduns2);
-
-// array_unshift($compare_d, $head_d);
-
-// $resdrop = $connection->query($q_drop);
-
-// $resdid->free();
-//$resaban->free();
-
 $connection->close();
 ?>
 <!DOCTYPE html>
@@ -239,12 +155,20 @@ $connection->close();
         data.addColumn('number', 'Отвеч.');
         data.addColumn('number', 'Проп.');
         data.addColumn('string', 'Проц. проп.');
+        data.addColumn('string', 'SLA');
+        data.addColumn('number', 'AHT, с');
+        data.addColumn('number', 'Всего (сравн.)');
+        data.addColumn('number', 'Δ Всего');
+        data.addColumn('number', 'Δ Отвеч.');
+        data.addColumn('number', 'Δ Проп.');
+        data.addColumn('number', 'Δ SLA, %');
+        data.addColumn('number', 'Δ AHT, с');
         data.addRows(
             <?php print_r(json_encode($compare_per));?>
           );
         var table = new google.visualization.Table(document.getElementById('tableQueue'));
 
-        table.draw(data, {showRowNumber: true, width: '800px', height: '400px'});
+        table.draw(data, {showRowNumber: true, width: '1200px', height: '400px'});
       }
 
 
@@ -258,6 +182,20 @@ $connection->close();
 <div id="main">
     <div id="contents">
       <h1>Сравнение принятых / пропущенных вызовов за выбранный период</h1>
+      <div>
+        Сравнить с: <?php echo $vs_start . " - " . $vs_end ?>
+        &nbsp;&nbsp;<a href="?vs=prev">предыдущий период</a>
+        | <a href="?vs=week">неделя назад</a>
+        | <a href="?vs=month">месяц назад</a>
+        | <a href="?vs=year">год назад</a>
+        <form action="compare.php" method="get" style="display: inline;">
+          <input type="hidden" name="vs" value="custom">
+          <input type="text" name="vs_start" value="<?php echo $vs_start ?>" size=19>
+          <input type="text" name="vs_end" value="<?php echo $vs_end ?>" size=19>
+          <input type="submit" value="OK">
+        </form>
+      </div>
+      <br/>
       <div id="columnchart_queue" style="width: 800px; height: 400px;"></div>
        <br/>
       <div id="tableQueue"></div>
@@ -0,0 +1,178 @@
+<?php
+
+/**
+ * Class Concurrency
+ * Sweep line over a time ordered stream of +1/-1 changes: for every
+ * series (waiting callers, staffed agents...) the exact maximum and
+ * the time weighted average level in each interval of a window.
+ */
+
+class Concurrency {
+
+	/**
+	 * Seconds per interval, intervals start at local midnight and
+	 * follow the local clock across daylight saving changes
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Interval = 3600;
+
+	/**
+	 * First second of the window
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_from;
+
+	/**
+	 * Second after the end of the window
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_to;
+
+	/**
+	 * Current level by series
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_level = array();
+
+	/**
+	 * Time the sweep reached by series
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_at = array();
+
+	/**
+	 * Maximum level by series and interval start
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_max = array();
+
+	/**
+	 * Level seconds by series and interval start
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_area = array();
+
+	/**
+	 * Concurrency::__construct()
+	 *
+	 * @access public
+	 * @param int $from Unix timestamp, inclusive
+	 * @param int $to Unix timestamp, inclusive
+	 * @return void
+	 */
+	public function __construct($from, $to) {
+		$this->_from = $from;
+		$this->_to = $to + 1;
+	}
+
+	/**
+	 * Concurrency::interval()
+	 *
+	 * Interval holding $ts, its bounds taken from the local clock
+	 * of its day so an hour stays an hour when the offset changes
+	 *
+	 * @access private
+	 * @param int $ts
+	 * @return array array(first second, first second of the next)
+	 */
+	private function interval($ts) {
+		list($y, $m, $d, $h, $i, $s) = explode(' ', date('Y n j G i s', $ts));
+		$k = (int) floor(($h * 3600 + $i * 60 + $s) / $this->Interval);
+		return array(mktime(0, 0, $k * $this->Interval, $m, $d, $y), mktime(0, 0, ($k + 1) * $this->Interval, $m, $d, $y));
+	}
+
+	/**
+	 * Concurrency::advance()
+	 *
+	 * Carry the current level of a series up to $ts
+	 *
+	 * @access private
+	 * @param string $series
+	 * @param int $ts
+	 * @return void
+	 */
+	private function advance($series, $ts) {
+		if (!isset($this->_level[$series])) {
+			$this->_level[$series] = 0;
+			$this->_at[$series] = $this->_from;
+		}
+		$level = $this->_level[$series];
+		$t = max($this->_at[$series], $this->_from);
+		$end = min($ts, $this->_to);
+		while ($t < $end) {
+			list($i, $next) = $this->interval($t);
+			// A bound in a skipped local hour must not stall the sweep
+			$stop = min(max($next, $t + 1), $end);
+			$max = isset($this->_max[$series][$i]) ? $this->_max[$series][$i] : 0;
+			$this->_max[$series][$i] = max($max, $level);
+			$area = isset($this->_area[$series][$i]) ? $this->_area[$series][$i] : 0;
+			$this->_area[$series][$i] = $area + $level * ($stop - $t);
+			$t = $stop;
+		}
+		$this->_at[$series] = max($this->_at[$series], $ts);
+	}
+
+	/**
+	 * Concurrency::change()
+	 *
+	 * Changes must come in time order, before the window too:
+	 * they set the level the window starts with
+	 *
+	 * @access public
+	 * @param string $series
+	 * @param int $ts Unix timestamp
+	 * @param int $delta
+	 * @return void
+	 */
+	public function change($series, $ts, $delta) {
+		$this->advance($series, $ts);
+		$level = max(0, $this->_level[$series] + $delta);
+		$this->_level[$series] = $level;
+		if ($ts >= $this->_from && $ts < $this->_to) {
+			list($i) = $this->interval($ts);
+			if (!isset($this->_max[$series][$i]) || $this->_max[$series][$i] < $level) {
+				$this->_max[$series][$i] = $level;
+			}
+		}
+	}
+
+	/**
+	 * Concurrency::result()
+	 *
+	 * Maximum and average level of a series in every interval of
+	 * the window, a series never changed is 0 throughout
+	 *
+	 * @access public
+	 * @param string $series
+	 * @return array Interval start timestamp => array('max' => , 'avg' => )
+	 */
+	public function result($series) {
+		$this->advance($series, $this->_to);
+		$result = array();
+		foreach ($this->_area[$series] as $i => $area) {
+			list(, $next) = $this->interval($i);
+			$from = max($i, $this->_from);
+			$to = min($next, $this->_to);
+			$result[$i] = array(
+				'max' => $this->_max[$series][$i],
+				'avg' => $area / ($to - $from),
+			);
+		}
+		return $result;
+	}
+
+}
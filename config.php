@@ -1,5 +1,6 @@
 <?php
 require_once "misc.php";
+require_once "db.class.php";
 
 $DBServer = 'localhost';
 $DBUser = 'freepbxuser';
@@ -9,17 +10,36 @@ $DBTable = 'queuelog';
 
 define('RECPATH',"/var/spool/asterisk/monitor/");
 
-$connection = new mysqli($DBServer, $DBUser, $DBPass, $DBName);
-$connection->set_charset('utf8');
-
-// check connection
-if ($connection->connect_error) {
-	trigger_error('Database connection failed: ' . $connection->connect_error, E_USER_ERROR);
+// Queuelog rows the agent and queue lists of index.php are taken from
+$dict_agents = "agent != 'NONE' AND agent != '' AND agent NOT LIKE 'Local%' AND agent NOT LIKE 'PJSIP%'";
+$dict_queues = "queuename != 'NONE' AND queuename != ''";
+// Hide agents and queues not seen in queuelog for this many days, 0 shows all
+$dict_days = 0;
+// Service level thresholds in seconds by queue, '*' for the other
+// queues. The first one is the target, the others are reported next
+// to it. Levels come from queuelog_hist, a change applies to history.
+$sla_thresholds = array(
+	'*' => array(20, 30, 60),
+);
+
+// Connections are opened on first use: $db->get('cdr') for queuelog
+// and cdr, $db->get('asterisk') for the FreePBX configuration
+$db = new Db(array(
+	'cdr' => array($DBServer, $DBUser, $DBPass, $DBName),
+	'asterisk' => array('localhost', 'freepbxuser', '', 'asterisk'),
+));
+// Web requests reuse pooled connections instead of a handshake each
+$db->Persistent = (php_sapi_name() != 'cli');
+// Host of a read replica for the reports, empty to read from $DBServer
+$db->Replica['cdr'] = '';
+
+// Pages without database work (realtime, AMI polling, session
+// variables) define QSTATS_NODB before including this file, the
+// ones writing to it (cron, sync, schema) define QSTATS_WRITE
+if (!defined('QSTATS_NODB')) {
+	$connection = $db->get('cdr', !defined('QSTATS_WRITE'));
 }
 
-$confpbx = new mysqli('localhost', 'freepbxuser', '', 'asterisk');
-$confpbx->set_charset('utf8');
-
 
 //$user = $_SERVER['PHP_AUTH_USER'];
 //$pass = $_SERVER['PHP_AUTH_PW'];
@@ -46,6 +66,25 @@ $config['authtype'] = 'plaintext';
 $config['cookiefile'] = null;
 $config['debug'] = false;
 
+// Persistent AMI session kept by amigw.php, Ajam falls back to rawman
+// when the gateway is not running. Leave 'gateway' empty to disable.
+$config['amihost'] = '127.0.0.1';
+$config['amiport'] = 5038;
+$config['gateway'] = 'unix:///tmp/qstats-amigw.sock';
+// Seconds an events.php stream lasts before the browser reconnects.
+// Every open realtime tab holds one PHP worker for that long, set 0
+// on a small FPM pool to have the pages poll ajam.php instead.
+$config['stream'] = 600;
+
+// Seconds a reply of these read-only actions is shared between
+// all realtime viewers, one request per interval reaches Asterisk
+$config['snapshot'] = array(
+	'QueueStatus' => 0.9,
+	'QueueSummary' => 0.9,
+	'CoreShowChannels' => 0.9,
+	'PJSIPShowRegistrationInboundContactStatuses' => 30,
+);
+
 
 // Available languages "en", "ru"
 $language = "ru";
@@ -0,0 +1,71 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Incremental maintenance of the tables fed from queuelog.
+// Run from cron every minute:
+// * * * * * php /var/www/html/queue-stats/cron.php
+
+if (php_sapi_name() != 'cli') {
+	header('HTTP/1.1 403 Forbidden');
+	exit;
+}
+
+chdir(dirname(__FILE__));
+
+// Overlapping runs would count the same rows twice
+$lock = fopen(sys_get_temp_dir() . '/qstats_cron.lock', 'c');
+if (!flock($lock, LOCK_EX | LOCK_NB)) {
+	exit;
+}
+
+define('QSTATS_WRITE', true);
+require_once "config.php";
+require_once "rollup.class.php";
+require_once "dictionary.class.php";
+require_once "callerindex.class.php";
+require_once "callfacts.class.php";
+require_once "timehist.class.php";
+
+$rollup = new Rollup($connection, $DBTable);
+$rollup->install();
+$rollup->update();
+
+$agents = new Dictionary($connection, $DBTable, 'agents_new', 'agent', 'agent', $dict_agents);
+$agents->install();
+$agents->update();
+
+$queues = new Dictionary($connection, $DBTable, 'queues_new', 'queuename', 'queuename', $dict_queues);
+$queues->install();
+$queues->update();
+
+$callers = new CallerIndex($connection, $DBTable);
+$callers->install();
+$callers->update();
+
+$facts = new CallFacts($connection, $DBTable);
+$facts->install();
+$facts->update();
+
+$hist = new TimeHist($connection, $DBTable);
+$hist->install();
+$hist->update();
+
+$connection->close();
+?>
@@ -0,0 +1,111 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// DataTables server-side processing for the reports of reports.php:
+// the page asks for one sorted and filtered slice of the rows at a time
+// instead of getting the whole report inline.
+
+require_once "config.php";
+include "sesvars.php";
+require_once "reports.php";
+require_once "recindex.class.php";
+session_write_close();
+
+$report = isset($_REQUEST['report']) ? export_report($_REQUEST['report']) : null;
+if ($report === null || !isset($report['columns'])) {
+	header('HTTP/1.1 404 Not Found');
+	exit;
+}
+
+$draw = isset($_REQUEST['draw']) ? (int) $_REQUEST['draw'] : 0;
+$offset = isset($_REQUEST['start']) ? max(0, (int) $_REQUEST['start']) : 0;
+$length = isset($_REQUEST['length']) ? (int) $_REQUEST['length'] : 100;
+// "All" is -1, still a page
+if ($length < 1 || $length > 1000) {
+	$length = 1000;
+}
+
+$order = array();
+if (isset($_REQUEST['order']) && is_array($_REQUEST['order'])) {
+	foreach ($_REQUEST['order'] as $o) {
+		$col = isset($o['column']) ? (int) $o['column'] : -1;
+		if (isset($report['columns'][$col])) {
+			$dir = (isset($o['dir']) && $o['dir'] == 'desc') ? 'desc' : 'asc';
+			$order[] = $report['columns'][$col] . " " . $dir;
+		}
+	}
+}
+if (!$order) {
+	$order[] = $report['columns'][0] . " asc";
+}
+// Equal sort values keep their order from one page to the next
+$order[] = $report['key'];
+
+$where = $report['where'];
+$filter = "";
+if (isset($_REQUEST['search']['value']) && $_REQUEST['search']['value'] !== '') {
+	// Prefix matches, an index on the column can still be used
+	$value = addcslashes($connection->real_escape_string($_REQUEST['search']['value']), '%_');
+	$match = array();
+	foreach ($report['search'] as $col) {
+		$match[] = "$col like '$value%'";
+	}
+	$filter = " and (" . implode(" or ", $match) . ")";
+}
+
+function datatable_count($sql) {
+	global $connection;
+	$res = $connection->query($sql);
+	if (!$res) {
+		return 0;
+	}
+	$row = $res->fetch_row();
+	$res->free();
+	return (int) $row[0];
+}
+
+$total = datatable_count("select count(*) from " . $report['from'] . " where $where");
+$filtered = ($filter === "") ? $total : datatable_count("select count(*) from " . $report['from'] . " where $where$filter");
+
+$data = array();
+$res = $connection->query("select " . $report['select'] . " from " . $report['from'] . " where $where$filter order by " . implode(", ", $order) . " limit $offset, $length");
+if ($res) {
+	// Only the recordings of the rows shown are looked up
+	$recs = isset($report['recording']) ? new RecIndex(RECPATH) : null;
+	while ($row = $res->fetch_assoc()) {
+		if ($recs !== null) {
+			list($file, $time) = $report['recording'];
+			$path = $recs->find($row[$file], $row[$time]);
+			$row['rec'] = $path ? base64_encode($path) : null;
+		}
+		$data[] = $row;
+	}
+	$res->free();
+}
+$connection->close();
+
+header('Content-Type: application/json; charset=utf-8');
+echo json_encode(array(
+	'draw' => $draw,
+	'recordsTotal' => $total,
+	'recordsFiltered' => $filtered,
+	'data' => $data,
+));
+?>
@@ -0,0 +1,118 @@
+<?php
+
+/**
+ * Class Db
+ * Database connections opened on first use. Web requests can reuse
+ * persistent connections, checked with a ping before they are handed
+ * out, and the reports can be sent to a read replica.
+ */
+
+class Db {
+
+	/**
+	 * Connection settings: name => array(host, user, password, database)
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_servers;
+
+	/**
+	 * Connections opened so far: name or name/replica => mysqli
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_links = array();
+
+	/**
+	 * Reuse persistent connections (p: hosts)
+	 *
+	 * @var boolean
+	 * @access public
+	 */
+	public $Persistent = false;
+
+	/**
+	 * Read replica hosts: name => host
+	 *
+	 * @var array
+	 * @access public
+	 */
+	public $Replica = array();
+
+	/**
+	 * Db::__construct()
+	 *
+	 * @access public
+	 * @param array $servers name => array(host, user, password, database)
+	 * @return void
+	 */
+	public function __construct($servers) {
+		$this->_servers = $servers;
+		// PHP 8.1 throws on mysqli errors by default, this code checks
+		// the return values: a replica down must give false, not die
+		mysqli_report(MYSQLI_REPORT_OFF);
+	}
+
+	/**
+	 * Db::connect()
+	 *
+	 * @access private
+	 * @param string $host
+	 * @param array $server
+	 * @return mysqli|boolean
+	 */
+	private function connect($host, $server) {
+		$link = @new mysqli(($this->Persistent ? 'p:' : '') . $host, $server[1], $server[2], $server[3]);
+		if ($link->connect_error) {
+			return false;
+		}
+		// A pooled connection may have been closed by the server
+		if ($this->Persistent && !@$link->ping()) {
+			$link = @new mysqli($host, $server[1], $server[2], $server[3]);
+			if ($link->connect_error) {
+				return false;
+			}
+		}
+		$link->set_charset('utf8');
+		return $link;
+	}
+
+	/**
+	 * Db::get()
+	 *
+	 * Connection to a database, opened on the first call
+	 *
+	 * @access public
+	 * @param string $name
+	 * @param boolean $report Read only queries, may go to the replica
+	 * @return mysqli
+	 */
+	public function get($name, $report = false) {
+		$server = $this->_servers[$name];
+		$key = $name;
+		if ($report && !empty($this->Replica[$name])) {
+			$key = $name . '/replica';
+			if (!isset($this->_links[$key])) {
+				$link = $this->connect($this->Replica[$name], $server);
+				// A replica down is not an outage, the primary answers
+				if ($link === false) {
+					trigger_error("Db: replica of $name unavailable", E_USER_WARNING);
+					return $this->get($name);
+				}
+				$this->_links[$key] = $link;
+			}
+			return $this->_links[$key];
+		}
+		if (!isset($this->_links[$key])) {
+			$link = $this->connect($server[0], $server);
+			if ($link === false) {
+				trigger_error('Database connection failed: ' . mysqli_connect_error(), E_USER_ERROR);
+			}
+			$this->_links[$key] = $link;
+		}
+		return $this->_links[$key];
+	}
+
+}
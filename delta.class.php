@@ -0,0 +1,137 @@
+<?php
+
+/**
+ * Class Delta
+ * Turns AMI events into changes of the records returned by
+ * ajam.php for QueueStatus and CoreShowChannels, so realtime
+ * pages can patch their tables instead of reloading them.
+ */
+
+class Delta {
+
+	/**
+	 * Delta::parse()
+	 *
+	 * Headers of an AMI message
+	 *
+	 * @access public
+	 * @param string $msg
+	 * @return array
+	 */
+	public function parse($msg) {
+		$headers = array();
+		foreach (explode("\r\n", $msg) as $line) {
+			$pair = explode(': ', $line, 2);
+			if (count($pair) == 2 && !isset($headers[$pair[0]])) {
+				$headers[$pair[0]] = $pair[1];
+			}
+		}
+		return $headers;
+	}
+
+	/**
+	 * Delta::pick()
+	 *
+	 * @access private
+	 * @param array $headers
+	 * @param array $fields Record field => event header
+	 * @return array
+	 */
+	private function pick($headers, $fields) {
+		$record = array();
+		foreach ($fields as $field => $header) {
+			if (isset($headers[$header])) {
+				$record[$field] = $headers[$header];
+			}
+		}
+		return $record;
+	}
+
+	/**
+	 * Delta::convert()
+	 *
+	 * Change described by an AMI event
+	 *
+	 * @access public
+	 * @param array $headers Event headers
+	 * @return array|null array(action, op, record), op is set or del
+	 */
+	public function convert($headers) {
+		if (!isset($headers['Event'])) {
+			return null;
+		}
+		$member = array('Queue' => 'Queue', 'Name' => 'MemberName', 'Location' => 'Interface',
+			'StateInterface' => 'StateInterface', 'Membership' => 'Membership', 'Penalty' => 'Penalty',
+			'CallsTaken' => 'CallsTaken', 'LastCall' => 'LastCall', 'LastPause' => 'LastPause',
+			'InCall' => 'InCall', 'Status' => 'Status', 'Paused' => 'Paused', 'PausedReason' => 'PausedReason');
+		$entry = array('Queue' => 'Queue', 'Position' => 'Position', 'Channel' => 'Channel',
+			'Uniqueid' => 'Uniqueid', 'CallerIDNum' => 'CallerIDNum', 'CallerIDName' => 'CallerIDName',
+			'ConnectedLineNum' => 'ConnectedLineNum', 'ConnectedLineName' => 'ConnectedLineName');
+		$channel = array('Channel' => 'Channel', 'Uniqueid' => 'Uniqueid', 'Linkedid' => 'Linkedid',
+			'ChannelState' => 'ChannelState', 'ChannelStateDesc' => 'ChannelStateDesc',
+			'CallerIDNum' => 'CallerIDNum', 'CallerIDName' => 'CallerIDName',
+			'ConnectedLineNum' => 'ConnectedLineNum', 'ConnectedLineName' => 'ConnectedLineName',
+			'Context' => 'Context', 'Exten' => 'Exten', 'Priority' => 'Priority',
+			'Application' => 'Application', 'ApplicationData' => 'AppData');
+
+		switch ($headers['Event']) {
+		case 'QueueMemberStatus':
+		case 'QueueMemberAdded':
+		case 'QueueMemberPause':
+		case 'QueueMemberPaused':
+		case 'QueueMemberPenalty':
+		case 'QueueMemberRinginuse':
+			$record = $this->pick($headers, $member);
+			// Asterisk 11 names the member headers differently
+			if (!isset($record['Location']) && isset($headers['Location'])) {
+				$record['Location'] = $headers['Location'];
+			}
+			if (!isset($record['Name']) && isset($headers['Membername'])) {
+				$record['Name'] = $headers['Membername'];
+			}
+			$record['Event'] = 'QueueMember';
+			return array('QueueStatus', 'set', $record);
+		case 'QueueMemberRemoved':
+			$record = $this->pick($headers, $member);
+			if (!isset($record['Location']) && isset($headers['Location'])) {
+				$record['Location'] = $headers['Location'];
+			}
+			$record['Event'] = 'QueueMember';
+			return array('QueueStatus', 'del', $record);
+		case 'QueueCallerJoin':
+		case 'Join':
+			$record = $this->pick($headers, $entry);
+			if (!isset($record['CallerIDNum']) && isset($headers['CallerID'])) {
+				$record['CallerIDNum'] = $headers['CallerID'];
+			}
+			$record['Event'] = 'QueueEntry';
+			$record['Wait'] = 0;
+			$record['_Start'] = time();
+			return array('QueueStatus', 'set', $record);
+		// QueueCallerAbandon is followed by QueueCallerLeave of the
+		// same caller, only the leave removes the entry
+		case 'QueueCallerLeave':
+		case 'Leave':
+			$record = $this->pick($headers, $entry);
+			$record['Event'] = 'QueueEntry';
+			return array('QueueStatus', 'del', $record);
+		case 'Newchannel':
+			$record = $this->pick($headers, $channel);
+			$record['Event'] = 'CoreShowChannel';
+			$record['_Start'] = time();
+			return array('CoreShowChannels', 'set', $record);
+		case 'Newstate':
+		case 'NewCallerid':
+		case 'NewConnectedLine':
+			$record = $this->pick($headers, $channel);
+			$record['Event'] = 'CoreShowChannel';
+			return array('CoreShowChannels', 'set', $record);
+		case 'Hangup':
+			$record = $this->pick($headers, $channel);
+			$record['Event'] = 'CoreShowChannel';
+			return array('CoreShowChannels', 'del', $record);
+		}
+		return null;
+	}
+
+}
@@ -0,0 +1,140 @@
+<?php
+require_once 'feeder.class.php';
+
+/**
+ * Class Dictionary
+ * Distinct values of a queuelog column (DIDs, agents, queues) with
+ * the time they were first and last seen, kept up to date from the
+ * new queuelog rows instead of a DISTINCT over the whole history.
+ */
+
+class Dictionary extends Feeder {
+
+	/**
+	 * Dictionary table and its key column
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Table;
+	public $Column;
+
+	/**
+	 * SQL expression of the value and filter of the rows it comes from
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_source;
+	private $_where;
+
+	/**
+	 * Dictionary::__construct()
+	 *
+	 * @access public
+	 * @param mysqli $db
+	 * @param string $table Queuelog table name
+	 * @param string $dict Dictionary table
+	 * @param string $column Key column of the dictionary
+	 * @param string $source Queuelog expression giving the value
+	 * @param string $where Queuelog rows to take values from
+	 * @return void
+	 */
+	public function __construct($db, $table, $dict, $column, $source, $where = '1') {
+		parent::__construct($db, $table);
+		$this->_name = 'dict_' . $dict;
+		$this->Table = $dict;
+		$this->Column = $column;
+		$this->_source = $source;
+		$this->_where = $where;
+	}
+
+	/**
+	 * Dictionary::install()
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		parent::install();
+		$ok = $this->_db->query("CREATE TABLE IF NOT EXISTS $this->Table (
+			$this->Column varchar(128) NOT NULL,
+			first_seen datetime DEFAULT NULL,
+			last_seen datetime DEFAULT NULL,
+			PRIMARY KEY ($this->Column),
+			KEY last_seen (last_seen)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+
+		// Tables made by older versions have the key column only
+		$res = $this->_db->query("SHOW COLUMNS FROM $this->Table LIKE 'last_seen'");
+		if ($res && $res->num_rows == 0) {
+			$ok = $this->_db->query("ALTER TABLE $this->Table ADD first_seen datetime DEFAULT NULL,
+				ADD last_seen datetime DEFAULT NULL, ADD KEY last_seen (last_seen)");
+		}
+		if ($res) {
+			$res->free();
+		}
+		$res = $this->_db->query("SHOW INDEX FROM $this->Table WHERE Column_name = '$this->Column' AND Non_unique = 0 AND Seq_in_index = 1");
+		if ($res && $res->num_rows == 0) {
+			// Upserts need the value to be unique
+			$ok = $this->_db->query("ALTER TABLE $this->Table ADD UNIQUE KEY $this->Column ($this->Column)");
+		}
+		if ($res) {
+			$res->free();
+		}
+		if (!$ok) {
+			trigger_error('Dictionary: ' . $this->_db->error, E_USER_WARNING);
+		}
+		return $ok;
+	}
+
+	/**
+	 * Dictionary::process()
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean
+	 */
+	protected function process($from_id, $to_id) {
+		$ok = $this->_db->query("INSERT INTO $this->Table ($this->Column, first_seen, last_seen)
+			SELECT $this->_source, MIN(time), MAX(time) FROM $this->_table
+			WHERE id > $from_id AND id <= $to_id AND ($this->_where)
+			GROUP BY 1
+			ON DUPLICATE KEY UPDATE first_seen = LEAST(COALESCE(first_seen, VALUES(first_seen)), VALUES(first_seen)),
+				last_seen = GREATEST(COALESCE(last_seen, VALUES(last_seen)), VALUES(last_seen))");
+		if (!$ok) {
+			return false;
+		}
+		return $this->maxTime($from_id, $to_id);
+	}
+
+	/**
+	 * Dictionary::active()
+	 *
+	 * Values seen during the last days, and the ones
+	 * not dated yet
+	 *
+	 * @access public
+	 * @param int $days 0 for all values
+	 * @return array
+	 */
+	public function active($days) {
+		$values = array();
+		$sql = "SELECT $this->Column FROM $this->Table";
+		if ($days > 0) {
+			$sql .= " WHERE last_seen IS NULL OR last_seen >= NOW() - INTERVAL " . (int) $days . " DAY";
+		}
+		$res = $this->_db->query($sql);
+		if (!$res) {
+			trigger_error('Dictionary: ' . $this->_db->error, E_USER_WARNING);
+			return $values;
+		}
+		while ($row = $res->fetch_row()) {
+			$values[] = $row[0];
+		}
+		$res->free();
+		return $values;
+	}
+
+}
@@ -19,55 +19,47 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "reportcache.class.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
 <?php
-$event_query = "select callid, event, data1 from queuelog where time >= '$start' and time <= '$end' and event in ('COMPLETEAGENT', 'COMPLETECALLER', 'DID', 'ABANDON') order by callid DESC;";
+// One pass keyed by callid: the DID of the call and how it ended,
+// then counters per DID
+$event_query = "SELECT did, SUM(abn) AS abn, SUM(ans AND NOT abn) AS ans, COUNT(*) AS total FROM (
+	SELECT callid, MAX(IF(event = 'DID', data1, NULL)) AS did, MAX(event = 'ABANDON') AS abn,
+		MAX(event IN ('COMPLETEAGENT', 'COMPLETECALLER')) AS ans
+	FROM $DBTable WHERE time >= '$start' AND time <= '$end'
+		AND event IN ('COMPLETEAGENT', 'COMPLETECALLER', 'DID', 'ABANDON')
+	GROUP BY callid) AS calls
+	WHERE did IS NOT NULL AND did != '' GROUP BY did";
 
-$event_res = $connection->query($event_query);
-
-$did_query = "select distinct(data1) from queuelog where event = 'DID';";
-
-$did_res = $connection->query($did_query);
-
-// $dids = array();
-$events = array();
-// $did = array();
-// $eve = array();
-
-$i = 0;
-while ($d = $did_res->fetch_array(MYSQLI_ASSOC)) {
-	if ($d['data1'] != "") {
-		$dids[] = $d;
+$cache = new ReportCache();
+$rows = $cache->get('dids', $start, $end, '', '', function () use ($connection, $event_query) {
+	$rows = array();
+	$event_res = $connection->query($event_query);
+	while ($e = $event_res->fetch_array(MYSQLI_ASSOC)) {
+		$rows[] = $e;
 	}
-}
-
-while ($e = $event_res->fetch_array(MYSQLI_ASSOC)) {
-	$ev = $e['event'];
-	$cd = $e['callid'];
-	$events["$cd"]["$ev"][] = $e;
-}
+	$event_res->free();
+	return $rows;
+});
 
-foreach ($dids as $val) {
-	$dd = $val['data1'];
-	$p = "/$dd/";
-	foreach ($events as $k => $v) {
-		$c = $events["$k"]['DID'][0]['data1'];
-		//$e[] = $events["$k"]["$v"];
-		if (preg_match($p, $c)) {
-			if ($events["$k"]['ABANDON']) {
-				$cnt["$dd"]['ABN'] += 1;
-				$cnt["Всего"]['ABN'] += 1;
-			} else if (($events["$k"]['COMPLETECALLER']) || ($events["$k"]['COMPLETEAGENT'])) {
-				$cnt["$dd"]['ANS'] += 1;
-				$cnt["Всего"]['ANS'] += 1;
-			}
-			$cnt["$dd"]['ALL'] += 1;
-			$cnt["Всего"]['ALL'] += 1;
-		}
+$cnt = array();
+foreach ($rows as $e) {
+	$dd = $e['did'];
+	if ($e['abn']) {
+		$cnt["$dd"]['ABN'] = (int) $e['abn'];
+		$cnt["Всего"]['ABN'] += $e['abn'];
+	}
+	if ($e['ans']) {
+		$cnt["$dd"]['ANS'] = (int) $e['ans'];
+		$cnt["Всего"]['ANS'] += $e['ans'];
 	}
+	$cnt["$dd"]['ALL'] = (int) $e['total'];
+	$cnt["Всего"]['ALL'] += $e['total'];
 }
+$connection->close();
 asort($cnt);
 $cnt = json_encode($cnt);
 // echo "<pre>";
@@ -20,6 +20,9 @@ along with Asterisk Call Center Stats.  If not, see
 
 require_once "config.php";
 include "sesvars.php";
+require_once "rollup.class.php";
+require_once "abandonstats.class.php";
+require_once "reportcache.class.php";
 ?>
 <!DOCTYPE html>
 <head>
@@ -36,16 +39,25 @@ include "sesvars.php";
 </head>
 <?php
 
-// ABANDONED CALLS
-
-$query = "SELECT time, queuename, agent, event, data1, data2, data3 FROM $DBTable ";
-$query .= "WHERE time >= '$start' AND time <= '$end' ";
-$query .= "AND queuename IN ($queue,'NONE') AND event IN ('ABANDON', 'EXITWITHTIMEOUT','COMPLETECALLER','COMPLETEAGENT','ADDMEMBER','REMOVEMEMBER','AGENTCALLBACKLOGIN','AGENTCALLBACKLOGOFF') ORDER BY time";
-
-$query_comb = "";
+// Calls and logins per day and hour of the day from the hourly rollup,
+// weekday and month buckets are sums of the days
+$cache = new ReportCache();
+list($counts, $agents) = $cache->get('distribution', $start, $end, $queue, '', function () use ($connection, $DBTable, $start, $end, $queue) {
+	$rollup = new Rollup($connection, $DBTable);
+	$day_hour = array('day' => 'LEFT(hour, 10)', 'hr' => 'HOUR(hour)');
+	$counts = $rollup->fetch($start, $end, array('ABANDON', 'EXITWITHTIMEOUT', 'COMPLETECALLER', 'COMPLETEAGENT', 'ADDMEMBER', 'REMOVEMEMBER', 'AGENTCALLBACKLOGIN', 'AGENTCALLBACKLOGOFF'), "$queue,'NONE'", null, $day_hour + array('event'));
+	// Agents answering, counted distinct in every bucket
+	$agents = $rollup->fetch($start, $end, array('COMPLETECALLER', 'COMPLETEAGENT'), $queue, null, $day_hour + array('agent'));
+	return array($counts, $agents);
+});
+
+$answered = 0;
+$unanswered = 0;
 $login = 0;
 $logoff = 0;
 $dias = Array();
+$horas = Array();
+$meses = Array();
 $logout_by_day = Array();
 $logout_by_hour = Array();
 $logout_by_dw = Array();
@@ -57,81 +69,94 @@ $lbah = Array();
 $lbawd = Array();
 $lbam = Array();
 
-$res = mysqli_query($connection, $query);
-
-if (mysqli_num_rows($res) > 0) {
-
-	while ($row = mysqli_fetch_row($res)) {
-		$partes_fecha = explode(" ", $row[0]);
-		$partes_hora = explode(":", $partes_fecha[1]);
-		$partes_mes = explode("-", $partes_fecha[0]);
-
-		$timestamp = return_timestamp($row[0]);
-		$day_of_week = date('w', $timestamp);
-
-		$dias[] = $partes_fecha[0];
-		$horas[] = $partes_hora[0];
-		$meses[] = $partes_mes[1];
-
-		if ($row[3] == "ABANDON" || $row[3] == "EXITWITHTIMEOUT") {
-			$unanswered++;
-			$unans_by_day["$partes_fecha[0]"]++;
-			$unans_by_hour["$partes_hora[0]"]++;
-			$unans_by_dw["$day_of_week"]++;
-			$unans_by_mes["$partes_mes[1]"]++;
-		}
-		if ($row[3] == "COMPLETECALLER" || $row[3] == "COMPLETEAGENT") {
-			$answered++;
-			$ans_by_day["$partes_fecha[0]"]++;
-			$ans_by_hour["$partes_hora[0]"]++;
-			$ans_by_dw["$day_of_week"]++;
-			$ans_by_mes["$partes_mes[1]"]++;
-
-			$total_time_by_day["$partes_fecha[0]"] += $row[5];
-			$total_hold_by_day["$partes_fecha[0]"] += $row[4];
-
-			$total_time_by_dw["$day_of_week"] += $row[5];
-			$total_hold_by_dw["$day_of_week"] += $row[4];
-
-			$total_time_by_hour["$partes_hora[0]"] += $row[5];
-			$total_hold_by_hour["$partes_hora[0]"] += $row[4];
-
-			$total_time_by_mes["$partes_mes[1]"] += $row[5];
-			$total_hold_by_mes["$partes_mes[1]"] += $row[4];
-
-			$lbad["$partes_fecha[0]"][$row[2]]++;
-			$lbah["$partes_hora[0]"][$row[2]]++;
-			$lbawd["$day_of_week"][$row[2]]++;
-			$lbam["$partes_mes[1]"][$row[2]]++;
-		}
-		if ($row[3] == "ADDMEMBER" || $row[3] == "AGENTCALLBACKLOGIN") {
-			$login++;
-			$login_by_day["$partes_fecha[0]"]++;
-			$login_by_hour["$partes_hora[0]"]++;
-			$login_by_dw["$day_of_week"]++;
-
-		}
-		if ($row[3] == "REMOVEMEMBER" || $row[3] == "AGENTCALLBACKLOGOFF") {
-			$logoff++;
-			$logout_by_day["$partes_fecha[0]"]++;
-			$logout_by_hour["$partes_hora[0]"]++;
-			$logout_by_dw["$day_of_week"]++;
-		}
-	}
-	$percent_unans_all = (100 / ($answered / $unanswered));
-	$percent_unans_all = number_format($percent_unans_all, 2);
-	$total_calls = $answered + $unanswered;
-	$dias = array_unique($dias);
-	$horas = array_unique($horas);
-	// $meses = array_unique($meses);
-	asort($dias);
-	asort($horas);
-	// asort($meses);
+$wdays = Array();
+$abandons = new AbandonStats();
+function bucket_add(&$arr, $key, $value) {
+	$arr[$key] = (isset($arr[$key]) ? $arr[$key] : 0) + $value;
+}
+
+foreach ($counts as $row) {
+	$day = $row['day'];
+	// Keys padded as the tables below read them: '00'..'23', '01'..'12'
+	$hour = sprintf('%02d', $row['hr']);
+	if (!isset($wdays[$day])) {
+		$wdays[$day] = date('w', strtotime($day));
+	}
+	$day_of_week = $wdays[$day];
+	$mes = substr($day, 5, 2);
+	$cnt = $row['cnt'];
+
+	$dias[$day] = $day;
+	$horas[$hour] = $hour;
+	$meses[$mes] = $mes;
+
+	switch ($row['event']) {
+	case 'ABANDON':
+	case 'EXITWITHTIMEOUT':
+		$abandons->addSums(array('day' => $day, 'hour' => $hour, 'dw' => $day_of_week, 'mes' => $mes),
+			$row['event'], $cnt, $row['sum_data3'], $row['sum_data2'], $row['sum_data1']);
+		break;
+	case 'COMPLETECALLER':
+	case 'COMPLETEAGENT':
+		$answered += $cnt;
+		bucket_add($ans_by_day, $day, $cnt);
+		bucket_add($ans_by_hour, $hour, $cnt);
+		bucket_add($ans_by_dw, $day_of_week, $cnt);
+		bucket_add($ans_by_mes, $mes, $cnt);
+
+		bucket_add($total_time_by_day, $day, $row['sum_data2']);
+		bucket_add($total_hold_by_day, $day, $row['sum_data1']);
+		bucket_add($total_time_by_dw, $day_of_week, $row['sum_data2']);
+		bucket_add($total_hold_by_dw, $day_of_week, $row['sum_data1']);
+		bucket_add($total_time_by_hour, $hour, $row['sum_data2']);
+		bucket_add($total_hold_by_hour, $hour, $row['sum_data1']);
+		bucket_add($total_time_by_mes, $mes, $row['sum_data2']);
+		bucket_add($total_hold_by_mes, $mes, $row['sum_data1']);
+		break;
+	case 'ADDMEMBER':
+	case 'AGENTCALLBACKLOGIN':
+		$login += $cnt;
+		bucket_add($login_by_day, $day, $cnt);
+		bucket_add($login_by_hour, $hour, $cnt);
+		bucket_add($login_by_dw, $day_of_week, $cnt);
+		break;
+	case 'REMOVEMEMBER':
+	case 'AGENTCALLBACKLOGOFF':
+		$logoff += $cnt;
+		bucket_add($logout_by_day, $day, $cnt);
+		bucket_add($logout_by_hour, $hour, $cnt);
+		bucket_add($logout_by_dw, $day_of_week, $cnt);
+		break;
+	}
+}
+
+foreach ($agents as $row) {
+	$day = $row['day'];
+	if (!isset($wdays[$day])) {
+		$wdays[$day] = date('w', strtotime($day));
+	}
+	$lbad[$day][$row['agent']] = 1;
+	$lbah[sprintf('%02d', $row['hr'])][$row['agent']] = 1;
+	$lbawd[$wdays[$day]][$row['agent']] = 1;
+	$lbam[substr($day, 5, 2)][$row['agent']] = 1;
+}
+unset($counts, $agents);
+
+$unans_stats = $abandons->result();
+$unanswered = $unans_stats['calls'];
+$unans_by_day = $abandons->calls('day');
+$unans_by_hour = $abandons->calls('hour');
+$unans_by_dw = $abandons->calls('dw');
+$unans_by_mes = $abandons->calls('mes');
+
+if ($answered > 0) {
+	$percent_unans_all = number_format($unanswered * 100 / $answered, 2);
 } else {
-	// No rows returned
-	$answered = 0;
-	$unanswered = 0;
+	$percent_unans_all = number_format(0, 2);
 }
+$total_calls = $answered + $unanswered;
+ksort($dias);
+ksort($horas);
 
 $login_agent_day = Array();
 $login_agent_hour = Array();
@@ -1,10 +1,24 @@
 <?php
+define('QSTATS_NODB', true);
+require_once 'config.php';
 require_once 'sendfile.class.php';
+require_once 'recindex.class.php';
+session_write_close();
 if (isset($_REQUEST['f'])) {
 	$fname = base64_decode($_REQUEST['f']);
 	$file =  $fname;
+	// Only recordings the pages listed are sent, checked against the
+	// cached listing of their day.
+	$recs = new RecIndex(RECPATH);
+	if (!$recs->exists($file)) {
+		header('HTTP/1.1 404 Not Found');
+		exit;
+	}
 	$send = new Sendfile;
 	$send->Path = $file;
+	// Let the web server send the file:
+	// $send->Offload = 'X-Accel-Redirect';
+	// $send->AccelPath = array(RECPATH => '/monitor/');
 	$send->send();
 	exit;
 }
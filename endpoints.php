@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
 ?>
 <!DOCTYPE html>
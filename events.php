@@ -0,0 +1,95 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Server-Sent Events stream of queue member, caller and channel
+// changes, fed by the AMI gateway (amigw.php). js/realtime.js
+// applies them to the records loaded from ajam.php.
+
+define('QSTATS_NODB', true);
+require_once "config.php";
+require_once "delta.class.php";
+
+// The stream is long lived, do not hold the session
+session_write_close();
+
+$sock = false;
+if (!empty($config['gateway']) && !empty($config['stream'])) {
+	$sock = @stream_socket_client($config['gateway'], $errno, $errstr, 1);
+}
+if (!$sock) {
+	// EventSource gives up on 503 and the page keeps polling
+	header('HTTP/1.1 503 Service Unavailable');
+	exit;
+}
+
+header('Content-Type: text/event-stream');
+header('Cache-Control: no-cache');
+header('X-Accel-Buffering: no');
+while (ob_get_level()) {
+	ob_end_flush();
+}
+
+// Browsers reconnect by themselves, a bounded lifetime
+// keeps stale workers from piling up. The stream holds a PHP
+// worker all along, see $config['stream'] in config.php.
+set_time_limit(0);
+$until = time() + (int) $config['stream'];
+
+fwrite($sock, "Action: GatewaySubscribe\r\n\r\n");
+echo "retry: 3000\n\n";
+flush();
+
+$delta = new Delta();
+$buf = '';
+while (time() < $until && !connection_aborted()) {
+	$read = array($sock);
+	$write = null;
+	$except = null;
+	if (@stream_select($read, $write, $except, 15) === 0) {
+		// Comment line, lets us notice a closed browser
+		echo ": ping\n\n";
+		flush();
+		continue;
+	}
+	$data = fread($sock, 65536);
+	if ($data === '' || $data === false) {
+		if (feof($sock)) {
+			break;
+		}
+		continue;
+	}
+	$buf .= $data;
+	$out = '';
+	while (($pos = strpos($buf, "\r\n\r\n")) !== false) {
+		$msg = substr($buf, 0, $pos);
+		$buf = substr($buf, $pos + 4);
+		$change = $delta->convert($delta->parse($msg));
+		if ($change !== null) {
+			list($action, $op, $record) = $change;
+			$out .= "data: " . json_encode(array('action' => $action, 'op' => $op, 'record' => $record)) . "\n\n";
+		}
+	}
+	if ($out !== '') {
+		echo $out;
+		flush();
+	}
+}
+fclose($sock);
+?>
@@ -24,6 +24,9 @@ require 'fpdf.php';
 
 class PDF extends FPDF {
 
+	var $fill = 0;
+	var $supercont = 1;
+
 	function Footer() {
 		global $lang;
 		global $language;
@@ -74,78 +77,83 @@ class PDF extends FPDF {
 
 		//$this->TableHeader($header, $w);
 
+		$this->TableStart();
+		foreach ($data as $row) {
+			$this->TableRow($row, $w);
+		}
+		$this->TableEnd($w);
+	}
+
+	function TableStart() {
 		//Color and font restoration
 		$this->SetFillColor(224, 235, 255);
 		$this->SetTextColor(0);
 		$this->SetFont('');
-		//Data
-		$fill = 0;
-		$supercont = 1;
-		foreach ($data as $row) {
-			$contador = 0;
-			foreach ($row as $valor) {
-				$this->Cell($w[$contador], 6, $valor, 'LR', 0, 'C', $fill);
-				$contador++;
-			}
-			$this->Ln();
-			$fill = !$fill;
-			if ($supercont % 40 == 0) {
-				$this->Cell(array_sum($w), 0, '', 'T');
-				$this->AddPage();
-				//$this->TableHeader($header, $w);
-				$this->SetFillColor(224, 235, 255);
-				$this->SetTextColor(0);
-				$this->SetFont('');
-			}
-			$supercont++;
+		$this->fill = 0;
+		$this->supercont = 1;
+	}
+
+	//One row at a time, rows can come straight from the database
+	function TableRow($row, $w) {
+		$contador = 0;
+		foreach ($row as $valor) {
+			$this->Cell($w[$contador], 6, $valor, 'LR', 0, 'C', $this->fill);
+			$contador++;
 		}
+		$this->Ln();
+		$this->fill = !$this->fill;
+		if ($this->supercont % 40 == 0) {
+			$this->Cell(array_sum($w), 0, '', 'T');
+			$this->AddPage();
+			//$this->TableHeader($header, $w);
+			$this->SetFillColor(224, 235, 255);
+			$this->SetTextColor(0);
+			$this->SetFont('');
+		}
+		$this->supercont++;
+	}
+
+	function TableEnd($w) {
 		$this->Cell(array_sum($w), 0, '', 'T');
 	}
 }
 
-function export_csv($header, $data) {
-	header("Content-Type: application/csv-tab-delimited-table");
-	header("Content-disposition: filename=table.csv");
-
+function csv_line($values) {
 	$linea = "";
-	foreach ($header as $valor) {
+	foreach ($values as $valor) {
 		$valor = iconv('UTF-8', 'windows-1251', $valor);
 		$linea .= "\"$valor\";";
 	}
 	$linea = substr($linea, 0, -1);
+	return $linea . "\r\n";
+}
+
+function export_csv($header, $data) {
+	header("Content-Type: application/csv-tab-delimited-table");
+	header("Content-disposition: filename=table.csv");
 
-	print $linea . "\r\n";
+	print csv_line($header);
 
 	foreach ($data as $valor) {
-		$linea = "";
-		foreach ($valor as $subvalor) {
-			$subvalor = iconv('UTF-8', 'windows-1251', $subvalor);
-			$linea .= "\"$subvalor\";";
-		}
-		$linea = substr($linea, 0, -1);
-		print $linea . "\r\n";
+		print csv_line($valor);
 	}
 }
 
-$headercsv = unserialize(rawurldecode($_POST['headcsv']));
-$header = unserialize(rawurldecode($_POST['head']));
-$data = unserialize(rawurldecode($_POST['rawdata']));
-$width = unserialize(rawurldecode($_POST['width']));
-$title = unserialize(rawurldecode($_POST['title']));
-$cover = unserialize(rawurldecode($_POST['cover']));
-
-if (isset($_POST['pdf']) || isset($_POST['pdf_x'])) {
+function new_pdf($header, $width) {
 	$pdf = new PDF();
 	$pdf->AddFont('ArialMT','','arialuni.php');
 	// $pdf->AddFont('ArialMT','B','arial.php');
 	$pdf->SetFont('ArialMT','',12);
-	// $pdf->SetFont('ArialMT','B',12); 
+	// $pdf->SetFont('ArialMT','B',12);
 	$pdf->SetAutoPageBreak(false);
 	$pdf->SetLeftMargin(1);
 	$pdf->SetRightMargin(1);
 	$pdf->AddPage();
 	$pdf->TableHeader($header, $width);
-	$pdf->FancyTable($header, $data, $width);
+	return $pdf;
+}
+
+function output_pdf($pdf, $title, $cover) {
 	$pdf->AddPage();
 	if ($cover != "") {
 		$pdf->Cover($cover);
@@ -154,6 +162,74 @@ if (isset($_POST['pdf']) || isset($_POST['pdf_x'])) {
 	$filename = $fn . ".pdf";
 	$pdf->Output($filename,"D");
 	//$pdf->Output('F', '/var/www/html/queue-stats/pdf/export.pdf', true);
+}
+
+// Report rebuilt from the session filters, rows are read
+// unbuffered and written out one by one
+if (isset($_POST['report'])) {
+	include "sesvars.php";
+	require_once "reports.php";
+	session_write_close();
+
+	$report = export_report($_POST['report'], $_POST);
+	if ($report === null) {
+		header('HTTP/1.1 404 Not Found');
+		exit;
+	}
+	$res = $connection->query($report['sql'], MYSQLI_USE_RESULT);
+	if (!$res) {
+		trigger_error('Export: ' . $connection->error, E_USER_ERROR);
+	}
+	$title = $report['title'];
+	$make_row = $report['row'];
+
+	if (isset($_POST['pdf']) || isset($_POST['pdf_x'])) {
+		$pdf = new_pdf($report['header'], $report['width']);
+		$pdf->TableStart();
+		while ($r = $res->fetch_assoc()) {
+			$line = $make_row($r);
+			if ($line !== null) {
+				$pdf->TableRow($line, $report['width']);
+			}
+		}
+		$pdf->TableEnd($report['width']);
+		$res->free();
+		$connection->close();
+		output_pdf($pdf, $title, $report['cover']);
+	} else {
+		header("Content-Type: application/csv-tab-delimited-table");
+		header("Content-disposition: filename=table.csv");
+		while (ob_get_level()) {
+			ob_end_flush();
+		}
+		print csv_line($report['header']);
+		$n = 0;
+		while ($r = $res->fetch_assoc()) {
+			$line = $make_row($r);
+			if ($line !== null) {
+				print csv_line($line);
+				if (++$n % 1000 == 0) {
+					flush();
+				}
+			}
+		}
+		$res->free();
+		$connection->close();
+	}
+	exit;
+}
+
+$headercsv = unserialize(rawurldecode($_POST['headcsv']));
+$header = unserialize(rawurldecode($_POST['head']));
+$data = unserialize(rawurldecode($_POST['rawdata']));
+$width = unserialize(rawurldecode($_POST['width']));
+$title = unserialize(rawurldecode($_POST['title']));
+$cover = unserialize(rawurldecode($_POST['cover']));
+
+if (isset($_POST['pdf']) || isset($_POST['pdf_x'])) {
+	$pdf = new_pdf($header, $width);
+	$pdf->FancyTable($header, $data, $width);
+	output_pdf($pdf, $title, $cover);
 } else {
 	export_csv($headercsv, $data);
 }
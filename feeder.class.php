@@ -0,0 +1,225 @@
+<?php
+
+/**
+ * Class Feeder
+ * Base for tables maintained incrementally from queuelog.
+ * Remembers the last processed queuelog id and hands new rows
+ * to the subclass in id ranges, one transaction per range.
+ */
+
+abstract class Feeder {
+
+	/**
+	 * Database connection
+	 *
+	 * @var mysqli
+	 * @access protected
+	 */
+	protected $_db;
+
+	/**
+	 * Source queuelog table
+	 *
+	 * @var string
+	 * @access protected
+	 */
+	protected $_table;
+
+	/**
+	 * Name of the feeder in the state table
+	 *
+	 * @var string
+	 * @access protected
+	 */
+	protected $_name;
+
+	/**
+	 * Queuelog ids processed per transaction
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Batch = 50000;
+
+	/**
+	 * Feeder::__construct()
+	 *
+	 * @access public
+	 * @param mysqli $db Connection to the queuelog database
+	 * @param string $table Queuelog table name
+	 * @return void
+	 */
+	public function __construct($db, $table) {
+		$this->_db = $db;
+		$this->_table = $table;
+	}
+
+	/**
+	 * Feeder::install()
+	 *
+	 * Create the state table shared by all feeders
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		return $this->_db->query("CREATE TABLE IF NOT EXISTS qstats_state (
+			name varchar(32) NOT NULL,
+			last_id bigint unsigned NOT NULL DEFAULT 0,
+			last_time datetime DEFAULT NULL,
+			PRIMARY KEY (name)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+	}
+
+	/**
+	 * Feeder::getState()
+	 *
+	 * Last processed queuelog id and the newest event time seen
+	 *
+	 * @access public
+	 * @return array
+	 */
+	public function getState() {
+		$state = array('last_id' => 0, 'last_time' => null);
+		$res = $this->_db->query("SELECT last_id, last_time FROM qstats_state WHERE name = '" . $this->_name . "'");
+		if ($res && $row = $res->fetch_assoc()) {
+			$state['last_id'] = (int) $row['last_id'];
+			$state['last_time'] = $row['last_time'];
+		}
+		if ($res) {
+			$res->free();
+		}
+		return $state;
+	}
+
+	/**
+	 * Feeder::setState()
+	 *
+	 * @access protected
+	 * @param int $last_id
+	 * @param string $last_time
+	 * @return boolean
+	 */
+	protected function setState($last_id, $last_time) {
+		$last_time = ($last_time === null) ? "NULL" : "'" . $this->_db->real_escape_string($last_time) . "'";
+		return $this->_db->query("INSERT INTO qstats_state (name, last_id, last_time)
+			VALUES ('" . $this->_name . "', " . (int) $last_id . ", $last_time)
+			ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), last_time = COALESCE(GREATEST(last_time, VALUES(last_time)), last_time, VALUES(last_time))");
+	}
+
+	/**
+	 * Feeder::update()
+	 *
+	 * Process every queuelog row added since the last run
+	 *
+	 * @access public
+	 * @return int|boolean Number of ids consumed, false on error
+	 */
+	public function update() {
+		$state = $this->getState();
+		$res = $this->_db->query("SELECT MAX(id) FROM $this->_table");
+		if (!$res) {
+			trigger_error(get_class($this) . ': ' . $this->_db->error, E_USER_WARNING);
+			return false;
+		}
+		$row = $res->fetch_row();
+		$res->free();
+		$max_id = (int) $row[0];
+
+		$from = $state['last_id'];
+		$done = 0;
+		while ($from < $max_id) {
+			$to = min($from + $this->Batch, $max_id);
+			$this->_db->begin_transaction();
+			$time = $this->process($from, $to);
+			if ($time === false) {
+				trigger_error(get_class($this) . ': ' . $this->_db->error, E_USER_WARNING);
+				$this->_db->rollback();
+				return false;
+			}
+			$this->setState($to, $time);
+			$this->_db->commit();
+			$done += $to - $from;
+			$from = $to;
+		}
+		return $done;
+	}
+
+	/**
+	 * Feeder::watermark()
+	 *
+	 * Start of the first hour that may still receive rows, every
+	 * hour before it is complete in the table of an hourly feeder
+	 *
+	 * @access public
+	 * @return int|null Unix timestamp
+	 */
+	public function watermark() {
+		$state = $this->getState();
+		if ($state['last_time'] === null) {
+			return null;
+		}
+		return strtotime(substr($state['last_time'], 0, 13) . ':00:00');
+	}
+
+	/**
+	 * Feeder::split()
+	 *
+	 * Whole-hour part of a window that an hourly table can serve
+	 *
+	 * @access public
+	 * @param string $start Y-m-d H:i:s, inclusive
+	 * @param string $end Y-m-d H:i:s, inclusive
+	 * @return array|null array(first hour, end hour exclusive) or null
+	 */
+	public function split($start, $end) {
+		$mark = $this->watermark();
+		if ($mark === null) {
+			return null;
+		}
+		$start_ts = strtotime($start);
+		$h0 = strtotime(date('Y-m-d H:00:00', $start_ts));
+		if ($h0 < $start_ts) {
+			$h0 += 3600;
+		}
+		$h1 = strtotime(date('Y-m-d H:00:00', strtotime($end) + 1));
+		$h1 = min($h1, $mark);
+		if ($h0 >= $h1) {
+			return null;
+		}
+		return array(date('Y-m-d H:i:s', $h0), date('Y-m-d H:i:s', $h1));
+	}
+
+	/**
+	 * Feeder::maxTime()
+	 *
+	 * Newest event time in an id range, used as the state watermark
+	 *
+	 * @access protected
+	 * @param int $from_id Exclusive
+	 * @param int $to_id Inclusive
+	 * @return string|null
+	 */
+	protected function maxTime($from_id, $to_id) {
+		$res = $this->_db->query("SELECT MAX(time) FROM $this->_table WHERE id > $from_id AND id <= $to_id");
+		if (!$res) {
+			return null;
+		}
+		$row = $res->fetch_row();
+		$res->free();
+		return $row[0];
+	}
+
+	/**
+	 * Feeder::process()
+	 *
+	 * Consume queuelog rows with $from_id < id <= $to_id
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean Newest event time in the range, false on error
+	 */
+	abstract protected function process($from_id, $to_id);
+
+}
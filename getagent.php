@@ -1,5 +1,7 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
+$confpbx = $db->get('asterisk');
 
 if ((isset($_POST['agentAdd'])) && (isset($_POST['agentCode']))) {
 	$agentadd = $_POST['agentAdd'];
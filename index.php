@@ -20,6 +20,7 @@ along with Asterisk Call Center Stats.  If not, see
 
 require_once "config.php";
 require_once "sesvars.php";
+require_once "dictionary.class.php";
 
 $start_today = date('Y-m-d 00:00:00');
 $end_today = date('Y-m-d 23:59:59');
@@ -69,20 +70,13 @@ $end_month_ts -= 86400;
 
 $end_month = date('Y-m-d', $end_month_ts);
 
-$query = "SELECT queuename FROM queues_new";
-$res = mysqli_query($connection, $query);
-while ($row = mysqli_fetch_row($res)) {
-	$colas[] = $row[0];
-}
+$queues = new Dictionary($connection, $DBTable, 'queues_new', 'queuename', 'queuename', $dict_queues);
+$colas = $queues->active($dict_days);
 
-$query = "SELECT agent FROM agents_new";
-$res = mysqli_query($connection, $query);
-while ($row = mysqli_fetch_row($res)) {
-	$agentes[] = $row[0];
-}
+$agents = new Dictionary($connection, $DBTable, 'agents_new', 'agent', 'agent', $dict_agents);
+$agentes = $agents->active($dict_days);
 
 mysqli_close($connection);
-$res->free();
 
 ?>
 
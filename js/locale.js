@@ -120,6 +120,10 @@ window.locale = {
             "Exit": "Exit",
             "ServiceLevel": "SL(sec)",
             "ServicelevelPerf": "SLP",
+            "ServiceLevelToday": "Service level today",
+            "Threshold": "Threshold(sec)",
+            "AnsweredWithin": "Answered within",
+            "AbandonedWithin": "Abandoned within",
             "LastCall": "LastCall",
             "CallsTaken": "CallsTaken",
             "1": "Avail",
@@ -264,6 +268,10 @@ window.locale = {
             "Exit": "Выйти",
             "ServiceLevel": "Ур. обсл.(сек)",
             "ServicelevelPerf": "Ур. обсл.",
+            "ServiceLevelToday": "Уровень обслуживания за сегодня",
+            "Threshold": "Порог(сек)",
+            "AnsweredWithin": "Отвечено за порог",
+            "AbandonedWithin": "Потеряно за порог",
             "LastCall": "Последн. выз.",
             "CallsTaken": "Принято",
             "1": "Свободен",
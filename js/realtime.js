@@ -0,0 +1,183 @@
+// Realtime records shared by realtime.php, queues.php, agents.php and calls.php.
+// The records of QueueStatus and CoreShowChannels are loaded once from ajam.php
+// and then patched with the changes streamed by events.php. Without the stream
+// (no AMI gateway, old browser) the pages poll ajam.php as before.
+window.Realtime = (function() {
+
+    var stores = {};
+    var stream = null;
+    var streaming = false;
+
+    function guid() {
+        function s4() {
+            return Math.floor((1 + Math.random()) * 0x10000)
+                .toString(16)
+                .substring(1);
+        }
+        return s4() + s4();
+    }
+
+    function recordKey(r) {
+        switch (r.Event) {
+            case 'QueueParams':
+                return 'p|' + r.Queue;
+            case 'QueueMember':
+                return 'm|' + r.Queue + '|' + r.Location;
+            case 'QueueEntry':
+                return 'e|' + r.Queue + '|' + (r.Uniqueid || r.Channel);
+            case 'CoreShowChannel':
+                return 'c|' + r.Uniqueid;
+        }
+        return null;
+    }
+
+    function ifLen(v) {
+        return (v < 10) ? '0' + v : v;
+    }
+
+    // Keep Duration and Wait ticking between changes
+    function toStart(r) {
+        var now = Math.floor(new Date().getTime() / 1000);
+        if (r.Event == 'CoreShowChannel' && r.Duration) {
+            var p = r.Duration.split(':');
+            r._Start = now - (p[0] * 3600 + p[1] * 60 + p[2] * 1);
+        } else if (r.Event == 'QueueEntry' && r.Wait !== undefined) {
+            r._Start = now - r.Wait;
+        }
+    }
+
+    function fromStart(r) {
+        if (r._Start === undefined) {
+            return;
+        }
+        var s = Math.max(0, Math.floor(new Date().getTime() / 1000) - r._Start);
+        if (r.Event == 'CoreShowChannel') {
+            r.Duration = ifLen(Math.floor(s / 3600)) + ':' + ifLen(Math.floor(s / 60) % 60) + ':' + ifLen(s % 60);
+        } else if (r.Event == 'QueueEntry') {
+            r.Wait = s;
+        }
+    }
+
+    function render(store) {
+        if (!store.records) {
+            return;
+        }
+        for (var i = 0; i < store.records.length; i++) {
+            fromStart(store.records[i]);
+        }
+        store.render(store.records);
+    }
+
+    function load(action) {
+        var store = stores[action];
+        $.ajax({
+            type: 'POST',
+            url: 'ajam.php',
+            // Same requests as the pages used to send, ajam.php slices the reply by lines
+            data: (action == 'QueueStatus') ? 'Action=QueueStatus&ActionId=' + guid() + '&Queue=' : 'Action=' + action,
+            success: function(data) {
+                var records = JSON.parse(data) || [];
+                for (var i = 0; i < records.length; i++) {
+                    toStart(records[i]);
+                }
+                store.records = records;
+                render(store);
+            },
+            complete: function() {
+                if (!streaming) {
+                    clearTimeout(store.timer);
+                    store.timer = setTimeout(function() { load(action); }, store.interval);
+                }
+            }
+        });
+    }
+
+    function apply(change) {
+        var store = stores[change.action];
+        if (!store || !store.records) {
+            return;
+        }
+        var rec = change.record;
+        var key = recordKey(rec);
+        var records = store.records;
+        var found = -1;
+        for (var i = 0; i < records.length; i++) {
+            if (recordKey(records[i]) == key) {
+                found = i;
+                break;
+            }
+        }
+        if (change.op == 'del') {
+            if (found < 0) {
+                return;
+            }
+            records.splice(found, 1);
+            // Callers behind the one who left move up
+            if (rec.Event == 'QueueEntry' && rec.Position) {
+                for (var j = 0; j < records.length; j++) {
+                    if (records[j].Event == 'QueueEntry' && records[j].Queue == rec.Queue && records[j].Position * 1 > rec.Position * 1) {
+                        records[j].Position = records[j].Position - 1;
+                    }
+                }
+            }
+        } else if (found >= 0) {
+            for (var k in rec) {
+                records[found][k] = rec[k];
+            }
+        } else if (rec.Event != 'CoreShowChannel' || rec.Channel) {
+            records.push(rec);
+        }
+    }
+
+    function connect() {
+        if (stream || !window.EventSource) {
+            return;
+        }
+        stream = new EventSource('events.php');
+        stream.onopen = function() {
+            // Changes may have been missed while disconnected
+            streaming = true;
+            for (var a in stores) {
+                clearTimeout(stores[a].timer);
+                load(a);
+            }
+        };
+        stream.onmessage = function(e) {
+            apply(JSON.parse(e.data));
+        };
+        stream.onerror = function() {
+            if (stream.readyState == EventSource.CLOSED) {
+                // No gateway, back to polling
+                streaming = false;
+                for (var a in stores) {
+                    load(a);
+                }
+            }
+        };
+        // Counters of QueueParams have no events, reload them now and then
+        setInterval(function() {
+            if (streaming) {
+                for (var a in stores) {
+                    load(a);
+                }
+            }
+        }, 30000);
+        // Local re-render only, nothing goes to the server
+        setInterval(function() {
+            if (streaming) {
+                for (var a in stores) {
+                    render(stores[a]);
+                }
+            }
+        }, 1000);
+    }
+
+    return {
+        // render(records) gets the same array as the ajam.php reply
+        watch: function(action, interval, render) {
+            stores[action] = { interval: interval, render: render, records: null, timer: null };
+            load(action);
+            connect();
+        }
+    };
+})();
@@ -216,4 +216,11 @@ $lang['en']['calls_waiting_detail'] = "Calls Waiting Detail";
 $lang['en']['position'] = "Position";
 $lang['en']['callerid'] = "Callerid";
 $lang['en']['wait_time'] = "Wait time";
+$lang['en']['prev_page'] = "Previous";
+$lang['en']['next_page'] = "Next";
+$lang['en']['percentiles'] = "Hold and call time percentiles";
+$lang['en']['service_level'] = "Service level";
+$lang['en']['sla_threshold'] = "Threshold";
+$lang['en']['sla_answered'] = "Answered within";
+$lang['en']['sla_abandoned'] = "Abandoned within";
 ?>
@@ -259,5 +259,12 @@ $lang['ru']['cdr'] = "RAW";
 $lang['ru']['filter'] = "Выбрать";
 $lang['ru']['page_rows'] = "Строк:";
 $lang['ru']['hidden_ringnoanswer'] = "Скрыть RINGNOANSWER";
+$lang['ru']['prev_page'] = "Назад";
+$lang['ru']['next_page'] = "Вперед";
+$lang['ru']['percentiles'] = "Процентили времени ожидания и разговора";
+$lang['ru']['service_level'] = "Уровень обслуживания";
+$lang['ru']['sla_threshold'] = "Порог";
+$lang['ru']['sla_answered'] = "Отвечено за порог";
+$lang['ru']['sla_abandoned'] = "Потеряно за порог";
 
 ?>
@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 require_once("config.php");
 require_once("sesvars.php");
 
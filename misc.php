@@ -92,6 +92,45 @@ function print_exports($header_pdf,$data_pdf,$width_pdf,$title_pdf,$cover_pdf,$h
 		echo "</form>";
 }
 
+// Export form of a report from reports.php, export.php runs the
+// query again instead of receiving the rows
+function print_report_export($report,$params=array()) {
+		global $lang;
+		global $language;
+		echo "<BR><form method=post action='export.php'>\n";
+		echo $lang["$language"]['export'];
+		echo "<input type='hidden' name='report' value='".htmlspecialchars($report, ENT_QUOTES)."' />\n";
+		foreach ($params as $key => $value) {
+			echo "<input type='hidden' name='".htmlspecialchars($key, ENT_QUOTES)."' value='".htmlspecialchars($value, ENT_QUOTES)."' />\n";
+		}
+		echo "<input type=image name='pdf' src='images/pdf.gif' ";
+		tooltip($lang["$language"]['pdfhelp'],200);
+		echo ">\n";
+		echo "<input type=image name='csv' src='images/excel.png' ";
+		tooltip($lang["$language"]['csvhelp'],200);
+		echo ">\n";
+		echo "</form>";
+}
+
+// Service level table of ServiceLevel::queues(), a row per queue
+// and threshold since the thresholds may differ between queues
+function print_service_level($levels) {
+		global $lang;
+		global $language;
+		echo "<table width='99%' cellpadding=1 cellspacing=1 border=0 class='sortable'>\n";
+		echo "<thead><tr><th>".$lang["$language"]['queue']."</th><th>".$lang["$language"]['sla_threshold']."</th>";
+		echo "<th>".$lang["$language"]['calls']."</th><th>".$lang["$language"]['sla_answered']."</th>";
+		echo "<th>".$lang["$language"]['service_level']."</th><th>".$lang["$language"]['sla_abandoned']."</th></tr></thead>\n<tbody>\n";
+		foreach ($levels as $queue => $level) {
+			foreach ($level['by'] as $seconds => $by) {
+				echo "<tr><td>".htmlspecialchars($queue)."</td><td>".$seconds." ".$lang["$language"]['secs']."</td>";
+				echo "<td>".$level['calls']."</td><td>".$by['answered']."</td>";
+				echo "<td>".$by['level']."%</td><td>".$by['abandoned']."</td></tr>\n";
+			}
+		}
+		echo "</tbody></table>\n";
+}
+
 function seconds2minutes($segundos) {
     $minutos = intval($segundos / 60);
     $segundos = $segundos % 60;
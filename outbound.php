@@ -19,49 +19,31 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "reports.php";
+require_once "recindex.class.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
 <?php
 //query mixed from queuelog and cdr (queuelog table must be in cdr databases)
-$sql = "select calldate, uniqueid, billsec, disposition, src, dst, cnum, cnam, recordingfile from cdr where calldate >= '$start' AND calldate <= '$end' AND `cnam` in ($agent);";
+$report = export_report('outbound');
+$sql = $report['sql'];
 
 $res = $connection->query($sql);
 
+// Each day directory is listed once, not a stat per row
+$recs = new RecIndex(RECPATH);
 $out = array();
-$rec = array();
 while ($row = $res->fetch_assoc()) {
-	$row['rec'] = getRec($row['recordingfile'], $row['calldate']);
+	$path = $recs->find($row['recordingfile'], $row['calldate']);
+	$row['rec'] = $path ? base64_encode($path) : null;
 	$out[] = $row;
 }
 
-$header_pdf = array("Дата", "Агент", "Номер", "Назнач.", "Продолж.");
-$width_pdf = array(50, 25, 25, 25, 25);
-$title_pdf = "Исходящие вызовы";
-$data_pdf = array();
-foreach ($out as $k => $r) {
-	$time = strtotime($r['calldate']);
-	$time = date('Y-m-d H:i:s', $time);
-	$min = seconds2minutes($r['billsec']);
-	$linea_pdf = array($time, $r['cnum'], $r['src'], $r['dst'], $min);
-	$data_pdf[] = $linea_pdf;
-}
-
 $out = json_encode($out);
 
 $connection->close();
 
-function getRec($recfile, $time) {
-	$time = strtotime($time);
-	$rec['path'] = RECPATH . date('Y/m/d/', $time) . $recfile;
-	if (file_exists($rec['path']) && preg_match('/(.*)\..+$/i', $recfile)) {
-		$tmpRes = base64_encode($rec['path']);
-	} else {
-		$tmpRes = $_REQUEST['recfile'];
-	}
-	return $tmpRes;
-}
-
 ?>
 <!DOCTYPE html>
 <head>
@@ -283,7 +265,7 @@ Handlebars.registerHelper("getStatus", function (s) {
       <h2>Детализация</h2>
       <br/>
 <?php
-print_exports($header_pdf, $data_pdf, $width_pdf, $title_pdf, $cover_pdf);
+print_report_export('outbound');
 ?>
         <br/>
         <hr/>
@@ -19,6 +19,8 @@ along with Asterisk Call Center Stats.  If not, see
  */
 require_once "config.php";
 include "sesvars.php";
+require_once "concurrency.class.php";
+require_once "reportsql.php";
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
@@ -30,47 +32,94 @@ function utftowin($str){
     return $str;
 }
 
-//$esql = "SELECT * FROM queuelog WHERE queuename IN ($queue) AND agent IN ($agent, 'NONE') AND time >= '$start' AND time <= '$end'";
-$esql = "SELECT time, agent, queuename, event, data3 FROM queuelog WHERE queuename IN ($queue) AND time >= '$start' AND time <= '$end' AND event IN ('CONNECT', 'ENTERQUEUE', 'COMPLETECALLER', 'COMPLETEAGENT', 'RINGNOANSWER')";
+// Waiting callers, staffed and busy agents per hour by a sweep over
+// the queuelog of the window in time order. Calls still waiting and
+// agents still busy at the start are picked up from the hour before.
+$lookback = 3600;
+$ts_start = strtotime($start);
+$ts_end = strtotime($end);
+$look_start = date('Y-m-d H:i:s', $ts_start - $lookback);
+$sweep = new Concurrency($ts_start, $ts_end);
 
-$evs = $connection->query($esql);
+$qev = qreport_events();
+$login = $qev['login'];
+$logoff = $qev['logoff'];
+$leave = $qev['leave'];
+$hangup = $qev['hangup'];
+$members = array();
 
-$queues = array();
-$events = array();
-$tmp = array();
+function qreport_member($agent, $que, $in, $ts) {
+	global $members, $sweep;
+	$was = !empty($members[$agent]);
+	if ($in) {
+		$members[$agent][$que] = true;
+	} else {
+		unset($members[$agent][$que]);
+	}
+	$is = !empty($members[$agent]);
+	if ($was != $is) {
+		$sweep->change('AGENTS', $ts, $is ? 1 : -1);
+	}
+}
 
-$ags = explode(",", $agent);
+// Queue members before the stream starts: last login or logoff
+$mem = $connection->query(qreport_members_sql($DBTable, $look_start, $queue));
+if ($mem) {
+	while ($m = $mem->fetch_assoc()) {
+		if (in_array($m['event'], $login)) {
+			qreport_member($m['agent'], $m['queuename'], true, $ts_start - $lookback);
+		}
+	}
+	$mem->free();
+}
 
+$evs = $connection->query(qreport_stream_sql($DBTable, $look_start, $end, $queue), MYSQLI_USE_RESULT);
+
+$waiting = array();
+$busy = array();
 while ($e = $evs->fetch_assoc()) {
-	$events[] = $e;
+	$ts = (int) $e['ts'];
+	$call = $e['callid'];
+	$ev = $e['event'];
+	if ($ev == 'ENTERQUEUE') {
+		if (!isset($waiting[$call])) {
+			$waiting[$call] = true;
+			$sweep->change('DEP', $ts, 1);
+		}
+	} elseif (in_array($ev, $leave)) {
+		if (isset($waiting[$call])) {
+			unset($waiting[$call]);
+			$sweep->change('DEP', $ts, -1);
+		}
+		if ($ev == 'CONNECT' && !isset($busy[$call])) {
+			$busy[$call] = true;
+			$sweep->change('BUSY', $ts, 1);
+		}
+	} elseif (in_array($ev, $hangup)) {
+		if (isset($busy[$call])) {
+			unset($busy[$call]);
+			$sweep->change('BUSY', $ts, -1);
+		}
+	} else {
+		qreport_member($e['agent'], $e['queuename'], in_array($ev, $login), $ts);
+	}
 }
-
 $evs->free();
 $connection->close();
-   $j = 0;
- 	foreach ($events as $k => $v) {
-          $date_part = explode(" ", $v['time']);
-          $d = $date_part[0];
-          $hour_part = explode(":", $date_part[1]);
-          $h = preg_replace("/(0)(\d)/", "$2", $hour_part[0]);
-          //$queues["$d"]["$h"]['DATE'] = $d;
-          //$queues["$d"]["$h"]['HOUR'] = $h;
-			if ( $v['event'] === "CONNECT")  {
-          $queues["$d"]['MEMBERS']["$h"] += 1;
-  		}
 
-      if ($v['event'] === "ENTERQUEUE") {
-        $queues["$d"]['DEP']["$h"] = $v['data3'];
-        if ($v['data3'] > $queues["$d"]['DEP']["$h"]) {
-          $queues["$d"]['DEP']["$h"] = $v['data3'];
-        }
-      }
-      if (($v['event'] === "COMPLETECALLER") || ($v['event'] === "COMPLETEAGENT") || ($v['event'] === "RINGNOANSWER") ) {
-
-          $tmp["$d"]["$h"]['TMP'][$v['agent']] += 1;
-      }
-          $queues["$d"]['AGENTS']["$h"] = count($tmp["$d"]["$h"]['TMP']);
-	  }
+$queues = array();
+foreach (array('DEP', 'AGENTS', 'BUSY') as $series) {
+	foreach ($sweep->result($series) as $t => $r) {
+		$d = date('Y-m-d', $t);
+		$h = (int) date('G', $t);
+		if ($series == 'DEP') {
+			$queues[$d]['DEP'][$h] = $r['max'];
+			$queues[$d]['AVG'][$h] = round($r['avg'], 1);
+		} else {
+			$queues[$d][$series][$h] = round($r['avg'], 1);
+		}
+	}
+}
 
 $cover_pdf .= $lang["$language"]['queue'] . ": " . $queue . "\n";
 
@@ -81,25 +130,22 @@ $width_pdf = array(22,64,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8);
 $title_pdf = "Отчет по очереди за период $start - $end";
 $data_pdf = array();
 
+$rows_pdf = array(
+	'DEP' => "Макс. кол-во абонентов в очереди",
+	'AVG' => "Сред. кол-во абонентов в очереди",
+	'AGENTS' => "Сред. кол-во операторов в очереди",
+	'BUSY' => "Сред. кол-во занятых операторов",
+);
 foreach ($queues as $key => $val) {
-  for ($i=0; $i <= 23 ; $i++) { 
-
-    if(!isset($queues["$key"]['DEP']["$i"])) {
-      $queues["$key"]['DEP']["$i"] = 0;
-    }
-      if(!isset($queues["$key"]['AGENTS']["$i"])){
-      $queues["$key"]['AGENTS']["$i"] = 0;
-    }
-  }
-     $linea_pdf = array($key,"Макс. кол-во абонентов в очереди",$queues["$key"]['DEP']["0"],$queues["$key"]['DEP']["1"],$queues["$key"]['DEP']["2"],$queues["$key"]['DEP']["3"],$queues["$key"]['DEP']["4"],$queues["$key"]['DEP']["5"],$queues["$key"]['DEP']["6"],$queues["$key"]['DEP']["7"],$queues["$key"]['DEP']["8"],$queues["$key"]['DEP']["9"],$queues["$key"]['DEP']["10"],$queues["$key"]['DEP']["11"],$queues["$key"]['DEP']["12"],$queues["$key"]['DEP']["13"],$queues["$key"]['DEP']["14"],$queues["$key"]['DEP']["15"],$queues["$key"]['DEP']["16"],$queues["$key"]['DEP']["17"],$queues["$key"]['DEP']["18"],$queues["$key"]['DEP']["19"],$queues["$key"]['DEP']["20"],$queues["$key"]['DEP']["21"],$queues["$key"]['DEP']["22"],$queues["$key"]['DEP']["23"]);
-
-     $data_pdf[] = $linea_pdf;
-
-     $linea_pdf2 = array($key,"Кол-во своб. операторов",$queues["$key"]['AGENTS']["0"],$queues["$key"]['AGENTS']["1"],$queues["$key"]['AGENTS']["2"],$queues["$key"]['AGENTS']["3"],$queues["$key"]['AGENTS']["4"],$queues["$key"]['AGENTS']["5"],$queues["$key"]['AGENTS']["6"],$queues["$key"]['AGENTS']["7"],$queues["$key"]['AGENTS']["8"],$queues["$key"]['AGENTS']["9"],$queues["$key"]['AGENTS']["10"],$queues["$key"]['AGENTS']["11"],$queues["$key"]['AGENTS']["12"],$queues["$key"]['AGENTS']["13"],$queues["$key"]['AGENTS']["14"],$queues["$key"]['AGENTS']["15"],$queues["$key"]['AGENTS']["16"],$queues["$key"]['AGENTS']["17"],$queues["$key"]['AGENTS']["18"],$queues["$key"]['AGENTS']["19"],$queues["$key"]['AGENTS']["20"],$queues["$key"]['AGENTS']["21"],$queues["$key"]['AGENTS']["22"],$queues["$key"]['AGENTS']["23"]);
-     $data_pdf[] = $linea_pdf2;
+	foreach ($rows_pdf as $series => $title) {
+		$linea_pdf = array($key, $title);
+		for ($i = 0; $i <= 23; $i++) {
+			$linea_pdf[] = isset($val[$series][$i]) ? $val[$series][$i] : 0;
+		}
+		$data_pdf[] = $linea_pdf;
+	}
 }
 
-
 ksort($queues);
 $queues = json_encode($queues);
 ?>
@@ -169,8 +215,8 @@ $queues = json_encode($queues);
             </thead>
             <tbody>
                     {{#each tbl}}
-                      <tr class="text-center">
-                          <td rowspan="2" scope="rowgroup">{{@key}}</td>
+                        <tr class="text-center">
+                          <td rowspan="4" scope="rowgroup">{{@key}}</td>
                           <td>Максимальное кол-во абонентов в очереди</td>
                           <td>{{ifEmpty DEP.[0]}}</td>
                           <td>{{ifEmpty DEP.[1]}}</td>
@@ -198,7 +244,34 @@ $queues = json_encode($queues);
                           <td>{{ifEmpty DEP.[23]}}</td>
                         </tr>
                         <tr class="text-center">
-                          <td>Количество свободных операторов</td>
+                          <td>Среднее кол-во абонентов в очереди</td>
+                          <td>{{ifEmpty AVG.[0]}}</td>
+                          <td>{{ifEmpty AVG.[1]}}</td>
+                          <td>{{ifEmpty AVG.[2]}}</td>
+                          <td>{{ifEmpty AVG.[3]}}</td>
+                          <td>{{ifEmpty AVG.[4]}}</td>
+                          <td>{{ifEmpty AVG.[5]}}</td>
+                          <td>{{ifEmpty AVG.[6]}}</td>
+                          <td>{{ifEmpty AVG.[7]}}</td>
+                          <td>{{ifEmpty AVG.[8]}}</td>
+                          <td>{{ifEmpty AVG.[9]}}</td>
+                          <td>{{ifEmpty AVG.[10]}}</td>
+                          <td>{{ifEmpty AVG.[11]}}</td>
+                          <td>{{ifEmpty AVG.[12]}}</td>
+                          <td>{{ifEmpty AVG.[13]}}</td>
+                          <td>{{ifEmpty AVG.[14]}}</td>
+                          <td>{{ifEmpty AVG.[15]}}</td>
+                          <td>{{ifEmpty AVG.[16]}}</td>
+                          <td>{{ifEmpty AVG.[17]}}</td>
+                          <td>{{ifEmpty AVG.[18]}}</td>
+                          <td>{{ifEmpty AVG.[19]}}</td>
+                          <td>{{ifEmpty AVG.[20]}}</td>
+                          <td>{{ifEmpty AVG.[21]}}</td>
+                          <td>{{ifEmpty AVG.[22]}}</td>
+                          <td>{{ifEmpty AVG.[23]}}</td>
+                        </tr>
+                        <tr class="text-center">
+                          <td>Среднее кол-во операторов в очереди</td>
                           <td>{{ifEmpty AGENTS.[0]}}</td>
                           <td>{{ifEmpty AGENTS.[1]}}</td>
                           <td>{{ifEmpty AGENTS.[2]}}</td>
@@ -224,6 +297,33 @@ $queues = json_encode($queues);
                           <td>{{ifEmpty AGENTS.[22]}}</td>
                           <td>{{ifEmpty AGENTS.[23]}}</td>
                         </tr>
+                        <tr class="text-center">
+                          <td>Среднее кол-во занятых операторов</td>
+                          <td>{{ifEmpty BUSY.[0]}}</td>
+                          <td>{{ifEmpty BUSY.[1]}}</td>
+                          <td>{{ifEmpty BUSY.[2]}}</td>
+                          <td>{{ifEmpty BUSY.[3]}}</td>
+                          <td>{{ifEmpty BUSY.[4]}}</td>
+                          <td>{{ifEmpty BUSY.[5]}}</td>
+                          <td>{{ifEmpty BUSY.[6]}}</td>
+                          <td>{{ifEmpty BUSY.[7]}}</td>
+                          <td>{{ifEmpty BUSY.[8]}}</td>
+                          <td>{{ifEmpty BUSY.[9]}}</td>
+                          <td>{{ifEmpty BUSY.[10]}}</td>
+                          <td>{{ifEmpty BUSY.[11]}}</td>
+                          <td>{{ifEmpty BUSY.[12]}}</td>
+                          <td>{{ifEmpty BUSY.[13]}}</td>
+                          <td>{{ifEmpty BUSY.[14]}}</td>
+                          <td>{{ifEmpty BUSY.[15]}}</td>
+                          <td>{{ifEmpty BUSY.[16]}}</td>
+                          <td>{{ifEmpty BUSY.[17]}}</td>
+                          <td>{{ifEmpty BUSY.[18]}}</td>
+                          <td>{{ifEmpty BUSY.[19]}}</td>
+                          <td>{{ifEmpty BUSY.[20]}}</td>
+                          <td>{{ifEmpty BUSY.[21]}}</td>
+                          <td>{{ifEmpty BUSY.[22]}}</td>
+                          <td>{{ifEmpty BUSY.[23]}}</td>
+                        </tr>
                     {{/each}}
             </tbody>
         </table>
@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
 ?>
 <!DOCTYPE html>
@@ -14,6 +15,7 @@ include "config.php";
     <script type="text/javascript" src="js/1.10.2/jquery.min.js"></script>
     <script src="js/handlebars.js"></script>
     <script src="js/locale.js"></script>
+    <script src="js/realtime.js"></script>
         <?php
 echo "<script>
 localStorage.setItem('queues',\"" . $_SESSION['QSTATS']['queue'] . "\");
@@ -84,24 +86,26 @@ localStorage.setItem('queues',\"" . $_SESSION['QSTATS']['queue'] . "\");
         setTimeout(getQueueSummary, 1382);
     });
 
-    $(function getQueueStatus() {
-        $(function() {
-            $.ajax({
-                type: 'POST',
-                url: 'ajam.php',
-                data: 'Action=QueueStatus&ActionId=' + guid() + '&Queue=',
-                success: function(data) {
-                    var queue = JSON.parse(data);
-                    //$('#rqueues').html(data);
-                    var theTemplateScript = $("#queues-template").html();
-                    var theTemplate = Handlebars.compile(theTemplateScript);
-                    var context = { Queues: queue };
-                    var theCompiledHtml = theTemplate(context);
-                    $('.queues-placeholder').html(theCompiledHtml);
-                }
-            });
+    // Service level since midnight against the thresholds of config.php
+    $(function getServiceLevel() {
+        $.ajax({
+            type: 'GET',
+            url: 'sla.php',
+            dataType: 'json',
+            success: function(levels) {
+                var theTemplate = Handlebars.compile($("#sla-template").html());
+                $('.sla-placeholder').html(theTemplate({ Levels: levels }));
+            }
+        });
+        setTimeout(getServiceLevel, 30000);
+    });
+
+    $(function() {
+        var theTemplate = Handlebars.compile($("#queues-template").html());
+        Realtime.watch('QueueStatus', 999, function(queue) {
+            var context = { Queues: queue };
+            $('.queues-placeholder').html(theTemplate(context));
         });
-        setTimeout(getQueueStatus, 999);
     });
 
     Handlebars.registerHelper("ifQue", function(q, options) {
@@ -395,6 +399,36 @@ Handlebars.registerHelper('l10n', function(keyword) {
             <br />
         </div>
     </script>
+    <script id="sla-template" type="text/x-handlebars-template">
+        <h5>{{l10n "sts.ServiceLevelToday"}}</h5>
+        <div class="table">
+            <table class="table centered">
+                <thead>
+                    <tr>
+                        <th scope="col">{{l10n "sts.Queue"}}</th>
+                        <th>{{l10n "sts.Threshold"}}</th>
+                        <th>{{l10n "sts.Calls"}}</th>
+                        <th>{{l10n "sts.AnsweredWithin"}}</th>
+                        <th>{{l10n "sts.ServicelevelPerf"}}</th>
+                        <th>{{l10n "sts.AbandonedWithin"}}</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {{#each Levels}} {{#ifQue Queue}}
+                    <tr>
+                        <td>{{Queue}}</td>
+                        <td>{{Threshold}}</td>
+                        <td>{{Calls}}</td>
+                        <td>{{Answered}}</td>
+                        <td>{{Level}}%</td>
+                        <td>{{Abandoned}}</td>
+                    </tr>
+                    {{/ifQue}} {{/each}}
+                </tbody>
+            </table>
+            <br />
+        </div>
+    </script>
 </head>
 <html>
 <body>
@@ -408,6 +442,7 @@ Handlebars.registerHelper('l10n', function(keyword) {
             <br/>
         <div class="queuesum-placeholder">null</div>
         <div class="queues-placeholder">null</div>
+        <div class="sla-placeholder"></div>
         <br/>
     </div>
     </div>
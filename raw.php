@@ -19,6 +19,7 @@
 */
 require_once("config.php");
 include("sesvars.php");
+require_once("callerindex.class.php");
 ?>
 <!DOCTYPE html>
 <html xmlns="http://www.w3.org/1999/xhtml">
@@ -38,50 +39,105 @@ include("sesvars.php");
 
 <?php
 
-$start_parts = split(" ,:", $start);
-$end_parts   = split(" ,:", $end);
-
-if(isset($_POST['pagerows'])) {
-   $page_rows = $_POST['pagerows'];
-   $_SESSION['QSTATS']['pagerows']=$page_rows;
-} else {
-   $_SESSION['QSTATS']['pagerows'] = 1;
-}   
-
-if(isset($_POST['callerid'])) {
-   $callerid = $_POST['callerid'];
-   $_SESSION['QSTATS']['callerid']=$callerid;
-} 
-
-if(isset($_POST['uniqueid'])) {
-   $uniqueid = $_POST['uniqueid'];
-   $_SESSION['QSTATS']['uniqueid']=$uniqueid;
-} 
-
-if(isset($_POST['event'])) {
-   $event = $_POST['event'];
-   $_SESSION['QSTATS']['event']=$event;
-} 
-
-if(isset($_POST['ringnoanswer'])) {
-   $ringnoanswer = $_POST['ringnoanswer'];
-   $_SESSION['QSTATS']['ringnoanswer']=$ringnoanswer;
-} else {
-$ringnoanswer = 'FALSE';
+$start_parts = explode(" ,:", $start);
+$end_parts   = explode(" ,:", $end);
+
+// Filters are kept in the session, the page links carry the cursor only
+if(isset($_POST['submit'])) {
+   $_SESSION['QSTATS']['pagerows'] = (int)$_POST['pagerows'];
+   $_SESSION['QSTATS']['callerid'] = trim($_POST['callerid']);
+   $_SESSION['QSTATS']['uniqueid'] = trim($_POST['uniqueid']);
+   $_SESSION['QSTATS']['event'] = $_POST['event'];
+   $_SESSION['QSTATS']['ringnoanswer'] = isset($_POST['ringnoanswer']);
 }
 
-$sql = "SELECT *,
-CASE WHEN event like 'COMPLETE%' OR event like '%TRANSFER' THEN callid else 0 end as record_file
-FROM $DBTable 
-WHERE time >= '$start' AND time <= '$end'
-and callid like '%$uniqueid%' and data2 like '%$callerid%' and event like '%$event%'
-AND queuename IN ($queue) AND agent IN ($agent, 'NONE') AND event NOT IN ('$ringnoanswer')
-LIMIT $page_rows";
+$page_rows = isset($_SESSION['QSTATS']['pagerows']) ? $_SESSION['QSTATS']['pagerows'] : 500;
+$page_rows = max(1, min($page_rows, 10000));
+$callerid = isset($_SESSION['QSTATS']['callerid']) ? $_SESSION['QSTATS']['callerid'] : '';
+$uniqueid = isset($_SESSION['QSTATS']['uniqueid']) ? $_SESSION['QSTATS']['uniqueid'] : '';
+$event = isset($_SESSION['QSTATS']['event']) ? $_SESSION['QSTATS']['event'] : '%';
+$ringnoanswer = !empty($_SESSION['QSTATS']['ringnoanswer']);
 
-$result = mysqli_query($connection, $sql);
+// Options of the event filter that stand for several events
+$event_groups = array(
+   'COMPLETE' => array('COMPLETEAGENT', 'COMPLETECALLER'),
+   'TRANSFER' => array('BLINDTRANSFER', 'ATTENDEDTRANSFER'),
+);
+
+$where = "q.time >= '$start' AND q.time <= '$end'
+AND q.queuename IN ($queue) AND q.agent IN ($agent, 'NONE')";
+if ($uniqueid != '') {
+   $where .= " AND q.callid = '" . mysqli_real_escape_string($connection, $uniqueid) . "'";
+}
+if ($event != '%' && $event != '') {
+   $events = isset($event_groups[$event]) ? $event_groups[$event] : array($event);
+   foreach ($events as $k => $e) {
+      $events[$k] = mysqli_real_escape_string($connection, $e);
+   }
+   $where .= " AND q.event IN ('" . implode("','", $events) . "')";
+}
+if ($ringnoanswer) {
+   $where .= " AND q.event != 'RINGNOANSWER'";
+}
+$join = "";
+if ($callerid != '') {
+   // All the events of the calls from that number
+   $index = new CallerIndex($connection, $DBTable);
+   $join = "JOIN (" . $index->lookup($callerid, false, $start, $end) . ") c ON q.callid = c.callid";
+}
+
+// Keyset paging on (time, id): the cursor is the last row shown,
+// every page is an index range however deep it is
+function raw_cursor($row) {
+   return base64_encode($row['time'] . '|' . $row['id']);
+}
+
+$after = null;
+$before = null;
+if (isset($_GET['after']) && preg_match('/^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\|(\d+)$/', base64_decode($_GET['after']), $m)) {
+   $after = $m;
+   $where .= " AND (q.time > '$m[1]' OR (q.time = '$m[1]' AND q.id > $m[2]))";
+} else if (isset($_GET['before']) && preg_match('/^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\|(\d+)$/', base64_decode($_GET['before']), $m)) {
+   $before = $m;
+   $where .= " AND (q.time < '$m[1]' OR (q.time = '$m[1]' AND q.id < $m[2]))";
+}
+$order = ($before !== null) ? "q.time DESC, q.id DESC" : "q.time, q.id";
+
+// One row more than the page tells whether there is a page further
+$sql = "SELECT q.*,
+CASE WHEN q.event like 'COMPLETE%' OR q.event like '%TRANSFER' THEN q.callid else 0 end as record_file
+FROM $DBTable q $join
+WHERE $where
+ORDER BY $order
+LIMIT " . ($page_rows + 1);
 
+$result = mysqli_query($connection, $sql);
+$rows = array();
+while ($row = mysqli_fetch_assoc($result)) {
+   $rows[] = $row;
+}
+$result->free();
 mysqli_close($connection);
 
+$more = count($rows) > $page_rows;
+if ($more) {
+   array_pop($rows);
+}
+if ($before !== null) {
+   $rows = array_reverse($rows);
+}
+$prev_page = null;
+$next_page = null;
+if ($rows) {
+   // Going back there is always a page ahead, going forward there is one behind
+   if ($before !== null ? $more : $after !== null) {
+      $prev_page = raw_cursor($rows[0]);
+   }
+   if ($before !== null || $more) {
+      $next_page = raw_cursor($rows[count($rows) - 1]);
+   }
+}
+
 ?>
 
 <?php include("menu.php"); ?>
@@ -121,11 +177,11 @@ mysqli_close($connection);
         </TABLE>
 		<br/>
 <form action="<?php echo htmlspecialchars($_SERVER['PHP_SELF']); ?>" id="frm1" name="frm1" method="post">
-    &nbsp;&nbsp;&nbsp;<input type="checkbox" name="ringnoanswer" value="RINGNOANSWER">&nbsp;<?php echo $lang["$language"]['hidden_ringnoanswer'];?><br/><br/>
-    &nbsp;&nbsp;&nbsp;<b>UniqueID</b>&nbsp;<input type="text" id="uniqueid" name="uniqueid" />
-	&nbsp;&nbsp;&nbsp;<b>CallerID</b>&nbsp;<input type="text" id="callerid" name="callerid" />
+    &nbsp;&nbsp;&nbsp;<input type="checkbox" name="ringnoanswer" value="RINGNOANSWER"<?php if ($ringnoanswer) echo " checked";?>>&nbsp;<?php echo $lang["$language"]['hidden_ringnoanswer'];?><br/><br/>
+    &nbsp;&nbsp;&nbsp;<b>UniqueID</b>&nbsp;<input type="text" id="uniqueid" name="uniqueid" value="<?php echo htmlspecialchars($uniqueid);?>" />
+	&nbsp;&nbsp;&nbsp;<b>CallerID</b>&nbsp;<input type="text" id="callerid" name="callerid" value="<?php echo htmlspecialchars($callerid);?>" />
 	&nbsp;&nbsp;&nbsp;<b><?php echo $lang["$language"]['event'];?></b>&nbsp;<select id="event" name="event"/>
-  <option selected="<?php echo $_POST['event'];?>"><?php echo $_POST['event'];?></option>	
+  <option selected="<?php echo htmlspecialchars($event);?>"><?php echo htmlspecialchars($event);?></option>	
   <option value="%">--</option>	
   <option value="DID">did</option>
   <option value="ENTERQUEUE">enter</option>
@@ -139,7 +195,7 @@ mysqli_close($connection);
   <option value="TRANSFER">transfer</option>
 </select>
 	&nbsp;&nbsp;&nbsp;<b><?php echo $lang["$language"]['page_rows'];?></b>&nbsp;<select id="pagerows" name="pagerows"/>
-  <option selected="<?php echo $_SESSION['QSTATS']['pagerows'];?>"><?php echo $_SESSION['QSTATS']['pagerows'];?></option>
+  <option selected="<?php echo $page_rows;?>"><?php echo $page_rows;?></option>
   <option value="1">1</option>
   <option value="500">500</option>
   <option value="1000">1000</option>
@@ -172,7 +228,7 @@ $header_pdf=array($lang["$language"]['time'],$lang["$language"]['id'], $lang["$l
 $width_pdf=array(25,23,23,23,23,25,25,20);
 $title_pdf=$lang["$language"]['user_abandon_calls'];
 $data_pdf = array();				
-foreach($result as $row) {
+foreach($rows as $row) {
 if ($row['record_file'] == '0') {
     $row['record_file'] = $lang["$language"]['norecords'];
 }
@@ -208,12 +264,20 @@ if ($row['record_file'] == '0') {
         $data_pdf[]=$linea_pdf;	  
 
 	} 	
-$result->free();
 print_exports($header_pdf,$data_pdf,$width_pdf,$title_pdf,$cover_pdf);
                 ?>
 			   </TBODY>
 			  </TABLE>
 <?php
+if ($prev_page !== null) {
+	echo "<a href='raw.php?before=" . urlencode($prev_page) . "'>&larr; " . $lang["$language"]['prev_page'] . "</a>&nbsp;&nbsp;&nbsp;";
+}
+if ($next_page !== null) {
+	echo "<a href='raw.php?after=" . urlencode($next_page) . "'>" . $lang["$language"]['next_page'] . " &rarr;</a>";
+}
+?>
+			  <br/>
+<?php
 print_exports($header_pdf,$data_pdf,$width_pdf,$title_pdf,$cover_pdf);
 ?>			  
 			  </BR>
@@ -1,4 +1,5 @@
 <?php
+define('QSTATS_NODB', true);
 include "config.php";
 ?>
 <!DOCTYPE html>
@@ -14,6 +15,7 @@ include "config.php";
     <script type="text/javascript" src="js/1.10.2/jquery.min.js"></script>
     <script src="js/handlebars.js"></script>
     <script src="js/locale.js"></script>
+    <script src="js/realtime.js"></script>
     <script>
     //var lang = (navigator.language) ? navigator.language : navigator.userLanguage;
 
@@ -110,24 +112,26 @@ include "config.php";
         setTimeout(getQueueSummary, 1382);
     });
 
-    $(function getQueueStatus() {
-        $(function() {
-            $.ajax({
-                type: 'POST',
-                url: 'ajam.php',
-                data: 'Action=QueueStatus&ActionId=' + guid() + '&Queue=',
-                success: function(data) {
-                    var queue = JSON.parse(data);
-                    //$('#rqueues').html(data);
-                    var theTemplateScript = $("#queues-template").html();
-                    var theTemplate = Handlebars.compile(theTemplateScript);
-                    var context = { Queues: queue };
-                    var theCompiledHtml = theTemplate(context);
-                    $('.queues-placeholder').html(theCompiledHtml);
-                }
-            });
+    // Service level since midnight against the thresholds of config.php
+    $(function getServiceLevel() {
+        $.ajax({
+            type: 'GET',
+            url: 'sla.php',
+            dataType: 'json',
+            success: function(levels) {
+                var theTemplate = Handlebars.compile($("#sla-template").html());
+                $('.sla-placeholder').html(theTemplate({ Levels: levels }));
+            }
+        });
+        setTimeout(getServiceLevel, 30000);
+    });
+
+    $(function() {
+        var theTemplate = Handlebars.compile($("#queues-template").html());
+        Realtime.watch('QueueStatus', 999, function(queue) {
+            var context = { Queues: queue };
+            $('.queues-placeholder').html(theTemplate(context));
         });
-        setTimeout(getQueueStatus, 999);
     });
 
     Handlebars.registerHelper("ifE", function(conditional, options) {
@@ -280,26 +284,14 @@ include "config.php";
         }
     });
 
-    $(function getCalls() {
-        $(function() {
-            $.ajax({
-                type: 'POST',
-                url: 'ajam.php',
-                data: 'Action=CoreShowChannels',
-                success: function(data) {
-                    var chan = JSON.parse(data);
-                    //$('#channels').html(data);
-                    var theTemplateScript = $("#channels-template").html();
-                    var theTemplate = Handlebars.compile(theTemplateScript);
-                    var context = {
-                        Calls: chan
-                    };
-                    var theCompiledHtml = theTemplate(context);
-                    $('.channels-placeholder').html(theCompiledHtml);
-                }
-            });
+    $(function() {
+        var theTemplate = Handlebars.compile($("#channels-template").html());
+        Realtime.watch('CoreShowChannels', 1000, function(chan) {
+            var context = {
+                Calls: chan
+            };
+            $('.channels-placeholder').html(theTemplate(context));
         });
-        setTimeout(getCalls, 1000);
     });
 
         Handlebars.registerHelper("ifDial", function(conditional, options) {
@@ -519,6 +511,36 @@ Handlebars.registerHelper('l10n', function(keyword) {
             </table>
         </div>
     </script>
+    <script id="sla-template" type="text/x-handlebars-template">
+        <h5>{{l10n "sts.ServiceLevelToday"}}</h5>
+        <div class="table">
+            <table class="table centered">
+                <thead>
+                    <tr>
+                        <th scope="col">{{l10n "sts.Queue"}}</th>
+                        <th>{{l10n "sts.Threshold"}}</th>
+                        <th>{{l10n "sts.Calls"}}</th>
+                        <th>{{l10n "sts.AnsweredWithin"}}</th>
+                        <th>{{l10n "sts.ServicelevelPerf"}}</th>
+                        <th>{{l10n "sts.AbandonedWithin"}}</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {{#each Levels}}
+                    <tr>
+                        <td>{{Queue}}</td>
+                        <td>{{Threshold}}</td>
+                        <td>{{Calls}}</td>
+                        <td>{{Answered}}</td>
+                        <td>{{Level}}%</td>
+                        <td>{{Abandoned}}</td>
+                    </tr>
+                    {{/each}}
+                </tbody>
+            </table>
+            <br />
+        </div>
+    </script>
 </head>
 <html>
 <body>
@@ -532,6 +554,7 @@ Handlebars.registerHelper('l10n', function(keyword) {
         <div class="queuesum-placeholder">null</div>
         <!--         <h5>Queues Realtime</h5> -->
         <div class="queues-placeholder">null</div>
+        <div class="sla-placeholder"></div>
         <br/>
         <div class="channels-placeholder">null</div>
         <br/>
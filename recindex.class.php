@@ -0,0 +1,209 @@
+<?php
+
+/**
+ * Class RecIndex
+ * Recording files of the monitor spool, listed one Y/m/d directory
+ * at a time. A listing is cached (APCu or a file under /dev/shm) with
+ * the directory mtime, so resolving a page of calls costs one stat per
+ * day instead of one per row.
+ */
+
+class RecIndex {
+
+	/**
+	 * Monitor spool, with the trailing slash
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Root;
+
+	/**
+	 * Directory for the file storage of the listings
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_dir;
+
+	/**
+	 * Use APCu instead of files
+	 *
+	 * @var boolean
+	 * @access private
+	 */
+	private $_apcu = false;
+
+	/**
+	 * Listings loaded by this request: directory => array(mtime, files)
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_listings = array();
+
+	/**
+	 * Directories whose mtime was checked by this request
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_checked = array();
+
+	/**
+	 * RecIndex::__construct()
+	 *
+	 * @access public
+	 * @param string $root Monitor spool, RECPATH
+	 * @param string|null $dir Directory for the file storage
+	 * @return void
+	 */
+	public function __construct($root, $dir = null) {
+		$this->Root = rtrim($root, '/') . '/';
+		if (function_exists('apcu_fetch') && ini_get('apc.enabled')) {
+			$this->_apcu = true;
+		}
+		if ($dir === null) {
+			$dir = is_writable('/dev/shm') ? '/dev/shm' : sys_get_temp_dir();
+		}
+		$this->_dir = rtrim($dir, '/');
+	}
+
+	/**
+	 * RecIndex::load()
+	 *
+	 * Cached listing of a directory, whatever its age
+	 *
+	 * @access private
+	 * @param string $day Directory relative to the root, Y/m/d
+	 * @return array|boolean array(mtime, files), false if not cached
+	 */
+	private function load($day) {
+		if (isset($this->_listings[$day])) {
+			return $this->_listings[$day];
+		}
+		$key = 'qstats_rec_' . md5($this->Root . $day);
+		if ($this->_apcu) {
+			$entry = apcu_fetch($key);
+		} else {
+			$data = @file_get_contents($this->_dir . '/' . $key);
+			$entry = ($data === false) ? false : @unserialize($data);
+		}
+		if (!is_array($entry)) {
+			return false;
+		}
+		return $this->_listings[$day] = $entry;
+	}
+
+	/**
+	 * RecIndex::store()
+	 *
+	 * @access private
+	 * @param string $day
+	 * @param array $entry array(mtime, files)
+	 * @return void
+	 */
+	private function store($day, $entry) {
+		$this->_listings[$day] = $entry;
+		$key = 'qstats_rec_' . md5($this->Root . $day);
+		if ($this->_apcu) {
+			apcu_store($key, $entry);
+			return;
+		}
+		$file = $this->_dir . '/' . $key;
+		$tmp = $file . '.' . getmypid();
+		if (@file_put_contents($tmp, serialize($entry)) !== false) {
+			rename($tmp, $file);
+		}
+	}
+
+	/**
+	 * RecIndex::files()
+	 *
+	 * Files of a day directory, listed again only when its mtime changed
+	 *
+	 * @access public
+	 * @param string $day Y/m/d
+	 * @return array file name => true
+	 */
+	public function files($day) {
+		$entry = $this->load($day);
+		if ($entry !== false && isset($this->_checked[$day])) {
+			return $entry[1];
+		}
+		$path = $this->Root . $day;
+		$mtime = @filemtime($path);
+		$this->_checked[$day] = true;
+		if ($mtime === false) {
+			return array();
+		}
+		if ($entry !== false && $entry[0] == $mtime) {
+			return $entry[1];
+		}
+		$files = array();
+		$list = @scandir($path);
+		if ($list !== false) {
+			foreach ($list as $f) {
+				if ($f[0] != '.') {
+					$files[$f] = true;
+				}
+			}
+		}
+		// A file written later in the same second would not change the
+		// mtime, such a listing is used for this request only
+		if ($mtime < time()) {
+			$this->store($day, array($mtime, $files));
+		} else {
+			$this->_listings[$day] = array($mtime, $files);
+		}
+		return $files;
+	}
+
+	/**
+	 * RecIndex::find()
+	 *
+	 * Path of the recording of a call
+	 *
+	 * @access public
+	 * @param string $recfile cdr.recordingfile
+	 * @param string $time Call time
+	 * @return string|boolean false if there is no such file
+	 */
+	public function find($recfile, $time) {
+		if ($recfile == '' || !preg_match('/(.*)\..+$/i', $recfile)) {
+			return false;
+		}
+		$day = date('Y/m/d', strtotime($time));
+		$files = $this->files($day);
+		if (!isset($files[$recfile])) {
+			return false;
+		}
+		return $this->Root . $day . '/' . $recfile;
+	}
+
+	/**
+	 * RecIndex::exists()
+	 *
+	 * Whether a path is a recording of the spool. A file already in
+	 * the cached listing is accepted without touching the disk.
+	 *
+	 * @access public
+	 * @param string $path
+	 * @return boolean
+	 */
+	public function exists($path) {
+		if (strpos($path, $this->Root) !== 0) {
+			return false;
+		}
+		if (!preg_match('#^(\d{4}/\d\d/\d\d)/([^/]+)$#', substr($path, strlen($this->Root)), $m) || $m[2][0] == '.') {
+			return false;
+		}
+		$entry = $this->load($m[1]);
+		if ($entry !== false && isset($entry[1][$m[2]])) {
+			return true;
+		}
+		$files = $this->files($m[1]);
+		return isset($files[$m[2]]);
+	}
+
+}
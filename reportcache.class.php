@@ -0,0 +1,255 @@
+<?php
+
+/**
+ * Class ReportCache
+ * Computed report data shared between requests, kept in APCu or in
+ * files. The key is the report name with the normalized filters of
+ * the session: sorted queue and agent lists and the time window.
+ * A window ended in the past never changes and is kept until evicted,
+ * a window reaching now is kept for a short time only.
+ */
+
+class ReportCache {
+
+	/**
+	 * Directory for the file storage
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_dir;
+
+	/**
+	 * Use APCu instead of files
+	 *
+	 * @var boolean
+	 * @access private
+	 */
+	private $_apcu = false;
+
+	/**
+	 * Seconds a report whose window reaches now is kept
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Ttl = 60;
+
+	/**
+	 * Seconds after the end of a window before it is final,
+	 * cron.php feeds the rollups once a minute
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Settle = 180;
+
+	/**
+	 * Seconds a file of the file storage is kept since it was written
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Keep = 604800;
+
+	/**
+	 * ReportCache::__construct()
+	 *
+	 * @access public
+	 * @param string|null $dir Directory for the file storage
+	 * @return void
+	 */
+	public function __construct($dir = null) {
+		if (function_exists('apcu_fetch') && ini_get('apc.enabled')) {
+			$this->_apcu = true;
+		}
+		if ($dir === null) {
+			$dir = sys_get_temp_dir() . '/qstats_reports';
+		}
+		$this->_dir = rtrim($dir, '/');
+		if (!$this->_apcu && !is_dir($this->_dir)) {
+			@mkdir($this->_dir, 0700, true);
+		}
+	}
+
+	/**
+	 * ReportCache::names()
+	 *
+	 * Sorted form of a quoted list as in sesvars.php
+	 *
+	 * @access private
+	 * @param string $list 'a','b'
+	 * @return string
+	 */
+	private function names($list) {
+		$names = array();
+		foreach (explode(',', $list) as $name) {
+			$names[] = trim($name, " '\"");
+		}
+		$names = array_unique($names);
+		sort($names);
+		return implode(',', $names);
+	}
+
+	/**
+	 * ReportCache::key()
+	 *
+	 * @access public
+	 * @param string $report
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue Quoted queue list
+	 * @param string $agent Quoted agent list
+	 * @param array $params Other options of the report
+	 * @return string
+	 */
+	public function key($report, $start, $end, $queue, $agent, $params = array()) {
+		ksort($params);
+		return 'qstats_report_' . md5(serialize(array($report, $start, $end,
+			$this->names($queue), $this->names($agent), $params)));
+	}
+
+	/**
+	 * ReportCache::get()
+	 *
+	 * Cached data of a report, $compute() is called on a miss
+	 *
+	 * @access public
+	 * @param string $report
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue
+	 * @param string $agent
+	 * @param callable $compute Returns the report data
+	 * @param array $params
+	 * @return mixed
+	 */
+	public function get($report, $start, $end, $queue, $agent, $compute, $params = array()) {
+		$key = $this->key($report, $start, $end, $queue, $agent, $params);
+		$settled = strtotime($end) + $this->Settle;
+		$final = $settled < time();
+
+		if ($this->_apcu) {
+			$data = apcu_fetch($key, $found);
+		} else {
+			$found = false;
+			$file = $this->_dir . '/' . $key;
+			$mtime = @filemtime($file);
+			// Written after the window settled, or recently
+			if ($mtime !== false && ($mtime > $settled || time() - $mtime < $this->Ttl)) {
+				$data = @unserialize(file_get_contents($file));
+				$found = ($data !== false);
+			}
+		}
+		if ($found) {
+			$this->count('hits');
+			return $data;
+		}
+
+		$this->count('misses');
+		$data = call_user_func($compute);
+		if ($this->_apcu) {
+			apcu_store($key, $data, $final ? 0 : $this->Ttl);
+		} else {
+			$tmp = $file . '.' . getmypid();
+			if (@file_put_contents($tmp, serialize($data)) !== false) {
+				rename($tmp, $file);
+			}
+			if (mt_rand(1, 100) == 1) {
+				$this->prune();
+			}
+		}
+		return $data;
+	}
+
+	/**
+	 * ReportCache::prune()
+	 *
+	 * Remove the files older than $Keep, APCu evicts by itself
+	 *
+	 * @access private
+	 * @return void
+	 */
+	private function prune() {
+		foreach ((array) glob($this->_dir . '/qstats_report_*') as $file) {
+			if (@filemtime($file) < time() - $this->Keep) {
+				@unlink($file);
+			}
+		}
+	}
+
+	/**
+	 * ReportCache::count()
+	 *
+	 * @access private
+	 * @param string $counter hits or misses
+	 * @return void
+	 */
+	private function count($counter) {
+		if ($this->_apcu) {
+			if (apcu_inc('qstats_report_' . $counter) === false) {
+				apcu_add('qstats_report_' . $counter, 1);
+			}
+			return;
+		}
+		$fp = @fopen($this->_dir . '/stats', 'c+');
+		if (!$fp) {
+			return;
+		}
+		flock($fp, LOCK_EX);
+		$stats = json_decode(stream_get_contents($fp), true);
+		if (!is_array($stats)) {
+			$stats = array('hits' => 0, 'misses' => 0);
+		}
+		$stats[$counter]++;
+		ftruncate($fp, 0);
+		rewind($fp);
+		fwrite($fp, json_encode($stats));
+		flock($fp, LOCK_UN);
+		fclose($fp);
+	}
+
+	/**
+	 * ReportCache::stats()
+	 *
+	 * Hits and misses since the cache was cleared
+	 *
+	 * @access public
+	 * @return array
+	 */
+	public function stats() {
+		if ($this->_apcu) {
+			return array(
+				'hits' => (int) apcu_fetch('qstats_report_hits'),
+				'misses' => (int) apcu_fetch('qstats_report_misses'),
+				'storage' => 'apcu',
+			);
+		}
+		$stats = json_decode(@file_get_contents($this->_dir . '/stats'), true);
+		if (!is_array($stats)) {
+			$stats = array('hits' => 0, 'misses' => 0);
+		}
+		$stats['storage'] = $this->_dir;
+		return $stats;
+	}
+
+	/**
+	 * ReportCache::clear()
+	 *
+	 * Drop every cached report and the counters
+	 *
+	 * @access public
+	 * @return void
+	 */
+	public function clear() {
+		if ($this->_apcu) {
+			apcu_delete(new APCUIterator('/^qstats_report_/'));
+			return;
+		}
+		foreach ((array) glob($this->_dir . '/qstats_report_*') as $file) {
+			@unlink($file);
+		}
+		@unlink($this->_dir . '/stats');
+	}
+
+}
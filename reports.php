@@ -0,0 +1,110 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Row reports that export.php can rebuild from the session filters,
+// so the pages only post the report name instead of the whole table.
+// Each report has its query and a function making an export line of
+// a row, returning null skips the row. Reports shown page by page also
+// give the parts of the query and the columns datatable.php sorts by.
+
+require_once "callerindex.class.php";
+
+function export_report($name, $params = array()) {
+	global $connection, $DBTable, $lang, $language, $start, $end, $queue, $agent, $period;
+
+	$start_parts = explode(" ,:", $start);
+	$end_parts = explode(" ,:", $end);
+
+	switch ($name) {
+	case 'answered_cdr':
+		// One row per call from call_facts, kept by cron.php, no cdr join
+		$select = "time, callid, queuename, agent, event, wait, talk as dur, did, src, recordingfile, disposition";
+		$from = "call_facts";
+		$where = "time >= '$start' AND time <= '$end' and event in ('COMPLETECALLER', 'COMPLETEAGENT') and agent in ($agent) and queuename in ($queue) and disposition = 'ANSWERED'";
+		return array(
+			'sql' => "select $select from $from where $where order by time",
+			// Paged by datatable.php
+			'select' => $select,
+			'from' => $from,
+			'where' => $where,
+			'columns' => array('time', 'src', 'did', 'queuename', 'agent', 'wait', 'talk', 'event'),
+			'key' => 'callid',
+			'search' => array('src', 'did', 'agent', 'queuename'),
+			'recording' => array('recordingfile', 'time'),
+			'summary' => "select agent, count(*) as ANSWERED, sum(event = 'COMPLETECALLER') as COMPLETECALLER, sum(event = 'COMPLETEAGENT') as COMPLETEAGENT from $from where $where group by agent order by agent",
+			'header' => array("Дата", "CallerId", "DID", "Очередь", "Агент", "Ожид.", "Разг."),
+			'width' => array(40, 32, 25, 25, 64, 25, 25),
+			'title' => "Принятые вызовы",
+			'cover' => "",
+			'row' => function ($r) {
+				$time = date('Y-m-d H:i:s', strtotime($r['time']));
+				return array($time, $r['src'], $r['did'], $r['queuename'], $r['agent'], seconds2minutes($r['wait']), seconds2minutes($r['dur']));
+			},
+		);
+
+	case 'outbound':
+		return array(
+			'sql' => "select calldate, uniqueid, billsec, disposition, src, dst, cnum, cnam, recordingfile from cdr where calldate >= '$start' AND calldate <= '$end' AND `cnam` in ($agent)",
+			'header' => array("Дата", "Агент", "Номер", "Назнач.", "Продолж."),
+			'width' => array(50, 25, 25, 25, 25),
+			'title' => "Исходящие вызовы",
+			'cover' => "",
+			'row' => function ($r) {
+				$time = date('Y-m-d H:i:s', strtotime($r['calldate']));
+				return array($time, $r['cnum'], $r['src'], $r['dst'], seconds2minutes($r['billsec']));
+			},
+		);
+
+	case 'unanswered_cdr':
+		if (isset($params['callerid_search']) && strlen($params['callerid_search']) > 0) {
+			$index = new CallerIndex($connection, $DBTable);
+			$lookup = $index->lookup($params['callerid_search'], false, $start, $end);
+			$sql = "select q.time, q.callid, q.queuename, q.agent, q.event, q.data1, q.data2, q.data3 from $DBTable q join ($lookup) c on q.callid = c.callid
+				where q.time >= '$start' AND q.time <= '$end' and q.event in ('ABANDON','EXITWITHTIMEOUT','ENTERQUEUE') order by q.callid, q.time";
+		} else {
+			$sql = "select time, callid, queuename, agent, event, data1, data2, data3 from $DBTable
+				where time >= '$start' AND time <= '$end' and queuename in ($queue)
+				and event in ('ABANDON','EXITWITHTIMEOUT','ENTERQUEUE') order by callid, time limit 50000";
+		}
+		$cover = $lang["$language"]['queue'] . ": " . $queue . "\n";
+		$cover .= $lang["$language"]['start'] . ": " . $start_parts[0] . "\n";
+		$cover .= $lang["$language"]['end'] . ": " . $end_parts[0] . "\n";
+		$cover .= $lang["$language"]['period'] . ": " . $period . " " . $lang["$language"]['days'] . "\n";
+		// The caller id comes from the ENTERQUEUE row of the same call
+		$callerid = null;
+		return array(
+			'sql' => $sql,
+			'header' => array($lang["$language"]['time'], $lang["$language"]['callerid'], $lang["$language"]['queue'], $lang["$language"]['event'], $lang["$language"]['holdtime'], $lang["$language"]['enterposition'], $lang["$language"]['hangupposition']),
+			'width' => array(40, 32, 23, 23, 23, 25, 25),
+			'title' => $lang["$language"]['user_abandon_calls'],
+			'cover' => $cover,
+			'row' => function ($r) use (&$callerid) {
+				if ($r['event'] == "ENTERQUEUE") {
+					$callerid = $r['data2'];
+					return null;
+				}
+				$time = date('Y-m-d H:i:s', strtotime($r['time']));
+				return array($time, $callerid, $r['queuename'], $r['event'], gmdate('i:s', $r['data3']), $r['data2'], $r['data1']);
+			},
+		);
+	}
+	return null;
+}
+?>
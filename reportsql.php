@@ -0,0 +1,82 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Queries the report pages build themselves, kept here so that
+// schema.php explain checks the very statements the pages run.
+
+// Answered calls of answered_dist.php, read in one unbuffered pass
+function answered_dist_sql($table, $start, $end, $queue, $agent) {
+	return "SELECT queuename, agent, event, data1, data2 FROM $table WHERE time >= '$start' AND time <= '$end' AND event IN ('COMPLETECALLER', 'COMPLETEAGENT') AND queuename IN ($queue) AND agent IN ($agent)";
+}
+
+// Events the qreport.php sweep follows
+function qreport_events() {
+	return array(
+		'login' => array('ADDMEMBER', 'AGENTLOGIN', 'AGENTCALLBACKLOGIN'),
+		'logoff' => array('REMOVEMEMBER', 'AGENTLOGOFF', 'AGENTCALLBACKLOGOFF'),
+		'leave' => array('CONNECT', 'ABANDON', 'EXITWITHTIMEOUT', 'EXITEMPTY', 'EXITWITHKEY'),
+		'hangup' => array('COMPLETECALLER', 'COMPLETEAGENT', 'BLINDTRANSFER', 'ATTENDEDTRANSFER'),
+	);
+}
+
+// Queue members before $before: last login or logoff of each agent and queue
+function qreport_members_sql($table, $before, $queue) {
+	$ev = qreport_events();
+	return "SELECT q.agent, q.queuename, q.event FROM $table q JOIN (
+	SELECT MAX(id) AS id FROM $table WHERE time < '$before' AND queuename IN ($queue, 'NONE')
+	AND event IN ('" . implode("','", array_merge($ev['login'], $ev['logoff'])) . "') GROUP BY agent, queuename) l ON q.id = l.id";
+}
+
+// Time ordered event stream of the qreport.php sweep
+function qreport_stream_sql($table, $start, $end, $queue) {
+	$ev = qreport_events();
+	return "SELECT UNIX_TIMESTAMP(time) AS ts, callid, agent, queuename, event FROM $table
+	WHERE queuename IN ($queue, 'NONE') AND time >= '$start' AND time <= '$end'
+	AND event IN ('ENTERQUEUE', '" . implode("','", array_merge($ev['login'], $ev['logoff'], $ev['leave'], $ev['hangup'])) . "')
+	ORDER BY time, id";
+}
+
+// Counters per window and queue of compare.php from one grouped
+// statement, the windows may overlap so each one is a branch of the
+// union. $target is the SQL of the service level target by queue.
+function compare_sql($table, $queue, $target, $start, $end, $vs_start, $vs_end) {
+	$complete = "event IN ('COMPLETECALLER', 'COMPLETEAGENT')";
+	$sql = array();
+	foreach (array('cur' => array($start, $end), 'vs' => array($vs_start, $vs_end)) as $win => $w) {
+		$sql[] = "SELECT '$win' AS win, queuename,
+	SUM($complete) AS ans,
+	SUM(event IN ('ABANDON', 'EXITWITHTIMEOUT')) AS uns,
+	SUM($complete AND CAST(data1 AS UNSIGNED) <= $target) AS sla,
+	SUM(IF($complete, CAST(data2 AS UNSIGNED), 0)) AS talk
+	FROM $table WHERE time >= '$w[0]' AND time <= '$w[1]' AND queuename IN ($queue)
+	AND event IN ('COMPLETECALLER', 'COMPLETEAGENT', 'ABANDON', 'EXITWITHTIMEOUT')
+	GROUP BY queuename";
+	}
+	return implode(" UNION ALL ", $sql);
+}
+
+// Events of the calls whose callids $lookup selects, for search.php.
+// $alltime is a time condition followed by "and", or empty.
+function search_sql($table, $lookup, $alltime) {
+	return "select q.*,
+    CASE WHEN q.event like 'COMPLETE%' OR q.event like '%TRANSFER' THEN q.callid else 0 end as record_file
+	from $table q join ($lookup) c on q.callid = c.callid where $alltime 1 order by q.callid";
+}
+?>
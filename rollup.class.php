@@ -0,0 +1,158 @@
+<?php
+require_once 'feeder.class.php';
+
+/**
+ * Class Rollup
+ * Hourly counters of queuelog events per queue, agent and event,
+ * with sums of data1/data2/data3. Reports read the rollup for the
+ * whole hours of a window and the raw queuelog only for the edges.
+ */
+
+class Rollup extends Feeder {
+
+	protected $_name = 'rollup';
+
+	/**
+	 * Rollup table name
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Table = 'queuelog_hourly';
+
+	/**
+	 * Rollup::install()
+	 *
+	 * Create the rollup and state tables
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		parent::install();
+		return $this->_db->query("CREATE TABLE IF NOT EXISTS $this->Table (
+			hour datetime NOT NULL,
+			queuename varchar(128) NOT NULL,
+			agent varchar(128) NOT NULL,
+			event varchar(32) NOT NULL,
+			cnt int unsigned NOT NULL DEFAULT 0,
+			sum_data1 bigint NOT NULL DEFAULT 0,
+			sum_data2 bigint NOT NULL DEFAULT 0,
+			sum_data3 bigint NOT NULL DEFAULT 0,
+			PRIMARY KEY (hour, queuename, agent, event),
+			KEY event_hour (event, hour)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+	}
+
+	/**
+	 * Rollup::num()
+	 *
+	 * SQL expression turning a data column into a number,
+	 * non numeric values (Auto-Pause, callerid...) count as 0
+	 *
+	 * @access private
+	 * @param string $col
+	 * @return string
+	 */
+	private function num($col) {
+		return "IF($col REGEXP '^[0-9]+$', $col, 0)";
+	}
+
+	/**
+	 * Rollup::process()
+	 *
+	 * Add a queuelog id range to the hourly counters
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean
+	 */
+	protected function process($from_id, $to_id) {
+		$ok = $this->_db->query("INSERT INTO $this->Table (hour, queuename, agent, event, cnt, sum_data1, sum_data2, sum_data3)
+			SELECT DATE_FORMAT(time, '%Y-%m-%d %H:00:00'), COALESCE(queuename, ''), COALESCE(agent, ''), event,
+				COUNT(*), SUM(" . $this->num('data1') . "), SUM(" . $this->num('data2') . "), SUM(" . $this->num('data3') . ")
+			FROM $this->_table WHERE id > $from_id AND id <= $to_id AND event IS NOT NULL
+			GROUP BY 1, 2, 3, 4
+			ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt), sum_data1 = sum_data1 + VALUES(sum_data1),
+				sum_data2 = sum_data2 + VALUES(sum_data2), sum_data3 = sum_data3 + VALUES(sum_data3)");
+		if (!$ok) {
+			return false;
+		}
+		return $this->maxTime($from_id, $to_id);
+	}
+
+	/**
+	 * Rollup::fetch()
+	 *
+	 * Counters and sums for a window, grouped by any of
+	 * hour, queuename, agent, event, or by expressions of
+	 * them given as alias => expression
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param array $events Event names
+	 * @param string $queue Quoted queue list as in sesvars.php
+	 * @param string|null $agent Quoted agent list, null for all
+	 * @param array $group Columns or alias => expression to group by
+	 * @return array Rows with the group columns, cnt, sum_data1..3
+	 */
+	public function fetch($start, $end, $events, $queue, $agent = null, $group = array('hour', 'queuename', 'agent', 'event')) {
+		$rows = array();
+		$res = $this->_db->query($this->sql($start, $end, $events, $queue, $agent, $group));
+		if (!$res) {
+			trigger_error('Rollup: ' . $this->_db->error, E_USER_WARNING);
+			return $rows;
+		}
+		while ($row = $res->fetch_assoc()) {
+			$rows[] = $row;
+		}
+		$res->free();
+		return $rows;
+	}
+
+	/**
+	 * Rollup::sql()
+	 *
+	 * Query of fetch(), also explained by schema.php
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param array $events
+	 * @param string $queue
+	 * @param string|null $agent
+	 * @param array $group
+	 * @return string
+	 */
+	public function sql($start, $end, $events, $queue, $agent = null, $group = array('hour', 'queuename', 'agent', 'event')) {
+		$where = "event IN ('" . implode("','", $events) . "') AND queuename IN ($queue)";
+		if ($agent !== null) {
+			$where .= " AND agent IN ($agent)";
+		}
+		$raw = "SELECT DATE_FORMAT(time, '%Y-%m-%d %H:00:00') AS hour, queuename, agent, event, 1 AS cnt,
+			" . $this->num('data1') . " AS sum_data1, " . $this->num('data2') . " AS sum_data2, " . $this->num('data3') . " AS sum_data3
+			FROM $this->_table WHERE $where AND ";
+
+		$hours = $this->split($start, $end);
+		if ($hours === null) {
+			$sql = $raw . "time >= '$start' AND time <= '$end'";
+		} else {
+			$sql = "SELECT hour, queuename, agent, event, cnt, sum_data1, sum_data2, sum_data3
+				FROM $this->Table WHERE $where AND hour >= '$hours[0]' AND hour < '$hours[1]'
+				UNION ALL " . $raw . "((time >= '$start' AND time < '$hours[0]') OR (time >= '$hours[1]' AND time <= '$end'))";
+		}
+
+		$select = "";
+		$by = array();
+		foreach ($group as $alias => $col) {
+			$select .= is_int($alias) ? "$col, " : "$col AS $alias, ";
+			$by[] = is_int($alias) ? $col : $alias;
+		}
+		return "SELECT " . $select . "SUM(cnt) AS cnt, SUM(sum_data1) AS sum_data1,
+			SUM(sum_data2) AS sum_data2, SUM(sum_data3) AS sum_data3 FROM ($sql) AS t"
+			. ($by ? " GROUP BY " . implode(', ', $by) : "");
+	}
+
+}
@@ -0,0 +1,168 @@
+<?php
+
+/**
+ * Class Schema
+ * Indexes the reports rely on, applied once as named migrations,
+ * and an EXPLAIN based check of the report queries.
+ */
+
+class Schema {
+
+	/**
+	 * Database connection
+	 *
+	 * @var mysqli
+	 * @access private
+	 */
+	private $_db;
+
+	/**
+	 * Migrations in the order they are applied:
+	 * name => array(table, index, columns)
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_migrations;
+
+	/**
+	 * Schema::__construct()
+	 *
+	 * @access public
+	 * @param mysqli $db Connection to the queuelog database
+	 * @param string $table Queuelog table name
+	 * @return void
+	 */
+	public function __construct($db, $table) {
+		$this->_db = $db;
+		$this->_migrations = array(
+			// answered, unanswered, distribution, qreport, rollup edges, dids:
+			// event IN + time range, the rest of the row read from the index
+			'001_queuelog_event_time' => array($table, 'qs_event_time', 'event, time, queuename, agent, data1, data2, data3'),
+			// search, unanswered_cdr and the cdr joins look calls up by callid
+			'002_queuelog_callid' => array($table, 'qs_callid', 'callid, event, time'),
+			// agent report streams rows ordered by agent and time
+			'003_queuelog_agent_time' => array($table, 'qs_agent_time', 'agent, time, event, queuename'),
+			// raw pages by time, InnoDB appends id for keyset paging
+			'004_queuelog_time' => array($table, 'qs_time', 'time'),
+			'005_cdr_uniqueid' => array('cdr', 'qs_uniqueid', 'uniqueid'),
+			// trunks: calldate range, counted from the index
+			'006_cdr_calldate' => array('cdr', 'qs_calldate', 'calldate, disposition, dst, channel, lastapp'),
+			// outbound by agent
+			'007_cdr_cnam_calldate' => array('cdr', 'qs_cnam_calldate', 'cnam, calldate'),
+		);
+	}
+
+	/**
+	 * Schema::applied()
+	 *
+	 * Names of the migrations already applied
+	 *
+	 * @access private
+	 * @return array
+	 */
+	private function applied() {
+		$this->_db->query("CREATE TABLE IF NOT EXISTS qstats_migrations (
+			name varchar(64) NOT NULL,
+			applied datetime NOT NULL,
+			PRIMARY KEY (name)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+		$done = array();
+		$res = $this->_db->query("SELECT name FROM qstats_migrations");
+		if ($res) {
+			while ($row = $res->fetch_row()) {
+				$done[$row[0]] = true;
+			}
+			$res->free();
+		}
+		return $done;
+	}
+
+	/**
+	 * Schema::hasIndex()
+	 *
+	 * @access private
+	 * @param string $table
+	 * @param string $index
+	 * @return boolean
+	 */
+	private function hasIndex($table, $index) {
+		$res = $this->_db->query("SHOW INDEX FROM $table WHERE Key_name = '$index'");
+		if (!$res) {
+			return false;
+		}
+		$found = $res->num_rows > 0;
+		$res->free();
+		return $found;
+	}
+
+	/**
+	 * Schema::migrate()
+	 *
+	 * Apply the pending migrations
+	 *
+	 * @access public
+	 * @return array Messages, one per migration applied or failed
+	 */
+	public function migrate() {
+		$log = array();
+		$done = $this->applied();
+		foreach ($this->_migrations as $name => $m) {
+			if (isset($done[$name])) {
+				continue;
+			}
+			list($table, $index, $columns) = $m;
+			if (!$this->hasIndex($table, $index)) {
+				// InnoDB builds secondary indexes online, reports keep working
+				if (!$this->_db->query("ALTER TABLE $table ADD INDEX $index ($columns)")) {
+					$log[] = "$name: " . $this->_db->error;
+					break;
+				}
+			}
+			$this->_db->query("INSERT INTO qstats_migrations (name, applied) VALUES ('$name', NOW())");
+			$log[] = "$name: $table.$index ($columns)";
+		}
+		return $log;
+	}
+
+	/**
+	 * Schema::explain()
+	 *
+	 * Problems EXPLAIN shows for a query: full scans, no index,
+	 * table rows read besides the index, filesort, temporary table
+	 *
+	 * @access public
+	 * @param string $sql
+	 * @return array|boolean Messages, false if the query fails
+	 */
+	public function explain($sql) {
+		$res = $this->_db->query("EXPLAIN $sql");
+		if (!$res) {
+			return false;
+		}
+		$warn = array();
+		while ($row = $res->fetch_assoc()) {
+			$t = $row['table'];
+			$extra = isset($row['Extra']) ? $row['Extra'] : '';
+			if ($t === null || strpos($extra, 'no matching') !== false || strpos($extra, 'Impossible') !== false) {
+				continue;
+			}
+			if ($row['type'] == 'ALL') {
+				$warn[] = "$t: full table scan, about " . $row['rows'] . " rows";
+			} else if ($row['key'] === null) {
+				$warn[] = "$t: no index used";
+			} else if (!preg_match('/Using index(;|$)/', $extra) && $t[0] != '<') {
+				$warn[] = "$t: " . $row['key'] . " is not covering, rows are read from the table";
+			}
+			if (strpos($extra, 'filesort') !== false) {
+				$warn[] = "$t: filesort";
+			}
+			if (strpos($extra, 'temporary') !== false) {
+				$warn[] = "$t: temporary table";
+			}
+		}
+		$res->free();
+		return $warn;
+	}
+
+}
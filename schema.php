@@ -0,0 +1,129 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Indexes for the report queries.
+// php schema.php migrate   create the missing indexes
+// php schema.php explain   EXPLAIN the report queries for the last day
+//                          and list full scans and non covering indexes
+
+if (php_sapi_name() != 'cli') {
+	header('HTTP/1.1 403 Forbidden');
+	exit;
+}
+
+chdir(dirname(__FILE__));
+define('QSTATS_WRITE', true);
+require_once "config.php";
+require_once "schema.class.php";
+require_once "rollup.class.php";
+require_once "timehist.class.php";
+require_once "callerindex.class.php";
+require_once "sessions.class.php";
+require_once "abandonstats.class.php";
+require_once "servicelevel.class.php";
+require_once "reportsql.php";
+
+$schema = new Schema($connection, $DBTable);
+$cmd = isset($argv[1]) ? $argv[1] : 'migrate';
+
+if ($cmd == 'migrate') {
+	foreach ($schema->migrate() as $line) {
+		echo "$line\n";
+	}
+	$connection->close();
+	exit;
+}
+
+if ($cmd != 'explain') {
+	echo "Usage: php schema.php [migrate|explain]\n";
+	exit(1);
+}
+
+// Report filters as a user would pick them: last day, all queues and agents
+function quoted_list($db, $sql) {
+	$list = array();
+	$res = $db->query($sql);
+	if ($res) {
+		while ($row = $res->fetch_row()) {
+			$list[] = "'" . $db->real_escape_string($row[0]) . "'";
+		}
+		$res->free();
+	}
+	return $list ? implode(',', $list) : "''";
+}
+
+$start = date('Y-m-d 00:00:00', strtotime('-1 day'));
+$end = date('Y-m-d 23:59:59');
+$queue = quoted_list($connection, "SELECT queuename FROM queues_new");
+$agent = quoted_list($connection, "SELECT agent FROM agents_new");
+$period = 2;
+
+require_once "reports.php";
+
+// Queries of the classes and of reportsql.php, the same calls the pages make
+$rollup = new Rollup($connection, $DBTable);
+$timehist = new TimeHist($connection, $DBTable);
+$callers = new CallerIndex($connection, $DBTable);
+$sessions = new AgentSessions($connection, $DBTable);
+$abandons = new AbandonStats($connection, $DBTable);
+$sla = new ServiceLevel($sla_thresholds);
+$day_hour = array('day' => 'LEFT(hour, 10)', 'hr' => 'HOUR(hour)');
+$look_start = date('Y-m-d H:i:s', strtotime($start) - 3600);
+$vs_start = date('Y-m-d H:i:s', strtotime($start) - (strtotime($end) - strtotime($start) + 1));
+$vs_end = date('Y-m-d H:i:s', strtotime($start) - 1);
+
+$queries = array(
+	'answered' => $rollup->sql($start, $end, array('COMPLETECALLER', 'COMPLETEAGENT'), $queue, $agent, array('agent', 'event')),
+	'answered_dist' => answered_dist_sql($DBTable, $start, $end, $queue, $agent),
+	'timehist_queue' => $timehist->sql($start, $end, $queue, $agent, 'queuename'),
+	'timehist_agent' => $timehist->sql($start, $end, $queue, $agent, 'agent'),
+	'timehist_sla' => $timehist->sql($start, $end, $queue),
+	'unanswered' => $abandons->sql($start, $end, $queue),
+	'distribution' => $rollup->sql($start, $end, array('ABANDON', 'EXITWITHTIMEOUT', 'COMPLETECALLER', 'COMPLETEAGENT', 'ADDMEMBER', 'REMOVEMEMBER', 'AGENTCALLBACKLOGIN', 'AGENTCALLBACKLOGOFF'), "$queue,'NONE'", null, $day_hour + array('event')),
+	'distribution_agents' => $rollup->sql($start, $end, array('COMPLETECALLER', 'COMPLETEAGENT'), $queue, null, $day_hour + array('agent')),
+	'qreport_members' => qreport_members_sql($DBTable, $look_start, $queue),
+	'qreport' => qreport_stream_sql($DBTable, $look_start, $end, $queue),
+	'areport' => $sessions->sql($start, $end, $queue, $agent),
+	'compare' => compare_sql($DBTable, $queue, $sla->sqlTarget($connection), $start, $end, $vs_start, $vs_end),
+	'search' => search_sql($DBTable, $callers->lookup('0000', true, $start, $end), "time >= '$start' AND time <= '$end' and"),
+);
+foreach (array('answered_cdr', 'unanswered_cdr', 'outbound') as $name) {
+	$report = export_report($name);
+	$queries[$name] = $report['sql'];
+}
+
+$problems = 0;
+foreach ($queries as $name => $sql) {
+	$warn = $schema->explain($sql);
+	if ($warn === false) {
+		echo "$name: " . $connection->error . "\n";
+		$problems++;
+	} else if (!$warn) {
+		echo "$name: ok\n";
+	} else {
+		foreach ($warn as $w) {
+			echo "$name: $w\n";
+		}
+		$problems++;
+	}
+}
+$connection->close();
+exit($problems ? 2 : 0);
+?>
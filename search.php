@@ -19,6 +19,8 @@
 */
 require_once("config.php");
 include("sesvars.php");
+require_once("callerindex.class.php");
+require_once("reportsql.php");
 ?>
 <!DOCTYPE html>
 <html xmlns="http://www.w3.org/1999/xhtml">
@@ -48,16 +50,13 @@ $alltime = "time >= '$start' AND time <= '$end' and";
 }
 
 if ( (isset($_POST['callerid'])) && (strlen($_POST['callerid']) > 0) ) {
-    $callerid_search = $_POST['callerid'];
-    $sql = "select distinct(callid) from $DBTable where $alltime data2 like '%$callerid_search%'";
-    $restemp = mysqli_query($connection, $sql);
-        foreach($restemp as $temp){
-		$callid_search .= ",'".$temp['callid']."'";
-		}	
-    $callid_search = substr($callid_search, 1);	
-    $sql = "select *,
-    CASE WHEN event like 'COMPLETE%' OR event like '%TRANSFER' THEN callid else 0 end as record_file
-	from $DBTable where $alltime callid in ($callid_search) order by callid";
+    $index = new CallerIndex($connection, $DBTable);
+    if ( isset($_POST['alltime']) ) {
+        $lookup = $index->lookup($_POST['callerid'], isset($_POST['suffix']));
+    } else {
+        $lookup = $index->lookup($_POST['callerid'], isset($_POST['suffix']), $start, $end);
+    }
+    $sql = search_sql($DBTable, $lookup, $alltime);
     $result = mysqli_query($connection, $sql);
 }
  elseif ( (isset($_POST['uniqueid'])) && (strlen($_POST['uniqueid']) > 0) ) {
@@ -137,6 +136,7 @@ mysqli_close($connection);
 	&nbsp;&nbsp;&nbsp;<input type="checkbox" name="alltime" value="alltime">&nbsp;<?php echo "Искать за все время";?><br/><br/>
     &nbsp;&nbsp;&nbsp;<b>UniqueID</b>&nbsp;<input type="text" id="uniqueid" name="uniqueid" />
 	&nbsp;&nbsp;&nbsp;<b>CallerID</b>&nbsp;<input type="text" id="callerid" name="callerid" />
+	&nbsp;<input type="checkbox" name="suffix" value="suffix">&nbsp;<?php echo "Окончание номера";?>
     &nbsp;&nbsp;&nbsp;<button type="submit" name="submit"><?php echo $lang["$language"]['filter'] ?> </button>
 </form>	
 		<br/>		
@@ -3,14 +3,21 @@
 /**
 * Class Sendfile
 * Send local file to download
-* Support "206 Partial Content"
+* Support "206 Partial Content", multipart ranges, ETag/If-Range
+* and X-Sendfile / X-Accel-Redirect offload to the web server
 */
 
 class Sendfile {
 	# Локаль
 	public $Locale = 'ru_RU.utf-8';
-	# Скорость в Кб/сек
-	public $Speed = 2048;
+	# Скорость в Кб/сек, 0 - без ограничения
+	public $Speed = 0;
+	# Отдать файл веб-серверу: null, 'X-Sendfile' (apache, lighttpd)
+	# или 'X-Accel-Redirect' (nginx)
+	public $Offload = null;
+	# Для X-Accel-Redirect: путь на диске => internal location nginx,
+	# например array('/var/spool/asterisk/monitor/' => '/monitor/')
+	public $AccelPath = array();
 	# Content Type
 	public $ContentType = null;	
 	# Content Type автоопределение
@@ -59,7 +66,7 @@ class Sendfile {
 			if (preg_match('#^(\d+)\-$#', $range_spec, $match)) {
 				$first_byte_pos = $match[1];
 
-				if ($first_byte_pos > $entity_body_length) {
+				if ($first_byte_pos >= $entity_body_length) {
 					continue;
 				}
 
@@ -74,6 +81,10 @@ class Sendfile {
 				if ($last_byte_pos < $first_byte_pos) {
 					return false;
 				}
+				// Starts past the end of the file: unsatisfiable
+				if ($first_byte_pos >= $entity_body_length) {
+					continue;
+				}
 				$first_pos = $first_byte_pos;
 				$last_pos = min($entity_body_length - 1, $last_byte_pos);
 			} else if (preg_match('#^\-(\d+)$#', $range_spec, $match)) {
@@ -116,78 +127,142 @@ class Sendfile {
 		return $res;
 	}
 
+	# ETag по времени изменения и размеру
+	private function getETag($stat) {
+		return '"' . dechex($stat['mtime']) . '-' . dechex($stat['size']) . '"';
+	}
+
+	# Вывести часть файла
+	private function output($f, $offset, $length) {
+		fseek($f, $offset);
+		if ($this->Speed <= 0) {
+			$out = fopen('php://output', 'wb');
+			stream_copy_to_stream($f, $out, $length);
+			fclose($out);
+			return;
+		}
+		$chunk = $this->Speed * 1024;
+		while ($length > 0 && !feof($f)) {
+			set_time_limit(0);
+			if (connection_aborted()) {
+				break;
+			}
+			$data = fread($f, min($chunk, $length));
+			$length -= strlen($data);
+			echo $data;
+			flush();
+			if ($length > 0) {
+				sleep(1);
+			}
+		}
+	}
+
 	# Отправка файла
 	public function send() {
 		$this->setLocale();
-		
-		if (isset($this->Path) && file_exists($this->Path) && is_file($this->Path)) {
-			$this->FileName = ($this->FileName) ? $this->FileName : $this->getFileName($this->Path);
-			$contentDisp = ($this->ContentInline === true) ? 'inline' : 'attachment';
-			$this->ContentType = ($this->ContentType) ? $this->ContentType : $this->getMime($this->Path);
-			
-			$this->Speed = $this->Speed * 1024;
-			$fileSize = filesize($this->Path);
-			# Чистка буфера
+
+		if (!isset($this->Path) || !is_file($this->Path)) {
+			header('HTTP/1.1 404 Not Found');
+			return;
+		}
+		$this->FileName = ($this->FileName) ? $this->FileName : $this->getFileName($this->Path);
+		$contentDisp = ($this->ContentInline === true) ? 'inline' : 'attachment';
+		$this->ContentType = ($this->ContentType) ? $this->ContentType : $this->getMime($this->Path);
+
+		$stat = stat($this->Path);
+		$fileSize = $stat['size'];
+		$etag = $this->getETag($stat);
+		$lastModified = gmdate('D, d M Y H:i:s', $stat['mtime']) . ' GMT';
+		# Чистка буфера
+		while (ob_get_level()) {
 			ob_end_clean();
-			
-			# Нет HTTP_RANGE
-			if (@getenv('HTTP_RANGE') == '') {
-				$f = fopen($this->Path, 'rb');
-				header('Cache-Control: no-store, no-cache, must-revalidate, post-check=0, pre-check=0');
-				header('Pragma: no-cache');
-				header('HTTP/1.1 200 OK');
-				header('Connection: close');
-				header('Content-Type: ' . $this->ContentType);
-				header('Accept-Ranges: bytes');
-				header('Content-Disposition: '.$contentDisp.'; filename="' . $this->FileName . '"');
-//				header('Content-Length: ' . $fileSize); 
-
-				while (!feof($f)) {
-					set_time_limit(0);
-					if (connection_aborted()) {
-						break;
-					}
-					echo fread($f, $this->Speed);
-					ob_flush();
-					flush();
-					sleep(1);
-				}
-				fclose($f);			
-			} else {
-				$range = $this->parseRangeRequest($fileSize, strip_tags(getenv('HTTP_RANGE')));
-				if ($range && $range !== false) {
-					$f = fopen($this->Path, 'rb');
-					# Установить позицию чтения в файле
-					fseek($f, $range[0]['firstPos']);
-					
-					header('Cache-Control: no-store, no-cache, must-revalidate, post-check=0, pre-check=0');
-					header('Pragma: no-cache');					
-					header('HTTP/1.1 206 Partial Content');
-					header('Connection: close');
-					header('Content-Type: ' . $this->ContentType);
-					header('Accept-Ranges: bytes');
-					header('Content-Disposition: '.$contentDisp.'; filename="' . $this->FileName . '"');
-					header('Content-Range: bytes ' . $range[0]['firstPos'] . '-'. $range[0]['lastPos'] . '/'. $fileSize);
-//					header('Content-Length: ' . $range[0]['chunkSize']); 
-
-					while (!feof($f)) {
-						set_time_limit(0);
-						if (connection_aborted()) {
-							break;
-						}
-						echo fread($f, $this->Speed);
-						ob_flush();
-						flush();
-						sleep(1);
-					}
-					fclose($f);					
+		}
+
+		header('Cache-Control: private, max-age=0, must-revalidate');
+		header('ETag: ' . $etag);
+		header('Last-Modified: ' . $lastModified);
+		header('Accept-Ranges: bytes');
+		header('Content-Type: ' . $this->ContentType);
+		header('Content-Disposition: '.$contentDisp.'; filename="' . $this->FileName . '"');
+
+		# Файл не изменился
+		if (isset($_SERVER['HTTP_IF_NONE_MATCH']) && trim($_SERVER['HTTP_IF_NONE_MATCH']) == $etag) {
+			header('HTTP/1.1 304 Not Modified');
+			return;
+		}
+
+		# Диапазоны и Content-Length веб-сервер посчитает сам
+		if ($this->Offload == 'X-Sendfile') {
+			header('X-Sendfile: ' . $this->Path);
+			return;
+		}
+		if ($this->Offload == 'X-Accel-Redirect') {
+			foreach ($this->AccelPath as $dir => $uri) {
+				if (strpos($this->Path, $dir) === 0) {
+					header('X-Accel-Redirect: ' . $uri . substr($this->Path, strlen($dir)));
+					return;
 				}
 			}
+		}
+
+		$range = false;
+		$rangeHeader = isset($_SERVER['HTTP_RANGE']) ? $_SERVER['HTTP_RANGE'] : '';
+		# If-Range: диапазон только если файл тот же, иначе весь файл
+		if ($rangeHeader != '' && isset($_SERVER['HTTP_IF_RANGE'])) {
+			$ifRange = trim($_SERVER['HTTP_IF_RANGE']);
+			if ($ifRange != $etag && $ifRange != $lastModified) {
+				$rangeHeader = '';
+			}
+		}
+		if ($rangeHeader != '') {
+			$range = $this->parseRangeRequest($fileSize, $rangeHeader);
+		}
+
+		# Ни один диапазон не попал в файл
+		if (is_array($range) && !$range) {
+			header('HTTP/1.1 416 Requested Range Not Satisfiable');
+			header('Content-Range: bytes */' . $fileSize);
+			return;
+		}
+
+		$f = fopen($this->Path, 'rb');
+		if ($range === false) {
+			# Нет HTTP_RANGE или он некорректен
+			header('HTTP/1.1 200 OK');
+			header('Content-Length: ' . $fileSize);
+			$this->output($f, 0, $fileSize);
+		} else if (count($range) == 1) {
+			$r = reset($range);
+			header('HTTP/1.1 206 Partial Content');
+			header('Content-Range: bytes ' . $r['firstPos'] . '-' . $r['lastPos'] . '/' . $fileSize);
+			header('Content-Length: ' . ($r['lastPos'] - $r['firstPos'] + 1));
+			$this->output($f, $r['firstPos'], $r['lastPos'] - $r['firstPos'] + 1);
 		} else {
-			header('HTTP/1.1 404 Not Found');
+			# multipart/byteranges, длину считаем заранее
+			$boundary = md5($etag . microtime());
+			$parts = array();
+			$length = 0;
+			foreach ($range as $r) {
+				$head = "\r\n--$boundary\r\nContent-Type: " . $this->ContentType . "\r\n"
+					. 'Content-Range: bytes ' . $r['firstPos'] . '-' . $r['lastPos'] . '/' . $fileSize . "\r\n\r\n";
+				$parts[] = array($head, $r['firstPos'], $r['lastPos'] - $r['firstPos'] + 1);
+				$length += strlen($head) + $r['lastPos'] - $r['firstPos'] + 1;
+			}
+			$tail = "\r\n--$boundary--\r\n";
+			$length += strlen($tail);
+
+			header('HTTP/1.1 206 Partial Content');
+			header('Content-Type: multipart/byteranges; boundary=' . $boundary);
+			header('Content-Length: ' . $length);
+			foreach ($parts as $part) {
+				echo $part[0];
+				$this->output($f, $part[1], $part[2]);
+			}
+			echo $tail;
 		}
-	}	
-	
+		fclose($f);
+	}
+
 }
 
 
@@ -0,0 +1,136 @@
+<?php
+require_once 'sketch.class.php';
+
+/**
+ * Class ServiceLevel
+ * Service level of the queues against thresholds set per queue:
+ * calls answered within each threshold as a share of all the calls,
+ * abandons included, and the calls abandoned within it. Computed from
+ * the wait sketches of TimeHist, so new thresholds apply to the whole
+ * history without reading queuelog again.
+ */
+
+class ServiceLevel {
+
+	/**
+	 * Thresholds in seconds: queue => array(seconds), '*' for the others
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_thresholds;
+
+	/**
+	 * ServiceLevel::__construct()
+	 *
+	 * @access public
+	 * @param array $thresholds queue => array(seconds), '*' for the others
+	 * @return void
+	 */
+	public function __construct($thresholds) {
+		if (!isset($thresholds['*'])) {
+			$thresholds['*'] = array(20);
+		}
+		foreach ($thresholds as $queue => $list) {
+			$list = array_map('intval', (array) $list);
+			// The first one is the target, the others follow ascending
+			$target = array_shift($list);
+			$list = array_diff(array_unique($list), array($target));
+			sort($list);
+			$thresholds[$queue] = array_merge(array($target), $list);
+		}
+		$this->_thresholds = $thresholds;
+	}
+
+	/**
+	 * ServiceLevel::thresholds()
+	 *
+	 * @access public
+	 * @param string $queue
+	 * @return array Seconds, the target first, the others ascending
+	 */
+	public function thresholds($queue) {
+		return isset($this->_thresholds[$queue]) ? $this->_thresholds[$queue] : $this->_thresholds['*'];
+	}
+
+	/**
+	 * ServiceLevel::target()
+	 *
+	 * Main threshold of a queue, the first one
+	 *
+	 * @access public
+	 * @param string $queue
+	 * @return int
+	 */
+	public function target($queue) {
+		$list = $this->thresholds($queue);
+		return $list[0];
+	}
+
+	/**
+	 * ServiceLevel::sqlTarget()
+	 *
+	 * Main threshold as an SQL expression of the queue column
+	 *
+	 * @access public
+	 * @param mysqli $db For escaping
+	 * @param string $col
+	 * @return string
+	 */
+	public function sqlTarget($db, $col = 'queuename') {
+		$sql = "CASE $col";
+		foreach ($this->_thresholds as $queue => $list) {
+			if ($queue !== '*') {
+				$sql .= " WHEN '" . $db->real_escape_string($queue) . "' THEN " . $list[0];
+			}
+		}
+		return $sql . " ELSE " . $this->_thresholds['*'][0] . " END";
+	}
+
+	/**
+	 * ServiceLevel::measure()
+	 *
+	 * @access public
+	 * @param string $queue
+	 * @param Sketch $answered Wait of the answered calls
+	 * @param Sketch $abandoned Wait of the unanswered calls
+	 * @return array answered, abandoned, calls and by threshold =>
+	 *               array(answered, abandoned, level in percent)
+	 */
+	public function measure($queue, $answered, $abandoned) {
+		$calls = $answered->count() + $abandoned->count();
+		$result = array(
+			'answered' => $answered->count(),
+			'abandoned' => $abandoned->count(),
+			'calls' => $calls,
+			'by' => array(),
+		);
+		foreach ($this->thresholds($queue) as $seconds) {
+			$within = $answered->atMost($seconds);
+			$result['by'][$seconds] = array(
+				'answered' => $within,
+				'abandoned' => $abandoned->atMost($seconds),
+				'level' => $calls ? round($within * 100 / $calls, 2) : 0,
+			);
+		}
+		return $result;
+	}
+
+	/**
+	 * ServiceLevel::queues()
+	 *
+	 * Service level of every queue of TimeHist::sketches() by queuename
+	 *
+	 * @access public
+	 * @param array $sketches
+	 * @return array queue => see measure()
+	 */
+	public function queues($sketches) {
+		$levels = array();
+		foreach ($sketches as $queue => $s) {
+			$levels[$queue] = $this->measure($queue, $s['wait'], $s['abnd']);
+		}
+		return $levels;
+	}
+
+}
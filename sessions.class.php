@@ -0,0 +1,297 @@
+<?php
+
+/**
+ * Class AgentSessions
+ * Daily talk, pause and free time of agents in one pass over
+ * queuelog. Rows are streamed ordered by agent and time and each
+ * agent keeps a small state: queues it is logged in and paused in.
+ * Pauses in several queues at once are counted once.
+ */
+
+class AgentSessions {
+
+	/**
+	 * Database connection
+	 *
+	 * @var mysqli
+	 * @access private
+	 */
+	private $_db;
+
+	/**
+	 * Queuelog table name
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_table;
+
+	/**
+	 * Window being reported, unix timestamps
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_from;
+	private $_to;
+
+	/**
+	 * Totals of the current agent: day => counters
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_days;
+
+	/**
+	 * Work time of a day without ADDMEMBER/REMOVEMEMBER, seconds
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Workday = 32400;
+
+	/**
+	 * AgentSessions::__construct()
+	 *
+	 * @access public
+	 * @param mysqli $db
+	 * @param string $table Queuelog table name
+	 * @return void
+	 */
+	public function __construct($db, $table) {
+		$this->_db = $db;
+		$this->_table = $table;
+	}
+
+	/**
+	 * AgentSessions::add()
+	 *
+	 * @access private
+	 * @param string $day
+	 * @param string $field
+	 * @param float $value
+	 * @return void
+	 */
+	private function add($day, $field, $value) {
+		if (!isset($this->_days[$day])) {
+			$this->_days[$day] = array('INCALL' => 0, 'PAUSE' => 0, 'WORK' => 0, 'LOGIN' => false,
+				'COMPLETE' => 0, 'TRANSFER_HCT' => 0, 'RNA' => 0);
+		}
+		$this->_days[$day][$field] += $value;
+	}
+
+	/**
+	 * AgentSessions::spread()
+	 *
+	 * Add an interval to the days it covers
+	 *
+	 * @access private
+	 * @param int $from
+	 * @param int $to
+	 * @param string $field WORK or PAUSE
+	 * @return void
+	 */
+	private function spread($from, $to, $field) {
+		$from = max($from, $this->_from);
+		$to = min($to, $this->_to);
+		while ($from < $to) {
+			$day = date('Y-m-d', $from);
+			$next = min($to, strtotime("$day +1 day"));
+			$this->add($day, $field, $next - $from);
+			if ($field == 'WORK') {
+				$this->_days[$day]['LOGIN'] = true;
+			}
+			$from = $next;
+		}
+	}
+
+	/**
+	 * AgentSessions::fetch()
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue Quoted queue list as in sesvars.php
+	 * @param string $agent Quoted agent list as in sesvars.php
+	 * @return array day => agent => totals in seconds
+	 */
+	public function fetch($start, $end, $queue, $agent) {
+		$this->_from = strtotime($start);
+		$this->_to = min(strtotime($end) + 1, time());
+
+		// Unbuffered, rows are not kept by the client library
+		$res = $this->_db->query($this->sql($start, $end, $queue, $agent), MYSQLI_USE_RESULT);
+		if (!$res) {
+			trigger_error('AgentSessions: ' . $this->_db->error, E_USER_WARNING);
+			return array();
+		}
+
+		$result = array();
+		$current = null;
+		while ($row = $res->fetch_assoc()) {
+			if ($row['agent'] !== $current) {
+				if ($current !== null) {
+					$this->close($result, $current, $state);
+				}
+				$current = $row['agent'];
+				$state = array('member' => array(), 'seen' => array(), 'login' => null, 'paused' => array(), 'pause' => null);
+				$this->_days = array();
+			}
+			$this->step($state, $row);
+		}
+		if ($current !== null) {
+			$this->close($result, $current, $state);
+		}
+		$res->free();
+		ksort($result);
+		return $result;
+	}
+
+	/**
+	 * AgentSessions::sql()
+	 *
+	 * Query of fetch(), also explained by schema.php
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string $queue
+	 * @param string $agent
+	 * @return string
+	 */
+	public function sql($start, $end, $queue, $agent) {
+		return "SELECT time, callid, queuename, agent, event, data1, data2, data3, data4 FROM $this->_table
+			WHERE queuename IN ($queue) AND agent IN ($agent) AND time >= '$start' AND time <= '$end'
+			AND event IN ('ADDMEMBER', 'REMOVEMEMBER', 'PAUSE', 'UNPAUSE', 'COMPLETEAGENT', 'COMPLETECALLER',
+				'RINGNOANSWER', 'BLINDTRANSFER', 'ATTENDEDTRANSFER')
+			ORDER BY agent, time, id";
+	}
+
+	/**
+	 * AgentSessions::step()
+	 *
+	 * Apply one queuelog row to the agent state
+	 *
+	 * @access private
+	 * @param array $state
+	 * @param array $row
+	 * @return void
+	 */
+	private function step(&$state, $row) {
+		$ts = strtotime($row['time']);
+		$day = date('Y-m-d', $ts);
+		$que = $row['queuename'];
+
+		switch ($row['event']) {
+		case 'ADDMEMBER':
+			if ($row['callid'] !== 'MANAGER') {
+				break;
+			}
+			if (!$state['member']) {
+				$state['login'] = $ts;
+			}
+			$state['member'][$que] = true;
+			$state['seen'][$que] = true;
+			break;
+		case 'REMOVEMEMBER':
+			if ($row['callid'] !== 'MANAGER') {
+				break;
+			}
+			if (isset($state['member'][$que])) {
+				unset($state['member'][$que]);
+				if (!$state['member']) {
+					$this->spread($state['login'], $ts, 'WORK');
+					$state['login'] = false;
+					$this->logout($state, $ts);
+				}
+			} elseif (!isset($state['seen'][$que])) {
+				// In the queue since before the window: logged in from
+				// its start, which covers all the work counted so far
+				foreach ($this->_days as $d => $v) {
+					$this->_days[$d]['WORK'] = 0;
+				}
+				$this->spread($this->_from, $ts, 'WORK');
+				if ($state['member']) {
+					$state['login'] = $ts;
+				} else {
+					$this->logout($state, $ts);
+				}
+			}
+			$state['seen'][$que] = true;
+			break;
+		case 'PAUSE':
+			if (!$state['paused']) {
+				$state['pause'] = $ts;
+			}
+			$state['paused'][$que] = true;
+			break;
+		case 'UNPAUSE':
+			if (isset($state['paused'][$que])) {
+				unset($state['paused'][$que]);
+				if (!$state['paused']) {
+					$this->spread($state['pause'], $ts, 'PAUSE');
+				}
+			}
+			break;
+		case 'COMPLETEAGENT':
+		case 'COMPLETECALLER':
+			$this->add($day, 'INCALL', (int) $row['data2']);
+			$this->add($day, 'COMPLETE', 1);
+			break;
+		case 'BLINDTRANSFER':
+		case 'ATTENDEDTRANSFER':
+			$this->add($day, 'TRANSFER_HCT', ($row['data3'] / 60) + ($row['data4'] / 60));
+			break;
+		case 'RINGNOANSWER':
+			$this->add($day, 'RNA', ((int) $row['data1'] > 1500) ? 1 : 0);
+			break;
+		}
+	}
+
+	/**
+	 * AgentSessions::logout()
+	 *
+	 * Logging out ends the pause too
+	 *
+	 * @access private
+	 * @param array $state
+	 * @param int $ts
+	 * @return void
+	 */
+	private function logout(&$state, $ts) {
+		if ($state['paused']) {
+			$this->spread($state['pause'], $ts, 'PAUSE');
+			$state['paused'] = array();
+		}
+	}
+
+	/**
+	 * AgentSessions::close()
+	 *
+	 * Close the open intervals of an agent and move its days to the result
+	 *
+	 * @access private
+	 * @param array $result
+	 * @param string $agent
+	 * @param array $state
+	 * @return void
+	 */
+	private function close(&$result, $agent, $state) {
+		if ($state['member']) {
+			$this->spread($state['login'], $this->_to, 'WORK');
+		}
+		if ($state['paused']) {
+			$this->spread($state['pause'], $this->_to, 'PAUSE');
+		}
+		foreach ($this->_days as $day => $v) {
+			if (!$v['LOGIN']) {
+				$v['WORK'] = $this->Workday;
+			}
+			$v['FREE'] = max(0, $v['WORK'] - $v['INCALL'] - $v['PAUSE']);
+			unset($v['LOGIN']);
+			$result[$day][$agent] = $v;
+		}
+	}
+
+}
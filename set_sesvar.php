@@ -19,6 +19,7 @@
     <http://www.gnu.org/licenses/>.
 */
 
+define('QSTATS_NODB', true);
 require_once("config.php");
 if(isset($_REQUEST['sesvar'])) {
   $variable=$_REQUEST['sesvar'];
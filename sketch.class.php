@@ -0,0 +1,158 @@
+<?php
+
+/**
+ * Class Sketch
+ * Log-linear histogram of seconds for percentiles in constant memory.
+ * Values under 64 have a bucket each, above that every power of two
+ * is split in 32 buckets, so a percentile is off by at most 3%. The
+ * buckets are fixed: sketches of hours, queues or agents merge by
+ * adding their counts.
+ */
+
+class Sketch {
+
+	/**
+	 * Calls by bucket
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_counts = array();
+
+	/**
+	 * Calls counted
+	 *
+	 * @var int
+	 * @access private
+	 */
+	private $_total = 0;
+
+	/**
+	 * Sketch::bucket()
+	 *
+	 * @access public
+	 * @param int $value Seconds
+	 * @return int
+	 */
+	public static function bucket($value) {
+		$value = max(0, (int) $value);
+		if ($value < 64) {
+			return $value;
+		}
+		$e = strlen(decbin($value)) - 1;
+		return ($e - 6) * 32 + 32 + ($value >> ($e - 5));
+	}
+
+	/**
+	 * Sketch::sqlBucket()
+	 *
+	 * The same bucket as an SQL expression of an unsigned column
+	 *
+	 * @access public
+	 * @param string $col
+	 * @return string
+	 */
+	public static function sqlBucket($col) {
+		return "IF($col < 64, $col, (CHAR_LENGTH(BIN($col)) - 7) * 32 + 32 + ($col >> (CHAR_LENGTH(BIN($col)) - 6)))";
+	}
+
+	/**
+	 * Sketch::value()
+	 *
+	 * Middle of the seconds a bucket stands for
+	 *
+	 * @access public
+	 * @param int $bucket
+	 * @return int
+	 */
+	public static function value($bucket) {
+		if ($bucket < 64) {
+			return $bucket;
+		}
+		$shift = (($bucket - 64) >> 5) + 1;
+		$low = (($bucket - 64) % 32 + 32) << $shift;
+		return $low + (((1 << $shift) - 1) >> 1);
+	}
+
+	/**
+	 * Sketch::add()
+	 *
+	 * @access public
+	 * @param int $bucket
+	 * @param int $count
+	 * @return void
+	 */
+	public function add($bucket, $count = 1) {
+		$bucket = (int) $bucket;
+		$this->_counts[$bucket] = (isset($this->_counts[$bucket]) ? $this->_counts[$bucket] : 0) + $count;
+		$this->_total += $count;
+	}
+
+	/**
+	 * Sketch::merge()
+	 *
+	 * @access public
+	 * @param Sketch $other
+	 * @return void
+	 */
+	public function merge($other) {
+		foreach ($other->_counts as $bucket => $count) {
+			$this->add($bucket, $count);
+		}
+	}
+
+	/**
+	 * Sketch::count()
+	 *
+	 * @access public
+	 * @return int
+	 */
+	public function count() {
+		return $this->_total;
+	}
+
+	/**
+	 * Sketch::atMost()
+	 *
+	 * Calls of at most $seconds, exact under 64 seconds, above that
+	 * the bucket holding $seconds is counted whole
+	 *
+	 * @access public
+	 * @param int $seconds
+	 * @return int
+	 */
+	public function atMost($seconds) {
+		$last = self::bucket($seconds);
+		$count = 0;
+		foreach ($this->_counts as $bucket => $n) {
+			if ($bucket <= $last) {
+				$count += $n;
+			}
+		}
+		return $count;
+	}
+
+	/**
+	 * Sketch::percentile()
+	 *
+	 * @access public
+	 * @param float $p 0 to 100
+	 * @return int|null Seconds, null when nothing was counted
+	 */
+	public function percentile($p) {
+		if ($this->_total == 0) {
+			return null;
+		}
+		ksort($this->_counts);
+		$rank = max(1, ceil($this->_total * $p / 100));
+		$seen = 0;
+		foreach ($this->_counts as $bucket => $count) {
+			$seen += $count;
+			if ($seen >= $rank) {
+				return self::value($bucket);
+			}
+		}
+		return self::value($bucket);
+	}
+
+}
@@ -0,0 +1,57 @@
+<?php
+/*
+Copyright 2019, https://asterisk-pbx.ru
+
+This file is part of Asterisk Call Center Stats.
+Asterisk Call Center Stats is free software: you can redistribute it
+and/or modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+Asterisk Call Center Stats is distributed in the hope that it will be
+useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Asterisk Call Center Stats.  If not, see
+<http://www.gnu.org/licenses/>.
+ */
+
+// Service level of every queue since midnight as JSON for the
+// realtime pages, against the thresholds of config.php. One viewer
+// per interval reads the database, the others get the snapshot.
+
+define('QSTATS_NODB', true);
+require_once "config.php";
+require_once "snapshot.class.php";
+require_once "timehist.class.php";
+require_once "servicelevel.class.php";
+session_write_close();
+
+// Seconds the levels are shared between the viewers
+$sla_ttl = 30;
+
+$snapshot = new Snapshot();
+$json = $snapshot->get('sla', $sla_ttl, function () use ($db, $DBTable, $sla_thresholds) {
+	$timehist = new TimeHist($db->get('cdr', true), $DBTable);
+	$sla = new ServiceLevel($sla_thresholds);
+	$levels = array();
+	foreach ($sla->queues($timehist->sketches(date('Y-m-d 00:00:00'), date('Y-m-d H:i:s'), null)) as $queue => $level) {
+		foreach ($level['by'] as $seconds => $by) {
+			$levels[] = array(
+				'Queue' => $queue,
+				'Threshold' => $seconds,
+				'Calls' => $level['calls'],
+				'Answered' => $by['answered'],
+				'Level' => $by['level'],
+				'Abandoned' => $by['abandoned'],
+			);
+		}
+	}
+	return json_encode($levels);
+});
+
+header('Content-Type: application/json; charset=utf-8');
+echo $json;
+?>
@@ -0,0 +1,181 @@
+<?php
+
+/**
+ * Class Snapshot
+ * Short lived cache shared by all PHP processes, kept in APCu
+ * or in a file under /dev/shm. A stale entry is refreshed by one
+ * caller only, the others get the previous snapshot or wait for
+ * the refresh in flight instead of asking Asterisk themselves.
+ */
+
+class Snapshot {
+
+	/**
+	 * Directory for the file storage
+	 *
+	 * @var string
+	 * @access private
+	 */
+	private $_dir;
+
+	/**
+	 * Use APCu instead of files
+	 *
+	 * @var boolean
+	 * @access private
+	 */
+	private $_apcu = false;
+
+	/**
+	 * Longest wait for a refresh done by another process, seconds
+	 *
+	 * @var int
+	 * @access public
+	 */
+	public $Wait = 5;
+
+	/**
+	 * Snapshot::__construct()
+	 *
+	 * @access public
+	 * @param string|null $dir Directory for the file storage
+	 * @return void
+	 */
+	public function __construct($dir = null) {
+		if (function_exists('apcu_fetch') && ini_get('apc.enabled')) {
+			$this->_apcu = true;
+		}
+		if ($dir === null) {
+			$dir = is_writable('/dev/shm') ? '/dev/shm' : sys_get_temp_dir();
+		}
+		$this->_dir = rtrim($dir, '/');
+	}
+
+	/**
+	 * Snapshot::get()
+	 *
+	 * Cached value of $key, $refresh() is called when it is
+	 * older than $ttl and nobody else is refreshing it
+	 *
+	 * @access public
+	 * @param string $key
+	 * @param float $ttl Seconds
+	 * @param callable $refresh Returns the new value, false on error
+	 * @return mixed
+	 */
+	public function get($key, $ttl, $refresh) {
+		$key = 'qstats_' . md5($key);
+		if ($this->_apcu) {
+			return $this->getApcu($key, $ttl, $refresh);
+		}
+		return $this->getFile($key, $ttl, $refresh);
+	}
+
+	/**
+	 * Snapshot::getApcu()
+	 *
+	 * @access private
+	 * @param string $key
+	 * @param float $ttl
+	 * @param callable $refresh
+	 * @return mixed
+	 */
+	private function getApcu($key, $ttl, $refresh) {
+		$entry = apcu_fetch($key);
+		if ($entry !== false && microtime(true) - $entry[0] < $ttl) {
+			return $entry[1];
+		}
+		// apcu_add is atomic, the first caller becomes the refresher
+		if (apcu_add($key . '_lock', 1, $this->Wait)) {
+			$value = call_user_func($refresh);
+			if ($value !== false) {
+				apcu_store($key, array(microtime(true), $value));
+			}
+			apcu_delete($key . '_lock');
+			return $value;
+		}
+		if ($entry !== false) {
+			return $entry[1];
+		}
+		$until = microtime(true) + $this->Wait;
+		while (microtime(true) < $until) {
+			usleep(20000);
+			$entry = apcu_fetch($key);
+			if ($entry !== false) {
+				return $entry[1];
+			}
+			if (!apcu_exists($key . '_lock')) {
+				break;
+			}
+		}
+		return call_user_func($refresh);
+	}
+
+	/**
+	 * Snapshot::getFile()
+	 *
+	 * @access private
+	 * @param string $key
+	 * @param float $ttl
+	 * @param callable $refresh
+	 * @return mixed
+	 */
+	private function getFile($key, $ttl, $refresh) {
+		$file = "$this->_dir/$key";
+		$entry = $this->readFile($file);
+		if ($entry !== false && microtime(true) - $entry[0] < $ttl) {
+			return $entry[1];
+		}
+
+		$lock = @fopen("$file.lock", 'c');
+		if (!$lock) {
+			return call_user_func($refresh);
+		}
+		if (!flock($lock, LOCK_EX | LOCK_NB)) {
+			if ($entry !== false) {
+				fclose($lock);
+				return $entry[1];
+			}
+			// First snapshot is being taken, wait for it
+			flock($lock, LOCK_EX);
+			flock($lock, LOCK_UN);
+			fclose($lock);
+			$entry = $this->readFile($file);
+			return ($entry !== false) ? $entry[1] : call_user_func($refresh);
+		}
+
+		// Somebody may have refreshed it while we were locking
+		$entry = $this->readFile($file);
+		if ($entry !== false && microtime(true) - $entry[0] < $ttl) {
+			$value = $entry[1];
+		} else {
+			$value = call_user_func($refresh);
+			if ($value !== false) {
+				$tmp = "$file." . getmypid();
+				if (@file_put_contents($tmp, serialize(array(microtime(true), $value))) !== false) {
+					rename($tmp, $file);
+				}
+			}
+		}
+		flock($lock, LOCK_UN);
+		fclose($lock);
+		return $value;
+	}
+
+	/**
+	 * Snapshot::readFile()
+	 *
+	 * @access private
+	 * @param string $file
+	 * @return array|boolean array(time, value) or false
+	 */
+	private function readFile($file) {
+		$data = @file_get_contents($file);
+		if ($data === false) {
+			return false;
+		}
+		$entry = @unserialize($data);
+		return is_array($entry) ? $entry : false;
+	}
+
+}
@@ -1,12 +1,15 @@
 <?php
+define('QSTATS_WRITE', true);
 require_once "config.php";
 require_once "sesvars.php";
+require_once "dictionary.class.php";
 
 session_start();
 if (isset($_POST['agent_sync'])) {
-	$aquery = "truncate agents_new;";
-	$aquery .= "insert ignore into agents_new (agent) SELECT DISTINCT(agent) FROM $DBTable where agent != 'NONE' and agent not like 'Local%' and agent not like 'PJSIP%'";
-	$ares = mysqli_multi_query($connection, $aquery);
+	// Only the queuelog rows added since the last sync, cron.php does the same every minute
+	$agents = new Dictionary($connection, $DBTable, 'agents_new', 'agent', 'agent', $dict_agents);
+	$agents->install();
+	$agents->update();
 	$_POST['agent_sync'] = NULL;
 	echo "<!DOCTYPE html>\r\n";
 	echo "<head>\r\n";
@@ -15,9 +18,9 @@ if (isset($_POST['agent_sync'])) {
 }
 
 if (isset($_POST['queue_sync'])) {
-	$qquery = "truncate queues_new;";
-	$qquery .= "insert ignore into queues_new (queuename) SELECT DISTINCT(queuename) FROM $DBTable where queuename != 'NONE'";
-	$qres = mysqli_multi_query($connection, $qquery);
+	$queues = new Dictionary($connection, $DBTable, 'queues_new', 'queuename', 'queuename', $dict_queues);
+	$queues->install();
+	$queues->update();
 	$_POST['queue_sync'] = NULL;
 	echo "<!DOCTYPE html>\r\n";
 	echo "<head>\r\n";
@@ -0,0 +1,229 @@
+<?php
+require_once 'feeder.class.php';
+require_once 'sketch.class.php';
+
+/**
+ * Class TimeHist
+ * Hourly wait and talk time histograms of the answered calls, and
+ * wait before leaving of the unanswered ones, per queue and agent in
+ * the buckets of Sketch. Reports merge the hours of a window into
+ * percentiles and service levels without reading the calls.
+ */
+
+class TimeHist extends Feeder {
+
+	protected $_name = 'timehist';
+
+	/**
+	 * Histogram table name
+	 *
+	 * @var string
+	 * @access public
+	 */
+	public $Table = 'queuelog_hist';
+
+	/**
+	 * Metrics: name => array(events, queuelog column of the seconds)
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_metrics = array(
+		'wait' => array("'COMPLETECALLER', 'COMPLETEAGENT'", 'data1'),
+		'talk' => array("'COMPLETECALLER', 'COMPLETEAGENT'", 'data2'),
+		'abnd' => array("'ABANDON', 'EXITWITHTIMEOUT'", 'data3'),
+	);
+
+	/**
+	 * Feeders of the metrics: state name => metrics. Each one has its
+	 * own queuelog position, so a metric added later is filled from
+	 * the first row by the next update() instead of from then on.
+	 *
+	 * @var array
+	 * @access private
+	 */
+	private $_feeds = array(
+		'timehist' => array('wait', 'talk'),
+		'timehist_abnd' => array('abnd'),
+	);
+
+	/**
+	 * TimeHist::install()
+	 *
+	 * @access public
+	 * @return boolean
+	 */
+	public function install() {
+		parent::install();
+		return $this->_db->query("CREATE TABLE IF NOT EXISTS $this->Table (
+			hour datetime NOT NULL,
+			queuename varchar(128) NOT NULL,
+			agent varchar(128) NOT NULL,
+			metric char(4) NOT NULL,
+			bucket smallint unsigned NOT NULL,
+			cnt int unsigned NOT NULL DEFAULT 0,
+			PRIMARY KEY (hour, queuename, agent, metric, bucket)
+		) ENGINE=InnoDB DEFAULT CHARSET=utf8");
+	}
+
+	/**
+	 * TimeHist::calls()
+	 *
+	 * SQL giving one row per call and metric of queuelog:
+	 * hour, queuename, agent, metric (wait, talk or abnd), bucket
+	 *
+	 * @access private
+	 * @param string $where Condition on the queuelog rows
+	 * @param array|null $metrics Metrics to read, null for all
+	 * @return string
+	 */
+	private function calls($where, $metrics = null) {
+		$sql = array();
+		foreach ($this->_metrics as $metric => $m) {
+			if ($metrics !== null && !in_array($metric, $metrics)) {
+				continue;
+			}
+			list($events, $col) = $m;
+			$sql[] = "SELECT DATE_FORMAT(time, '%Y-%m-%d %H:00:00') AS hour, COALESCE(queuename, '') AS queuename,
+				COALESCE(agent, '') AS agent, '$metric' AS metric, " . Sketch::sqlBucket("CAST($col AS UNSIGNED)") . " AS bucket
+				FROM $this->_table WHERE $where AND event IN ($events) AND $col REGEXP '^[0-9]+$'";
+		}
+		return implode(" UNION ALL ", $sql);
+	}
+
+	/**
+	 * TimeHist::process()
+	 *
+	 * Add the calls of an id range to the hourly histograms
+	 *
+	 * @access protected
+	 * @param int $from_id
+	 * @param int $to_id
+	 * @return string|null|boolean
+	 */
+	protected function process($from_id, $to_id) {
+		$ok = $this->_db->query("INSERT INTO $this->Table (hour, queuename, agent, metric, bucket, cnt)
+			SELECT hour, queuename, agent, metric, bucket, COUNT(*)
+			FROM (" . $this->calls("id > $from_id AND id <= $to_id", $this->_feeds[$this->_name]) . ") AS c
+			GROUP BY 1, 2, 3, 4, 5
+			ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)");
+		if (!$ok) {
+			return false;
+		}
+		return $this->maxTime($from_id, $to_id);
+	}
+
+	/**
+	 * TimeHist::update()
+	 *
+	 * Run every feeder of the metrics
+	 *
+	 * @access public
+	 * @return int|boolean Number of ids consumed, false on error
+	 */
+	public function update() {
+		$done = 0;
+		foreach (array_keys($this->_feeds) as $feed) {
+			$this->_name = $feed;
+			$n = parent::update();
+			if ($n === false) {
+				$done = false;
+				break;
+			}
+			$done += $n;
+		}
+		$this->_name = 'timehist';
+		return $done;
+	}
+
+	/**
+	 * TimeHist::watermark()
+	 *
+	 * The hours complete for every metric: the lowest watermark
+	 *
+	 * @access public
+	 * @return int|null Unix timestamp
+	 */
+	public function watermark() {
+		$mark = null;
+		foreach (array_keys($this->_feeds) as $feed) {
+			$this->_name = $feed;
+			$m = parent::watermark();
+			if ($m === null) {
+				$mark = null;
+				break;
+			}
+			$mark = ($mark === null) ? $m : min($mark, $m);
+		}
+		$this->_name = 'timehist';
+		return $mark;
+	}
+
+	/**
+	 * TimeHist::sketches()
+	 *
+	 * Sketches of a window, by queue or agent. The whole hours come
+	 * from the histograms, the edges from queuelog.
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string|null $queue Quoted queue list as in sesvars.php, null for all
+	 * @param string|null $agent Quoted agent list, null for all
+	 * @param string $by queuename or agent
+	 * @return array key => array('wait' => Sketch, 'talk' => Sketch, 'abnd' => Sketch)
+	 */
+	public function sketches($start, $end, $queue, $agent = null, $by = 'queuename') {
+		$sketches = array();
+		$res = $this->_db->query($this->sql($start, $end, $queue, $agent, $by));
+		if (!$res) {
+			trigger_error('TimeHist: ' . $this->_db->error, E_USER_WARNING);
+			return $sketches;
+		}
+		while ($row = $res->fetch_assoc()) {
+			$k = $row['k'];
+			if (!isset($sketches[$k])) {
+				$sketches[$k] = array();
+				foreach ($this->_metrics as $metric => $m) {
+					$sketches[$k][$metric] = new Sketch();
+				}
+			}
+			$sketches[$k][$row['metric']]->add($row['bucket'], (int) $row['cnt']);
+		}
+		$res->free();
+		ksort($sketches);
+		return $sketches;
+	}
+
+	/**
+	 * TimeHist::sql()
+	 *
+	 * Query of sketches(), also explained by schema.php
+	 *
+	 * @access public
+	 * @param string $start
+	 * @param string $end
+	 * @param string|null $queue
+	 * @param string|null $agent
+	 * @param string $by
+	 * @return string
+	 */
+	public function sql($start, $end, $queue, $agent = null, $by = 'queuename') {
+		$where = ($queue === null) ? "queuename != ''" : "queuename IN ($queue)";
+		if ($agent !== null) {
+			$where .= " AND agent IN ($agent)";
+		}
+		$hours = $this->split($start, $end);
+		if ($hours === null) {
+			$sql = "SELECT queuename, agent, metric, bucket, 1 AS cnt
+				FROM (" . $this->calls("$where AND time >= '$start' AND time <= '$end'") . ") AS c";
+		} else {
+			$sql = "SELECT queuename, agent, metric, bucket, cnt
+				FROM $this->Table WHERE $where AND hour >= '$hours[0]' AND hour < '$hours[1]'
+				UNION ALL SELECT queuename, agent, metric, bucket, 1 AS cnt
+				FROM (" . $this->calls("$where AND ((time >= '$start' AND time < '$hours[0]') OR (time >= '$hours[1]' AND time <= '$end'))") . ") AS c";
+		}
+		return "SELECT $by AS k, metric, bucket, SUM(cnt) AS cnt FROM ($sql) AS t GROUP BY k, metric, bucket";
+	}
+
+}
@@ -23,48 +23,47 @@ include "sesvars.php";
 //error_reporting(E_WARNING);
 ?>
 <?php
-$sql_ans = "select calldate, dst, channel, uniqueid, disposition, lastapp from cdr where dst in ($queue) and calldate >= '$start' and calldate <= '$end' and disposition in ('ANSWERED');";
+// Peer name of the channel: SIP/trunk-0000001a -> trunk
+$peer = "SUBSTRING_INDEX(channel, '/', -1)";
+$peer = "IF(LOCATE('-', $peer), LEFT($peer, CHAR_LENGTH($peer) - CHAR_LENGTH(SUBSTRING_INDEX(channel, '-', -1)) - 1), $peer)";
+
+$sql_ans = "SELECT peer, SUM(lastapp = 'Queue') AS ans, SUM(lastapp != 'Queue') AS abn, COUNT(*) AS total FROM (
+	SELECT $peer AS peer, lastapp FROM cdr
+	WHERE dst IN ($queue) AND calldate >= '$start' AND calldate <= '$end' AND disposition IN ('ANSWERED')) AS calls
+	GROUP BY peer";
 
 $clls = $connection->query($sql_ans);
 
 $trk = "select channelid from trunks;";
 
+$confpbx = $db->get('asterisk');
 $trks = $confpbx->query($trk);
 
 $trunks = array();
-$calls = array();
 $trunk = array();
 
-$i = 0;
 while ($t = $trks->fetch_array(MYSQLI_ASSOC)) {
-	$trunks[] = $t;
+	$trunks[$t['channelid']] = true;
 }
+$trks->free();
 
 while ($c = $clls->fetch_array(MYSQLI_ASSOC)) {
-	$disp = $c['disposition'];
-	$app = $c['lastapp'];
-	$calls[] = $c;
-}
-
-foreach ($trunks as $val) {
-	$tr = $val['channelid'];
-	$p = "/.+$tr.+/";
-	foreach ($calls as $k => $v) {
-		if (preg_match($p, $v['channel'])) {
-			if ($v['lastapp'] === 'Queue') {
-				$trunk["$tr"]['ANS'] += 1;
-				$trunk["Всего"]['ANS'] += 1;
-			} else {
-				$trunk["$tr"]['ABN'] += 1;
-				$trunk["Всего"]['ABN'] += 1;
-			}
-
-			//$trunk["$tr"] += 1;
-			$trunk["$tr"]["ALL"] += 1;
-			$trunk["Всего"]["ALL"] += 1;
-		}
+	$tr = $c['peer'];
+	if (!isset($trunks["$tr"])) {
+		continue;
+	}
+	if ($c['ans']) {
+		$trunk["$tr"]['ANS'] = (int) $c['ans'];
+		$trunk["Всего"]['ANS'] += $c['ans'];
+	}
+	if ($c['abn']) {
+		$trunk["$tr"]['ABN'] = (int) $c['abn'];
+		$trunk["Всего"]['ABN'] += $c['abn'];
 	}
+	$trunk["$tr"]["ALL"] = (int) $c['total'];
+	$trunk["Всего"]["ALL"] += $c['total'];
 }
+$clls->free();
 asort($trunk);
 $trunk = json_encode($trunk);
 // echo "<pre>";
@@ -19,6 +19,8 @@
 */
 require_once("config.php");
 include("sesvars.php");
+require_once("abandonstats.class.php");
+require_once("reportcache.class.php");
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
@@ -36,51 +38,24 @@ include("sesvars.php");
     <script type="text/javascript" src="https://www.google.com/jsapi"></script>
 </head>
 <?php
-$sql = "SELECT time, callid, queuename, event, data1, data2, data3 FROM $DBTable WHERE time >= '$start' AND time <= '$end' AND event IN ('ABANDON', 'EXITWITHTIMEOUT') AND queuename IN ($queue)";
-$res1 = mysqli_query($connection, $sql);
+// Counters, positions and wait histogram of the unanswered calls
+// in one unbuffered pass
+$cache = new ReportCache();
+$stats = $cache->get('abandon', $start, $end, $queue, '', function () use ($connection, $DBTable, $start, $end, $queue) {
+	$abandons = new AbandonStats($connection, $DBTable);
+	return $abandons->fetch($start, $end, $queue);
+});
+$by_queue = isset($stats['by']['queue']) ? $stats['by']['queue'] : array();
 
-while($row=mysqli_fetch_row($res1)) {		
-	$queue_calls["$row[2]"] += count($row[1]);
-	$abandon["$row[2]"][] = $row[6];
-if ($row[3] == "ABANDON") {	
-if ($row[6]<=10) {
- $abandon10["$row[2]"] += count($row[6]);
- } elseif (($row[6] >= 11)&&($row[6] <= 20)) {
- $abandon20["$row[2]"] += count($row[6]);
- } elseif (($row[6] >= 21)&&($row[6] <= 30)) {
- $abandon30["$row[2]"] += count($row[6]);
- } elseif (($row[6] >= 31)&&($row[6] <= 40)) {
- $abandon40["$row[2]"] += count($row[6]);
- } elseif (($row[6] >= 41)&&($row[6] <= 50)) {
- $abandon50["$row[2]"] += count($row[6]);
- } elseif (($row[6] >= 51)&&($row[6] <= 60)) {
- $abandon60["$row[2]"] += count($row[6]);
- } elseif ($row[6] >= 61) {
- $abandon61["$row[2]"] += count($row[6]);
- }
-} 
-}
-	$total_calls = 0;
-	$total_abandon_calls = 0;
-	$total_timeout_calls = 0;
-foreach($res1 as $row){
-    $total_calls += count($row['callid']);
-    $total_hold += $row['data3'];
-	$abandon_end_pos +=$row['data1'];
-	$abandon_start_pos +=$row['data2'];	
-        if ( $row['event'] == "ABANDON" ) {
-        $total_abandon_calls += count($row['callid']);
-        $event_abandon = $lang["$language"]['user_abandon'];
-        } elseif (	$row['event'] == "EXITWITHTIMEOUT") {
-        $total_timeout_calls += count($row['callid']);
-        $event_timeout=$lang["$language"]['timeout'];
-        }
-    $abandon_average_hold = number_format($total_hold / $total_calls,2);
-    $abandon_average_start = round($abandon_start_pos / $total_calls);
-    $abandon_average_end = floor($abandon_end_pos / $total_calls);
-}
+$total_calls = $stats['calls'];
+$total_abandon_calls = $stats['abandon'];
+$total_timeout_calls = $stats['timeout'];
+$abandon_average_hold = number_format($stats['avg_wait'], 2);
+$abandon_average_start = $stats['avg_enter'];
+$abandon_average_end = $stats['avg_exit'];
+$event_abandon = $lang["$language"]['user_abandon'];
+$event_timeout = $lang["$language"]['timeout'];
 
-mysqli_free_result($res1);
 mysqli_close($connection);	
 
 $start_parts = explode(" ,:", $start);
@@ -254,11 +229,10 @@ $end_parts   = explode(" ,:", $end);
 				</THEAD>
 				<TBODY>
 				<?php
-				foreach($queue_calls as $key=>$row) {
-				$percent_queue_calls = number_format($queue_calls["$key"]*100/$total_calls,2);
+				foreach($by_queue as $key=>$row) {
 	               echo "<TR><TD>".$key."</TD>
-	               <TD>".$queue_calls["$key"]."</TD>
-				   <TD>".number_format($queue_calls["$key"]*100/$total_calls,2)."%</TD>
+	               <TD>".$row['calls']."</TD>
+				   <TD>".number_format($row['calls']*100/$total_calls,2)."%</TD>
 	               </TR>\n";
 				}   
 				
@@ -274,8 +248,8 @@ $end_parts   = explode(" ,:", $end);
       var data = google.visualization.arrayToDataTable([
 <?php
 	     echo "['Queue', 'Calls'],\n";
-    foreach($queue_calls as $key=>$row){
-	     echo "['" . $key . "', " . $queue_calls["$key"] . "],\n";
+    foreach($by_queue as $key=>$row){
+	     echo "['" . $key . "', " . $row['calls'] . "],\n";
     }
 ?>
         ]);
@@ -321,24 +295,19 @@ $end_parts   = explode(" ,:", $end);
 				</THEAD>
 				<TBODY>
 <?php
-foreach($abandon as $key=>$val){		  
-$total_abandon10 += $abandon10["$key"];
-$total_abandon20 += $abandon20["$key"];
-$total_abandon30 += $abandon30["$key"];
-$total_abandon40 += $abandon40["$key"];
-$total_abandon50 += $abandon50["$key"];
-$total_abandon60 += $abandon60["$key"];
-$total_abandon61 += $abandon61["$key"];
+foreach($by_queue as $key=>$row){
+$hist = $row['hist'];
 echo "<TR><TD>".$key."</TD>
-<TD>".$abandon10["$key"]."</TD>
-<TD>".$abandon20["$key"]."</TD>
-<TD>".$abandon30["$key"]."</TD>
-<TD>".$abandon40["$key"]."</TD>
-<TD>".$abandon50["$key"]."</TD>
-<TD>".$abandon60["$key"]."</TD>
-<TD>".$abandon61["$key"]."</TD>
+<TD>".$hist[0]."</TD>
+<TD>".$hist[1]."</TD>
+<TD>".$hist[2]."</TD>
+<TD>".$hist[3]."</TD>
+<TD>".$hist[4]."</TD>
+<TD>".$hist[5]."</TD>
+<TD>".$hist[6]."</TD>
 </TR>\n";
 }
+list($total_abandon10, $total_abandon20, $total_abandon30, $total_abandon40, $total_abandon50, $total_abandon60, $total_abandon61) = $stats['hist'];
 echo "<TR><TD><b>".$lang["$language"]['ALLS']."<br/>".$total_abandon_calls."</b></TD>
 <TD><b>".$total_abandon10."</b></TD>
 <TD><b>".$total_abandon20."</b></TD>
@@ -19,6 +19,7 @@
 */
 require_once("config.php");
 include("sesvars.php");
+require_once("reports.php");
 //ini_set('display_errors',1);
 //error_reporting(E_WARNING);
 ?>
@@ -40,23 +41,12 @@ include("sesvars.php");
 //   $_SESSION['QSTATS']['limit'] = 100;
 //}
 
+$export_params = array();
 if ( (isset($_POST['callerid_search'])) && (strlen($_POST['callerid_search']) > 0) ) {
-    $callerid_search = $_POST['callerid_search'];
-    $sql = "select distinct(callid) from $DBTable where time >= '$start' AND time <= '$end' and data2 like '%$callerid_search%'";
-    $restemp = mysqli_query($connection, $sql);
-        foreach($restemp as $temp){
-		$callid_search .= ",'".$temp['callid']."'";
-		}	
-    $callid_search = substr($callid_search, 1);	
-    $sql = "select time, callid, queuename, agent, event, data1, data2, data3 from $DBTable where time >= '$start' AND time <= '$end'
-            and event in ('ABANDON','EXITWITHTIMEOUT','ENTERQUEUE') and callid in ($callid_search) order by callid";
-    $resabandon = mysqli_query($connection, $sql);
-} else {
-    $sql = "select time, callid, queuename, agent, event, data1, data2, data3 from $DBTable
-           where time >= '$start' AND time <= '$end' and queuename in ($queue)
-           and event in ('ABANDON','EXITWITHTIMEOUT','ENTERQUEUE') order by callid, time limit 50000";
-    $resabandon = mysqli_query($connection, $sql);
+    $export_params['callerid_search'] = $_POST['callerid_search'];
 }
+$report = export_report('unanswered_cdr', $export_params);
+$resabandon = mysqli_query($connection, $report['sql']);
 mysqli_close($connection);
 $start_parts = explode(" ,:", $start);
 $end_parts   = explode(" ,:", $end);     
@@ -89,12 +79,6 @@ $end_parts   = explode(" ,:", $end);
                 </TBODY>
                 </TABLE>
 <br />
-<?php
-$cover_pdf .= $lang["$language"]['queue'] . ": " . $queue . "\n";
-$cover_pdf .= $lang["$language"]['start'] . ": " . $start_parts[0] . "\n";
-$cover_pdf .= $lang["$language"]['end'] . ": " . $end_parts[0] . "\n";
-$cover_pdf .= $lang["$language"]['period'] . ": " . $period . " " . $lang["$language"]['days'] . "\n";
-?>
 <div id="search" align="left">
 <form action="<?php echo htmlspecialchars($_SERVER['PHP_SELF']); ?>" id="frm1" name="frm1" method="post">
 &nbsp;&nbsp;&nbsp;<b>CallerID:</b>&nbsp;<input type="text" id="callerid_search" name="callerid_search" />
@@ -129,11 +113,6 @@ $cover_pdf .= $lang["$language"]['period'] . ": " . $period . " " . $lang["$lang
 			<TH><?php echo $lang["$language"]['callid']?></TH>
        </TR>
 <?php
-$header_pdf=array($lang["$language"]['time'],$lang["$language"]['callerid'], $lang["$language"]['queue'],$lang["$language"]['event'],$lang["$language"]['holdtime'],$lang["$language"]['enterposition'],$lang["$language"]['hangupposition']);
-$width_pdf=array(40,32,23,23,23,25,25);
-$title_pdf=$lang["$language"]['user_abandon_calls'];
-$data_pdf = array();
-
 foreach($resabandon as $row) {
 if($row['event'] == "ENTERQUEUE") {
 $callerid = $row['data2'];
@@ -144,8 +123,6 @@ $page_rows2 += count($row['event']);
 	    $enterposition = $row['data2'];
         $holdtime = gmdate('i:s', $row['data3']);
 
-	 $time = date('Y-m-d H:i:s', strtotime($row['time']));
-        
 if  (($row['event'] !== "ENTERQUEUE") ) {
 	echo "<TR><TD>" . date('Y-m-d H:i:s', strtotime($row['time'])) . "</TD>
 	      <TD>" . $callerid . "</TD>
@@ -156,21 +133,19 @@ if  (($row['event'] !== "ENTERQUEUE") ) {
 		    <TD>" . $hangupposition . "</TD>
 	      <TD>" . $row['callid'] . "</TD>
 	      </TR>\n";
-		    $linea_pdf = array($time,$callerid,$row['queuename'],$row['event'],$holdtime,$enterposition,$hangupposition);
-        $data_pdf[]=$linea_pdf;
 	}
  }
  
 mysqli_free_result($resabandon); 
  
 echo "<br />Всего найдено:".$page_rows2."<br />";
-print_exports($header_pdf,$data_pdf,$width_pdf,$title_pdf,$cover_pdf);
+print_report_export('unanswered_cdr', $export_params);
  
 echo "</table>";
 
  ?>
 <?php 
-print_exports($header_pdf,$data_pdf,$width_pdf,$title_pdf,$cover_pdf);
+print_report_export('unanswered_cdr', $export_params);
 ?>
 	  <br/>	
      </div>